@@ -0,0 +1,267 @@
+"""
+Benchmarks of design generation and results analysis at scale.
+
+Synthetic workloads, parameterized by the number of stimuli (10 to 10,000,
+all of one scene, so every pair is compared), the number of design rows,
+and the number of observers (10 to 1,000, one pair results file each):
+
+    get_name_list           design-creator/main.py, stimulus names
+    get_design_for_picture  design-creator/main.py, all pairs (quadratic)
+    shuffle_left_right_pic  design-creator/main.py, left/right swaps
+    pair_design             design-creator/design_engine.py, vectorized pairs
+    read_design_csv         rating-experiments/designtable.py
+    read_results            evaluation/aggregate.py, parsing the results files
+    load_results            evaluation/loader.py, from a warm cache
+    count                   evaluation/aggregate.py, the counts of main.py
+
+Every benchmark is repeated until it ran for min_seconds (best and mean
+time are kept). Sizes whose time, extrapolated from the two sizes before,
+exceeds max_seconds are skipped and reported with the estimate, so the
+results show where the quadratic pieces stop working.
+
+Results are written to results/<date>_<commit>.json, followed by the
+speedup of the warm cache of load_results over read_results; --compare
+prints the ratio of the times to an earlier run.
+
+Usage:
+
+python run_benchmarks.py
+python run_benchmarks.py --quick
+python run_benchmarks.py --compare results/2024-05-01_1a2b3c4.json
+
+"""
+
+import csv
+import importlib.util
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ('design-creator', 'rating-experiments', 'evaluation'):
+    sys.path.insert(0, str(ROOT / folder))
+
+import pyglet
+pyglet.options['headless'] = True  # experiment.py imports the window module
+
+## workload sizes
+STIMULI = [10, 100, 1000, 10000]
+DESIGN_ROWS = [100, 1000, 10000, 100000]
+OBSERVERS = [10, 100, 1000]
+
+## timing: repetitions until min_seconds, sizes estimated above max_seconds are skipped
+min_seconds = 0.2
+max_seconds = 20.0
+
+## folder of the stored results
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def _load(path, name):
+    """ Imports a script by its path (there are several main.py) """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+design_main = _load(ROOT / 'design-creator' / 'main.py', 'design_main')
+from design_engine import stimulus_table, pair_design
+from designtable import read_design_csv
+from aggregate import read_results, count
+from loader import load_results
+
+
+def measure(function, *args):
+    """ Best and mean time of repeated calls, and the number of calls """
+    times = []
+    while not times or (sum(times) < min_seconds and len(times) < 1000):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'mean': sum(times) / len(times), 'reps': len(times)}
+
+
+def scene_filters(n):
+    """ Filters and intensities giving n stimuli of one scene """
+    intensities = ['20', '40', '60', '80', '100']
+    nfilters = max(1, n // len(intensities))
+    return ['F%d' % i for i in range(nfilters)], intensities
+
+
+def write_design(rows, tmp):
+    """ Pair design file with the given number of rows, the first rows of a
+    pair_design of enough stimuli of one scene (all rows distinct) """
+    filename = Path(tmp) / ('design_%d.csv' % rows)
+    # n stimuli have n (n - 1) / 2 pairs, rounded up to filters of 5 intensities
+    stimuli = math.ceil((1 + math.sqrt(1 + 8 * rows)) / 2)
+    filters, intensities = scene_filters(stimuli + 4)
+    table = stimulus_table(['Scene'], filters, intensities, '.jpg')
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['image_a', 'image_b', 'f_a_og', 'f_b_og', 'i_a', 'i_b'])
+        writer.writerows(pair_design(table, np.random.default_rng(0))[:rows])
+    return str(filename)
+
+
+def write_observers(n, tmp):
+    """ One pair results file (156 trials) per observer """
+    rng = np.random.default_rng(n)
+    folder = Path(tmp) / ('observers_%d' % n)
+    folder.mkdir()
+    filters = ['OG', 'Clarendon', 'Juno', 'Lark']
+    files = []
+    for o in range(n):
+        filename = folder / ('o%d_pair_result_1.csv' % o)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b',
+                             'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime'])
+            usage = 'yes' if o % 2 else 'no'
+            for _ in range(156):
+                fa, fb = rng.choice(filters, 2)
+                ia, ib = [0 if f == 'OG' else int(rng.choice([25, 50, 75, 100])) for f in (fa, fb)]
+                left = rng.random() < 0.5
+                scene = 'Girl%d' % rng.integers(1, 3)
+                writer.writerow([usage, '%s_%s_%d.jpg' % (scene, fa, ia), '%s_%s_%d.jpg' % (scene, fb, ib),
+                                 fa, fb, fa, fb, ia, ib, fa if left else fb, fa if left else fb,
+                                 ia if left else ib, 'left' if left else 'right', rng.random() * 3])
+        files.append(str(filename))
+    return files
+
+
+def _count_main(table):
+    """ The counts of evaluation/main.py """
+    count(table, ['chosen_f_og', 'chosen_i'],
+          categories={'chosen_f_og': ['OG', 'Clarendon', 'Juno', 'Lark'], 'chosen_i': [0, 25, 50, 75, 100]})
+    count(table, ['chosen_i'], categories={'chosen_i': [0, 25, 50, 75, 100]})
+    count(table, ['observer', 'usage', 'chosen_i'], within=['observer'])
+
+
+def sweep(name, sizes, setup):
+    """ Runs a benchmark over its sizes. setup(size) returns the function and
+    its arguments. Skips sizes whose extrapolated time exceeds max_seconds """
+    results = []
+    measured = []
+    for size in sizes:
+        if len(measured) >= 2:
+            (s0, t0), (s1, t1) = measured[-2:]
+            exponent = math.log(max(t1, 1e-9) / max(t0, 1e-9)) / math.log(s1 / s0)
+            estimate = t1 * (size / s1) ** max(exponent, 1.0)
+            if estimate > max_seconds:
+                results.append({'bench': name, 'size': size, 'skipped': True, 'estimate': estimate})
+                print('%-24s %8d   skipped, about %.0f s' % (name, size, estimate))
+                continue
+        function, args = setup(size)
+        result = measure(function, *args)
+        measured.append((size, result['best']))
+        results.append(dict(result, bench=name, size=size))
+        print('%-24s %8d %12.6f s  (%d reps)' % (name, size, result['best'], result['reps']))
+    return results
+
+
+def run(quick=False):
+    stimuli = STIMULI[:3] if quick else STIMULI
+    rows = DESIGN_ROWS[:3] if quick else DESIGN_ROWS
+    observers = OBSERVERS[:2] if quick else OBSERVERS
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def names(n):
+            filters, intensities = scene_filters(n)
+            return design_main.get_name_list('Scene', filters, intensities, '.jpg')
+
+        results += sweep('get_name_list', stimuli, lambda n: (
+            design_main.get_name_list, ('Scene',) + scene_filters(n) + ('.jpg',)))
+        results += sweep('get_design_for_picture', stimuli, lambda n: (
+            design_main.get_design_for_picture, (names(n),)))
+        results += sweep('shuffle_left_right_pic', stimuli, lambda n: (
+            design_main.shuffle_left_right_pic, (design_main.get_design_for_picture(names(n)),)))
+        results += sweep('pair_design', stimuli, lambda n: (
+            lambda table: pair_design(table, np.random.default_rng()),
+            (stimulus_table(['Scene'], *scene_filters(n), '.jpg'),)))
+        results += sweep('read_design_csv', rows, lambda n: (read_design_csv, (write_design(n, tmp),)))
+
+        files = {}
+
+        def observer_files(n):
+            if n not in files:
+                files[n] = write_observers(n, tmp)
+            return files[n]
+
+        results += sweep('read_results', observers, lambda n: (read_results, (observer_files(n),)))
+
+        def warm(n):
+            cache = str(Path(tmp) / 'cache')
+            load_results(observer_files(n), cache)  # parses and fills the cache
+            return load_results, (observer_files(n), cache)
+
+        results += sweep('load_results', observers, warm)
+        results += sweep('count', observers, lambda n: (
+            _count_main, (load_results(observer_files(n), str(Path(tmp) / 'cache')),)))
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'date': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def cache_speedup(results):
+    """ Prints how much faster load_results from a warm cache is than
+    parsing the same files with read_results """
+    parsed = {r['size']: r for r in results if r['bench'] == 'read_results' and not r.get('skipped')}
+    print('\n%-24s %8s %12s %12s %8s' % ('warm cache', 'size', 'parsed', 'cached', 'speedup'))
+    for r in results:
+        if r['bench'] != 'load_results' or r.get('skipped') or r['size'] not in parsed:
+            continue
+        before = parsed[r['size']]['best']
+        print('%-24s %8d %12.6f %12.6f %8.1f' % ('load_results', r['size'], before, r['best'],
+                                                  before / r['best']))
+
+
+def compare(results, baseline):
+    """ Prints the time ratios to an earlier run """
+    before = {(r['bench'], r['size']): r for r in baseline['results'] if not r.get('skipped')}
+    print('\n%-24s %8s %12s %12s %8s' % ('compared to ' + baseline['meta']['commit'], 'size',
+                                         'before', 'now', 'ratio'))
+    for r in results:
+        old = before.get((r['bench'], r['size']))
+        if old is None or r.get('skipped'):
+            continue
+        print('%-24s %8d %12.6f %12.6f %8.2f' % (r['bench'], r['size'], old['best'], r['best'],
+                                                  r['best'] / old['best']))
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    baseline = None
+    if '--compare' in args:
+        i = args.index('--compare')
+        baseline = json.loads(Path(args[i + 1]).read_text())
+        del args[i:i + 2]
+
+    results = run(quick='--quick' in args)
+    meta = metadata()
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / ('%s_%s.json' % (meta['date'][:10], meta['commit'] or 'nocommit'))
+    out.write_text(json.dumps({'meta': meta, 'results': results}, indent=1))
+    print('\nResults written to %s' % out)
+    cache_speedup(results)
+
+    if baseline is not None:
+        compare(results, baseline)
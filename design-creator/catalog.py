@@ -0,0 +1,204 @@
+"""
+Catalog of the stimulus images.
+
+The image folders are scanned once into a table of parallel NumPy arrays,
+one entry per image file:
+
+    folder      folder of the file, as given to scan()
+    image       file name, e.g. Girl1_Lark_75.jpg
+    scene       Girl1
+    filter      Lark ('OG' for the original, '' if the name does not parse)
+    intensity   75 (0 for the original, -1 if the name does not parse)
+    size        file size in bytes
+    sha256      content hash
+    width, height
+    tier        resolution tier, 'tiny' up to tiny_max pixels, else 'full'
+
+Hashing and reading the image headers is the slow part, so the entries are
+cached on disk (catalog.json) and only files whose size or modification
+time changed are read again.
+
+check() tests all image names of a design against the catalog of the
+folder they are loaded from, in one pass, before the session starts, and
+problems() lists what looks wrong in the folders themselves: names that
+don't parse, unknown filters (e.g. Lake_Juni_50.jpg) and missing images
+of a scene's filter/intensity grid.
+
+Usage:
+
+python catalog.py ../images/people ../images/landscape ../rating-experiments/images_tiny
+python catalog.py ../rating-experiments/single_images_tiny design_single_experiment_1.csv
+
+"""
+
+import csv
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+## location of the cache, next to this file
+CACHE_FILE = str(Path(__file__).resolve().parent / '.cache' / 'catalog.json')
+
+## filters of the experiments
+FILTERS = ['OG', 'Clarendon', 'Juno', 'Lark']
+
+## largest edge of the 'tiny' resolution tier, in pixels
+tiny_max = 1024
+
+## file names of the stimuli
+NAME_PATTERN = re.compile(r'^(?P<scene>[^_]+)_(?:(?P<og>OG)|(?P<filter>[^_]+)_(?P<intensity>\d+))\.jpg$')
+
+FIELDS = ['folder', 'image', 'scene', 'filter', 'intensity', 'size', 'sha256', 'width', 'height', 'tier']
+
+
+def parse_name(name):
+    """ Scene, filter and intensity of a file name: Girl1_Lark_75.jpg ->
+    ('Girl1', 'Lark', 75), Girl1_OG.jpg -> ('Girl1', 'OG', 0), or None """
+    match = NAME_PATTERN.match(name)
+    if match is None:
+        return None
+    if match['og']:
+        return match['scene'], 'OG', 0
+    return match['scene'], match['filter'], int(match['intensity'])
+
+
+def _read_entry(path, stat):
+    """ Hash and resolution of an image file """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    with Image.open(path) as im:
+        width, height = im.size  # only the header is read
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest.hexdigest(),
+            'width': width, 'height': height}
+
+
+def scan(folders, cache_file=CACHE_FILE):
+    """ Catalog table of all .jpg files in the folders """
+    cache_file = Path(cache_file)
+    cache = json.loads(cache_file.read_text()) if cache_file.is_file() else {}
+    changed = False
+
+    rows = []
+    for folder in folders:
+        for path in sorted(Path(folder).glob('*.jpg')):
+            stat = path.stat()
+            key = str(path.resolve())
+            entry = cache.get(key)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+                entry = cache[key] = _read_entry(path, stat)
+                changed = True
+            scene, filter_name, intensity = parse_name(path.name) or ('', '', -1)
+            tier = 'tiny' if max(entry['width'], entry['height']) <= tiny_max else 'full'
+            rows.append((str(folder), path.name, scene, filter_name, intensity, entry['size'],
+                         entry['sha256'], entry['width'], entry['height'], tier))
+
+    if changed:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(cache))
+        os.replace(tmp, cache_file)
+
+    columns = list(zip(*rows)) or [()] * len(FIELDS)
+    table = {k: np.asarray(v, dtype=object) for k, v in zip(FIELDS, columns)}
+    for k in ('intensity', 'size', 'width', 'height'):
+        table[k] = table[k].astype(np.int64)
+    return table
+
+
+def _suggest(name, names):
+    """ Closest existing name, for the messages """
+    close = difflib.get_close_matches(name, names, n=1)
+    return ' (%s?)' % close[0] if close else ''
+
+
+def problems(table):
+    """ What looks wrong in the cataloged folders, as messages """
+    messages = []
+    for folder in sorted(set(table['folder'])):
+        here = table['folder'] == folder
+        names = list(table['image'][here])
+        for name, f in zip(names, table['filter'][here]):
+            if f == '':
+                messages.append('%s: %s does not match <Scene>_<Filter>_<Intensity>.jpg' % (folder, name))
+            elif f not in FILTERS:
+                messages.append('%s: %s has the unknown filter %s%s'
+                                % (folder, name, f, _suggest(f, FILTERS)))
+
+        # every scene should have the same intensities of every filter
+        known = here & np.isin(table['filter'], FILTERS[1:])
+        levels = sorted(set(table['intensity'][known]))
+        for scene in sorted(set(table['scene'][known])):
+            for f in sorted(set(table['filter'][known & (table['scene'] == scene)])):
+                for level in levels:
+                    name = '%s_%s_%d.jpg' % (scene, f, level)
+                    if name not in names:
+                        messages.append('%s: %s is missing' % (folder, name))
+    return messages
+
+
+def check(table, folder, names, rows=None):
+    """ Image names of a design (with their design rows) that are not in the
+    catalog of the folder, and mixed resolutions, as messages """
+    here = table['folder'] == str(folder)
+    if not here.any():
+        return ['%s: no images found' % folder]
+    names = np.asarray(names, dtype=object)
+    rows = np.arange(len(names)) if rows is None else np.asarray(rows)
+    found = np.isin(names, table['image'][here])
+    messages = []
+    existing = list(table['image'][here])
+    for i in np.flatnonzero(~found):
+        messages.append('row %d: %s is not in %s%s' % (rows[i] + 1, names[i], folder,
+                                                       _suggest(names[i], existing)))
+
+    used = here & np.isin(table['image'], names)
+    sizes = set(zip(table['width'][used].tolist(), table['height'][used].tolist()))
+    if len(sizes) > 1:
+        messages.append('%s: the images have different resolutions %s' % (folder, sorted(sizes)))
+    return messages
+
+
+def check_design(design, image_columns, folder, cache_file=CACHE_FILE):
+    """ Checks the images of a design (columns by name, e.g. a DesignTable)
+    against the folder. Returns the problems as messages, an empty list if
+    all images exist """
+    names = [name for column in image_columns for name in design[column]]
+    rows = [row for column in image_columns for row in range(len(design[column]))]
+    return check(scan([folder], cache_file), folder, names, rows)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    if not args:
+        print('usage: python catalog.py <image folders> [<design file>]')
+        sys.exit(1)
+
+    designs = [a for a in args if a.endswith('.csv')]
+    folders = [a for a in args if not a.endswith('.csv')]
+    table = scan(folders)
+    for folder in folders:
+        here = table['folder'] == folder
+        print('%s: %d images, %s' % (folder, here.sum(), ', '.join(sorted(set(table['tier'][here])))))
+    messages = problems(table)
+
+    for designfile in designs:
+        with open(designfile, newline='') as f:
+            rows = list(csv.DictReader(f))
+        columns = [c for c in rows[0] if c.startswith('image')] if rows else []
+        names = [r[c] for c in columns for r in rows]
+        for folder in folders:
+            messages += ['%s: %s' % (designfile, m) for m in check(
+                table, folder, names, list(range(len(rows))) * len(columns))]
+
+    for m in messages:
+        print(m)
+    sys.exit(1 if messages else 0)
@@ -0,0 +1,268 @@
+"""
+Vectorized design engine.
+
+The stimuli are a table of parallel NumPy arrays (file name, scene,
+filter and intensity), and a design is only integer index arrays into it:
+
+    pairs   (n, 2) stimulus indices of the left and right image of each trial
+    order   (n,)   permutation of the trials
+
+Combinations, left/right counterbalancing and the trial order are all
+computed on these arrays, so designs for thousands of images are generated
+in a fraction of a second, e.g. one randomized design per observer.
+
+E.g.
+
+rng = np.random.default_rng(seed)
+table = stimulus_table(["Girl1", "Girl2"], ["OG", "Clarendon", "Lark", "Juno"],
+                       ["25", "50", "75", "100"], ".jpg")
+design = pair_design(table, rng, max_run=3)
+write_to_csv(design)    # from main.py
+
+"""
+
+import numpy as np
+
+
+def stimulus_table(names, filters, intensities, file_type):
+    """ Stimulus table of all scenes x filters x intensities, in the order of
+    get_name_list. The original ('OG') has a single version, intensity 0 """
+
+    scene, filt, intensity = [], [], []
+    for s, name in enumerate(names):
+        for f, filter_name in enumerate(filters):
+            levels = ["0"] if filter_name == "OG" else intensities
+            scene += [s] * len(levels)
+            filt += [f] * len(levels)
+            intensity += levels
+
+    scene = np.asarray(scene, dtype=np.int32)
+    filt = np.asarray(filt, dtype=np.int32)
+    intensity = np.asarray(intensity, dtype=np.int32)
+    names = np.asarray(names)
+    filters = np.asarray(filters)
+
+    is_og = filters[filt] == "OG"
+    stem = np.char.add(np.char.add(names[scene], "_"), filters[filt])
+    level = np.char.add("_", intensity.astype(str))
+    filename = np.char.add(np.where(is_og, stem, np.char.add(stem, level)), file_type)
+
+    # object arrays: indexing them with the design only copies references
+    return {"image": filename.astype(object), "scene": scene, "filter": filt,
+            "intensity": intensity, "scenes": names.astype(object),
+            "filters": filters.astype(object)}
+
+
+def pairs_within(groups):
+    """ All unordered pairs (i, j), i < j, of stimuli with the same group code
+    (e.g. scene). Groups of the same size are paired in one step """
+
+    sorted_idx = np.argsort(groups, kind="stable")
+    _, starts, sizes = np.unique(groups[sorted_idx], return_index=True, return_counts=True)
+
+    pairs = []
+    for size in np.unique(sizes):
+        if size < 2:
+            continue
+        left, right = np.triu_indices(size, 1)
+        group_starts = starts[sizes == size][:, None]
+        pairs.append(np.stack([sorted_idx[group_starts + left].ravel(),
+                               sorted_idx[group_starts + right].ravel()], axis=1))
+
+    if not pairs:
+        return np.empty((0, 2), dtype=np.intp)
+    return np.concatenate(pairs)
+
+
+def counterbalance(pairs, rng):
+    """ Swaps left and right in exactly half of the pairs (rounded down),
+    chosen at random """
+    swap = rng.permutation(len(pairs)) < len(pairs) // 2
+    return np.where(swap[:, None], pairs[:, ::-1], pairs)
+
+
+def run_lengths(keys):
+    """ Position of each trial in its run of equal keys (0 for the first) """
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = keys[1:] != keys[:-1]
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(n), 0))
+    return np.arange(n) - run_start
+
+
+def violations(pairs, run_keys=None, max_run=None):
+    """ Trial positions that break a constraint: sharing an image with the
+    previous trial, or being the (max_run + 1)th trial of a run of equal
+    run_keys """
+    bad = np.zeros(len(pairs), dtype=bool)
+    if len(pairs) > 1:
+        prev, curr = pairs[:-1], pairs[1:]
+        bad[1:] = ((curr[:, 0] == prev[:, 0]) | (curr[:, 0] == prev[:, 1]) |
+                   (curr[:, 1] == prev[:, 0]) | (curr[:, 1] == prev[:, 1]))
+    if run_keys is not None and max_run is not None:
+        bad |= run_lengths(run_keys) >= max_run
+    return np.flatnonzero(bad)
+
+
+def spread_order(keys, rng):
+    """ Random order in which the trials of every key are spread evenly over
+    the session: the i-th of the m trials of a key is placed at a random
+    point of the interval [i/m, (i+1)/m). With equally frequent keys every
+    key appears once per round, so runs are at most 2 long """
+    n = len(keys)
+    perm = rng.permutation(n)
+    keys = keys[perm]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    by_key = np.argsort(inverse, kind="stable")
+    rank = np.empty(n)
+    rank[by_key] = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+    position = (rank + rng.random(n)) / counts[inverse]
+    return perm[np.argsort(position, kind="stable")]
+
+
+def _offending(left, right, keys, max_run, order):
+    """ violations() of the trials in order, on the image columns of the
+    pairs and the run key codes (cheaper than taking whole rows) """
+    a, b = left[order], right[order]
+    bad = np.zeros(len(order), dtype=bool)
+    bad[1:] = (a[1:] == a[:-1]) | (a[1:] == b[:-1]) | (b[1:] == a[:-1]) | (b[1:] == b[:-1])
+    if keys is not None:
+        bad |= run_lengths(keys[order]) >= max_run
+    return np.flatnonzero(bad)
+
+
+def _repair(left, right, keys, max_run, order, rng, rounds):
+    """ Swaps all offending trials with random other trials at once, until
+    none is left. Returns None if there are still some after rounds """
+    n = len(order)
+    for _ in range(rounds):
+        bad = _offending(left, right, keys, max_run, order)
+        if len(bad) == 0:
+            return order
+        partners = rng.integers(n, size=len(bad))
+        # every position takes part in one swap at most
+        keep = ~np.isin(partners, bad)
+        partners, first = np.unique(partners[keep], return_index=True)
+        bad = bad[keep][first]
+        order[bad], order[partners] = order[partners], order[bad]
+    return None
+
+
+def _greedy(left, right, keys, max_run, rng):
+    """ Trial order built trial by trial: the next trial is the allowed one
+    whose run key and images have the most trials left (ties at random).
+    Returns None if it runs into a dead end """
+    n = len(left)
+    perm = rng.permutation(n)
+    left, right = left[perm], right[perm]
+    images = np.bincount(np.concatenate([left, right]))
+    if keys is not None:
+        keys = keys[perm]
+        per_key = np.bincount(keys)
+
+    remaining = np.ones(n, dtype=bool)
+    order = np.empty(n, dtype=np.intp)
+    run = 0
+    for step in range(n):
+        allowed = remaining.copy()
+        if step > 0:
+            a, b = left[order[step - 1]], right[order[step - 1]]
+            allowed &= (left != a) & (left != b) & (right != a) & (right != b)
+            if keys is not None and run >= max_run:
+                allowed &= keys != keys[order[step - 1]]
+        candidates = np.flatnonzero(allowed)
+        if len(candidates) == 0:
+            return None
+
+        score = images[left[candidates]] + images[right[candidates]]
+        if keys is not None:
+            score = score + 2 * n * per_key[keys[candidates]]
+        chosen = candidates[np.argmax(score)]
+        if keys is not None:
+            run = run + 1 if step > 0 and keys[chosen] == keys[order[step - 1]] else 1
+            per_key[keys[chosen]] -= 1
+        images[left[chosen]] -= 1
+        images[right[chosen]] -= 1
+        remaining[chosen] = False
+        order[step] = chosen
+    return perm[order]
+
+
+def shuffle_order(pairs, rng, run_keys=None, max_run=None, max_tries=100, draws=3, greedy_max=5000):
+    """ Random trial order without the same image back-to-back and, if
+    run_keys are given, without runs longer than max_run.
+
+    The order is drawn vectorized (spread evenly over the run keys if there
+    is a run constraint), then all offending trials are swapped with random
+    other trials at once, for at most max_tries rounds, and the order is
+    drawn again (draws times) if some are left. Small dense designs, where
+    random swaps rarely work out (e.g. 5 stimuli of one scene), are then
+    built greedily, if they have at most greedy_max trials. Raises
+    ValueError if the constraints can't be met. """
+
+    n = len(pairs)
+    left, right = np.ascontiguousarray(pairs[:, 0]), np.ascontiguousarray(pairs[:, 1])
+    keys = None
+    if max_run is not None and run_keys is not None:
+        _, keys = np.unique(run_keys, return_inverse=True)
+        counts = np.bincount(keys)
+        # the most frequent key needs enough other trials between its runs
+        if n and counts.max() > max_run * (n - counts.max() + 1):
+            raise ValueError("no trial order found that meets the constraints")
+
+    for _ in range(draws):
+        order = rng.permutation(n) if keys is None else spread_order(keys, rng)
+        order = _repair(left, right, keys, max_run, order, rng, max_tries)
+        if order is not None:
+            return order
+
+    if n <= greedy_max:
+        for _ in range(draws):
+            order = _greedy(left, right, keys, max_run, rng)
+            if order is not None:
+                return order
+    raise ValueError("no trial order found that meets the constraints")
+
+
+def pair_design(table, rng, max_run=None, run_key="scene"):
+    """ Randomized pair design: all pairs within each scene, counterbalanced
+    left/right and shuffled under the constraints. Returns the rows as an
+    array with the columns of write_to_csv """
+
+    pairs = counterbalance(pairs_within(table["scene"]), rng)
+    run_keys = table[run_key][pairs[:, 0]] if max_run is not None else None
+    pairs = pairs[shuffle_order(pairs, rng, run_keys, max_run)]
+    return design_rows(table, pairs)
+
+
+def design_rows(table, pairs):
+    """ Rows image_a, image_b, f_a_og, f_b_og, i_a, i_b of a pair design """
+    left, right = pairs[:, 0], pairs[:, 1]
+    filters = table["filters"][table["filter"]]
+    intensity = table["intensity"].astype(str).astype(object)
+    return np.stack([table["image"][left], table["image"][right],
+                     filters[left], filters[right],
+                     intensity[left], intensity[right]], axis=1)
+
+
+def single_design(table, rng, max_run=None, run_key="scene"):
+    """ Randomized single stimulus design: every image once, shuffled under
+    the run constraint. Returns the rows image, filter, intensity """
+
+    # every image as a 'pair' with itself, the same image is never repeated
+    stimuli = np.arange(len(table["image"]))
+    pairs = np.stack([stimuli, stimuli], axis=1)
+    run_keys = table[run_key] if max_run is not None else None
+    order = shuffle_order(pairs, rng, run_keys, max_run)
+
+    filters = table["filters"][table["filter"]]
+    intensity = table["intensity"].astype(str).astype(object)
+    return np.stack([table["image"][order], filters[order], intensity[order]], axis=1)
+
+
+def design_columns(rows, fields):
+    """ Design rows as a dictionary of columns, e.g. for make_design of the
+    rating experiments """
+    return {field: rows[:, j].tolist() for j, field in enumerate(fields)}
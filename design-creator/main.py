@@ -2,6 +2,11 @@ import random
 import numpy as np
 import csv
 from pathlib import Path
+from design_engine import stimulus_table, pair_design
+from catalog import scan, check
+
+## folder the experiment loads the images from
+imagedir = str(Path(__file__).resolve().parent.parent / "rating-experiments" / "images_tiny")
 
 
 def get_name_list(name, filters, intensities, file_type):
@@ -64,18 +69,18 @@ def main():
     filters = ["OG", "Clarendon", "Lark", "Juno"]
     intensities = ["25", "50", "75", "100"]
 
-    girl_one_pics = get_name_list("Girl1", filters, intensities, ".jpg")
-    girl_two_pics = get_name_list("Girl2", filters, intensities, ".jpg")
-
-    girl_one_design = get_design_for_picture(girl_one_pics)
-    girl_two_design = get_design_for_picture(girl_two_pics)
-
-    design = girl_one_design + girl_two_design
-    design = shuffle_left_right_pic(design)
-
-    npdesign = np.asarray(design)
-    np.random.shuffle(npdesign)
-    write_to_csv(npdesign)
+    # all pairs within each scene, half of them swapped left/right, no image
+    # twice in a row and at most 3 trials of the same scene in a row
+    table = stimulus_table(["Girl1", "Girl2"], filters, intensities, ".jpg")
+    design = pair_design(table, np.random.default_rng(), max_run=3)
+
+    # every image must exist, before the design file is written
+    names = [row[0] for row in design] + [row[1] for row in design]
+    problems = check(scan([imagedir]), imagedir, names, list(range(len(design))) * 2)
+    if problems:
+        print("\n".join(problems))
+        raise SystemExit("design not written, %d problems with the images in %s" % (len(problems), imagedir))
+    write_to_csv(design)
 
 
 if __name__ == "__main__":
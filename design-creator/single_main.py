@@ -2,6 +2,10 @@ import random
 import numpy as np
 import csv
 from pathlib import Path
+from catalog import scan, check
+
+## folder the experiment loads the images from
+imagedir = str(Path(__file__).resolve().parent.parent / "rating-experiments" / "single_images_tiny")
 
 
 def get_name_list(name, filters, intensities, file_type):
@@ -82,6 +86,12 @@ def main():
 
     npdesign = np.asarray(design)
     np.random.shuffle(npdesign)
+
+    # every image must exist, before the design file is written
+    problems = check(scan([imagedir]), imagedir, npdesign[:, 0])
+    if problems:
+        print("\n".join(problems))
+        raise SystemExit("design not written, %d problems with the images in %s" % (len(problems), imagedir))
     write_to_csv(npdesign)
 
 
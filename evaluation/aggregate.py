@@ -0,0 +1,146 @@
+"""
+Grouped counting of the experiment results.
+
+Results files of any number of observers are read into one table, a
+dictionary of equally long NumPy columns, with the derived columns
+observer (from the file name, chris_pair_result_1.csv -> chris) and scene
+(from the image name). Counts are computed in a single np.bincount over
+the combined categorical codes of the group keys, for any keys, e.g.
+observer, usage, scene, filter, intensity, and returned as a tidy table
+(one row per combination of the keys, with 'count' and 'proportion'),
+ready for plotting or pd.DataFrame(table).
+
+Usage:
+
+table = read_results(glob.glob('../rating-experiments/pair_results/*.csv'))
+counts = count(table, ['chosen_f_og', 'chosen_i'], within=['chosen_f_og'])
+counts = count(table, ['observer', 'chosen_i'],
+               categories={'chosen_i': [0, 25, 50, 75, 100]})
+
+"""
+
+import csv
+from pathlib import Path
+import numpy as np
+
+## columns of older results files and their current names
+ALIASES = {'User': 'usage', 'user': 'usage', 'filter_a': 'f_a_og', 'filter_b': 'f_b_og',
+           'intensity_a': 'i_a', 'intensity_b': 'i_b',
+           'selected_filter': 'chosen_f_og', 'selected_intensity': 'chosen_i'}
+
+## numeric columns
+INT_COLUMNS = {'i_a', 'i_b', 'chosen_i', 'intensity', 'response', 'seed'}
+FLOAT_COLUMNS = {'resptime'}
+
+
+def observer_name(filename):
+    """ Observer of a results file: chris_pair_result_1.csv -> chris, or the
+    file name for files without an observer prefix """
+    stem = Path(filename).stem
+    for marker in ('_pair_result', '_single_result'):
+        if marker in stem:
+            return stem.split(marker)[0]
+    return stem
+
+
+def scene_name(image):
+    """ Scene of an image file: Girl1_Lark_75.jpg -> Girl1 """
+    return image.split('_', 1)[0]
+
+
+def _column(values, name):
+    """ Typed NumPy column """
+    if name in INT_COLUMNS:
+        return np.asarray([int(v) if v != '' else -1 for v in values])
+    if name in FLOAT_COLUMNS:
+        return np.asarray([float(v) if v != '' else np.nan for v in values])
+    return np.asarray(values, dtype=object)
+
+
+def read_results(files):
+    """ Reads results files (pair or single) into one table """
+    rows = []
+    for filename in files:
+        with open(filename, newline='') as f:
+            observer = observer_name(filename)
+            for row in csv.DictReader(f):
+                row['observer'] = observer
+                row['file'] = str(filename)
+                rows.append(row)
+    return from_rows(rows)
+
+
+def from_rows(rows):
+    """ Table of results rows (dictionaries with observer and file), e.g. of
+    a results database (rating-experiments/resultsdb.py) """
+    columns = {}
+    nrows = 0
+    for row in rows:
+        row = {ALIASES.get(k, k): v for k, v in row.items()}
+        for k, v in row.items():
+            # columns missing in earlier files are empty there
+            if k not in columns:
+                columns[k] = [''] * nrows
+            columns[k].append(v)
+        nrows += 1
+        for v in columns.values():
+            if len(v) < nrows:
+                v.append('')
+
+    table = {k: _column(v, k) for k, v in columns.items()}
+    # image of a single trial, or left image of a pair (same scene as the right one)
+    image = [''] * nrows
+    for key in ('image_a', 'image'):
+        if key in table:
+            image = np.where(table[key] != '', table[key], image)
+    table['scene'] = np.asarray([scene_name(i) for i in image], dtype=object)
+    return table
+
+
+def select(table, mask):
+    """ Rows of a table where mask is True """
+    return {k: v[mask] for k, v in table.items()}
+
+
+def count(table, by, within=None, categories=None, dropzero=False):
+    """ Number of rows for every combination of the values of the columns
+    'by', and their proportion within the groups of the columns 'within'
+    (of all rows if None). Values not in 'categories' (key -> ordered list
+    of values) are left out; without categories all values that occur are
+    used. Combinations without rows are kept with count 0, unless dropzero.
+    Returns a tidy table. """
+
+    categories = categories or {}
+    within = within or []
+    keep = np.ones(len(table[by[0]]), dtype=bool)
+    levels, codes = [], []
+    for key in by:
+        if key in categories:
+            level = np.asarray(categories[key], dtype=table[key].dtype)
+            order = np.argsort(level)
+            position = np.searchsorted(level[order], table[key])
+            position = np.minimum(position, len(level) - 1)
+            found = level[order][position] == table[key]
+            code = order[position]
+            keep &= found
+        else:
+            level, code = np.unique(table[key], return_inverse=True)
+        levels.append(level)
+        codes.append(code)
+
+    shape = tuple(len(level) for level in levels)
+    index = np.ravel_multi_index([c[keep] for c in codes], shape)
+    counts = np.bincount(index, minlength=int(np.prod(shape))).reshape(shape)
+
+    # denominators: sums over the keys that are not in 'within'
+    axes = tuple(i for i, key in enumerate(by) if key not in within)
+    totals = counts.sum(axis=axes, keepdims=True)
+    proportions = counts / np.where(totals > 0, totals, 1)
+
+    grid = np.indices(shape).reshape(len(by), -1)
+    result = {key: levels[i][grid[i]] for i, key in enumerate(by)}
+    result['count'] = counts.ravel()
+    result['proportion'] = proportions.ravel()
+    if dropzero:
+        result = select(result, result['count'] > 0)
+    return result
@@ -0,0 +1,173 @@
+"""
+Live dashboard of running rating experiment sessions.
+
+Listens on the UDP port the experiment publishes its saved trials to
+(publish_address in rating-experiments/experiment.py) and keeps running
+statistics, every one updated in constant time per trial:
+
+    pair        how often each filter and intensity was chosen, and an
+                online Bradley-Terry scale of the images (one stochastic
+                gradient step per trial, like an Elo rating)
+    single      number of ratings and mean rating per filter and intensity
+    both        response time histogram (log spaced bins) per paradigm
+
+The dashboard is redrawn in the terminal at most every refresh seconds.
+The online scale follows the data without refitting; the exact maximum
+likelihood scale of the finished sessions comes from scaling.py.
+
+Results files given on the command line are read first, so the dashboard
+starts from the trials already saved (e.g. when it is started late).
+
+Usage:
+
+python live.py
+python live.py --port 5005 ../rating-experiments/pair_results/pair_result_3.csv
+
+"""
+
+import csv
+import json
+import math
+import socket
+import sys
+import time
+from collections import defaultdict
+from aggregate import ALIASES
+
+## address the experiment publishes to
+HOST = '127.0.0.1'
+PORT = 5005
+
+## response time histogram: log spaced bins between rt_min and rt_max seconds
+rt_min = 0.1
+rt_max = 10.0
+rt_bins = 20
+
+## step size of the online Bradley-Terry scale
+bt_rate = 0.1
+
+## seconds between redraws of the dashboard
+refresh = 0.5
+
+
+class LiveStats:
+    """ Running statistics of the published trials """
+
+    def __init__(self):
+        self.ntrials = defaultdict(int)  # paradigm -> trials
+        self.sessions = set()
+        self.chosen = defaultdict(int)  # (filter, intensity) -> times chosen
+        self.strength = defaultdict(float)  # image -> online Bradley-Terry score
+        self.ratings = defaultdict(lambda: [0, 0.0])  # (filter, intensity) -> [n, sum]
+        self.rt = defaultdict(lambda: [0] * (rt_bins + 2))  # paradigm -> under, bins, over
+
+    def add(self, paradigm, row, session=None):
+        """ Adds one trial (a results row as a dictionary) """
+        row = {ALIASES.get(k, k): v for k, v in row.items()}
+        self.ntrials[paradigm] += 1
+        if session is not None:
+            self.sessions.add(session)
+
+        if paradigm == 'pair':
+            self.chosen[(row['chosen_f_og'], int(row['chosen_i']))] += 1
+            if row['left_right'] == 'right':
+                winner, loser = row['image_b'], row['image_a']
+            else:
+                winner, loser = row['image_a'], row['image_b']
+            p = 1.0 / (1.0 + math.exp(self.strength[loser] - self.strength[winner]))
+            self.strength[winner] += bt_rate * (1 - p)
+            self.strength[loser] -= bt_rate * (1 - p)
+        else:
+            rating = self.ratings[(row['filter'], int(row['intensity']))]
+            rating[0] += 1
+            rating[1] += float(row['response'])
+
+        if row.get('resptime', '') != '':  # not in the oldest results files
+            self.rt[paradigm][self.rt_bin(float(row['resptime']))] += 1
+
+    @staticmethod
+    def rt_bin(resptime):
+        """ Histogram bin of a response time, 0 and rt_bins + 1 for out of range """
+        if not resptime >= rt_min:
+            return 0
+        if resptime >= rt_max:
+            return rt_bins + 1
+        return 1 + int(rt_bins * math.log(resptime / rt_min) / math.log(rt_max / rt_min))
+
+    def render(self, top=10):
+        """ Dashboard as text """
+        lines = ['%d sessions, %s' % (len(self.sessions), ', '.join(
+            '%d %s trials' % (n, p) for p, n in sorted(self.ntrials.items())))]
+
+        if self.chosen:
+            lines += ['', 'Chosen (pair)']
+            total = sum(self.chosen.values())
+            for (f, i), n in sorted(self.chosen.items()):
+                lines.append('  %-10s %3d  %4d  %5.1f%%' % (f, i, n, 100.0 * n / total))
+            lines += ['', 'Online Bradley-Terry scale, top %d' % top]
+            ranked = sorted(self.strength.items(), key=lambda item: -item[1])
+            for image, s in ranked[:top]:
+                lines.append('  %-28s %6.2f' % (image, s))
+
+        if self.ratings:
+            lines += ['', 'Mean rating (single)']
+            for (f, i), (n, total) in sorted(self.ratings.items()):
+                lines.append('  %-10s %3d  %4d  %4.2f' % (f, i, n, total / n))
+
+        edges = [rt_min * (rt_max / rt_min) ** (k / rt_bins) for k in range(rt_bins + 1)]
+        for paradigm, counts in sorted(self.rt.items()):
+            lines += ['', 'Response times (%s), s' % paradigm]
+            peak = max(counts) or 1
+            labels = ['< %.2f' % rt_min] + ['%.2f' % e for e in edges[:-1]] + ['>= %.1f' % rt_max]
+            for label, n in zip(labels, counts):
+                lines.append('  %8s %4d %s' % (label, n, '#' * round(40 * n / peak)))
+        return '\n'.join(lines)
+
+
+def read_file(stats, filename):
+    """ Adds the trials already saved in a results file """
+    paradigm = 'single' if 'single_result' in filename else 'pair'
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            stats.add(paradigm, row, filename)
+
+
+def listen(stats, host=HOST, port=PORT):
+    """ Receives the published trials and redraws the dashboard """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.settimeout(refresh)
+    drawn = 0.0
+    changed = True
+    while True:
+        try:
+            data, _ = sock.recvfrom(65536)
+            message = json.loads(data.decode('utf-8'))
+            stats.add(message['paradigm'], message['row'], message['session'])
+            changed = True
+        except socket.timeout:
+            pass
+        except (ValueError, KeyError) as e:
+            print('Skipped a message: %s' % e)
+        if changed and time.monotonic() - drawn >= refresh:
+            print('\033[2J\033[H' + stats.render(), flush=True)  # clears the terminal
+            drawn = time.monotonic()
+            changed = False
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    port = PORT
+    if '--port' in args:
+        i = args.index('--port')
+        port = int(args[i + 1])
+        del args[i:i + 2]
+
+    stats = LiveStats()
+    for filename in args:
+        read_file(stats, filename)
+    try:
+        listen(stats, port=port)
+    except KeyboardInterrupt:
+        pass
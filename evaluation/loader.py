@@ -0,0 +1,156 @@
+"""
+Bulk loading of all results files, with a columnar cache.
+
+discover() finds the results files of all observers (pair_results/*.csv and
+single_results/*.csv, without the timing sidecars), load_results() reads
+them into one table like aggregate.read_results, with the derived columns
+
+    observer    from the file name (chris_pair_result_1.csv -> chris)
+    scene       from the image name (Girl1_Lark_75.jpg -> Girl1)
+    filter      filter of the image (single), or of the chosen image (pair)
+
+Every parsed file is kept in a typed cache, one pickle per results folder
+with an entry per file: text columns as categorical codes plus their
+categories, numbers as they are. The cache of a folder is read once per
+load_results, and an entry is only used while the modification time and
+size of its results file are unchanged, so running an analysis again only
+parses the files that are new or changed.
+
+Usage:
+
+table = load_results(discover('../rating-experiments', 'pair'))
+table = load_results(discover('../rating-experiments', 'single'), cache_dir='.cache')
+
+Trials written into a results database (rating-experiments/resultsdb.py)
+are loaded with load_database, only those of the observers, scenes,
+filters or intensities asked for:
+
+table = load_database('../rating-experiments/results.db', paradigm='pair', filter=['Lark', 'Juno'])
+
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+from aggregate import read_results, from_rows, INT_COLUMNS, FLOAT_COLUMNS
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'rating-experiments'))
+from resultsdb import query
+
+## default location of the cache, next to this file
+CACHE_DIR = str(Path(__file__).resolve().parent / '.cache')
+
+## version of the parsed tables, entries of other versions are parsed again
+CACHE_VERSION = 3
+
+
+def discover(root='../rating-experiments', kind='pair'):
+    """ Results files of all observers of a kind ('pair' or 'single') """
+    files = sorted(Path(root).glob('%s_results/*.csv' % kind))
+    return [str(f) for f in files if not f.stem.endswith('_timing')]
+
+
+def _cache_file(folder, cache_dir):
+    """ Cache of the results files in a folder """
+    key = '%s:%d' % (os.path.abspath(folder), CACHE_VERSION)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return Path(cache_dir) / (digest + '.pickle')
+
+
+def _encode(table):
+    """ Table -> cache entry: text columns as categories and codes """
+    columns = {}
+    for k, v in table.items():
+        if v.dtype == object:
+            categories, codes = np.unique(v.astype(str), return_inverse=True)
+            columns[k] = (categories.astype(object), codes.astype(np.int32))
+        else:
+            columns[k] = v
+    return columns
+
+
+def _decode(columns):
+    return {k: v[0][v[1]] if isinstance(v, tuple) else v for k, v in columns.items()}
+
+
+def _read_cache(cache):
+    """ Entries of a folder cache, file name -> (mtime, size, columns) """
+    try:
+        with open(cache, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def _parse(filename):
+    """ Reads a results file and adds the derived columns """
+    table = read_results([filename])
+    if 'chosen_f_og' in table:
+        table['filter'] = table['chosen_f_og']
+    return table
+
+
+def _empty(k, n):
+    """ Column of n missing values """
+    if k in INT_COLUMNS:
+        return np.full(n, -1)
+    if k in FLOAT_COLUMNS:
+        return np.full(n, np.nan)
+    return np.full(n, '', dtype=object)
+
+
+def concat(tables):
+    """ Rows of several tables in one, missing columns are left empty """
+    keys = []
+    for t in tables:
+        keys += [k for k in t if k not in keys]
+    sizes = [len(next(iter(t.values()))) if t else 0 for t in tables]
+    return {k: np.concatenate([t[k] if k in t else _empty(k, n) for t, n in zip(tables, sizes)])
+            for k in keys}
+
+
+def load_results(files, cache_dir=CACHE_DIR):
+    """ One table with the rows of all results files """
+    folders = defaultdict(list)
+    for filename in files:
+        folders[os.path.dirname(os.path.abspath(filename))].append(filename)
+
+    tables = {}
+    for folder, names in folders.items():
+        cache = _cache_file(folder, cache_dir)
+        entries = _read_cache(cache)
+        changed = False
+        for filename in names:
+            stat = os.stat(filename)
+            name = os.path.basename(filename)
+            entry = entries.get(name)
+            if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                entry = entries[name] = (stat.st_mtime_ns, stat.st_size, _encode(_parse(filename)))
+                changed = True
+            tables[filename] = _decode(entry[2])
+
+        if changed:
+            # entries of removed files are dropped
+            entries = {k: v for k, v in entries.items() if os.path.exists(os.path.join(folder, k))}
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            # written next to the cache and renamed, a crash never leaves half a file
+            tmp = cache.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+    return concat([tables[f] for f in files])
+
+
+def load_database(filename, **where):
+    """ Table of the trials in a results database that match where (paradigm,
+    observer, usage, scene, filter, intensity: a value or a list of values).
+    Sessions without an observer id have the observer None, their column
+    session tells them apart """
+    table = from_rows(query(filename, **where))
+    if 'chosen_f_og' in table:
+        table['filter'] = table['chosen_f_og']
+    return table
@@ -1,47 +1,28 @@
-import csv
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
+from aggregate import count
+from loader import discover, load_results
 
 
-filename = "pair-chris.csv"
+# results files from the command line, all pair results otherwise
+files = sys.argv[1:] or discover("../rating-experiments", "pair")
 
-filters = []
-intensities = []
-f_i = []
+# parsed files are cached, only new or changed files are read again
+table = load_results(files)
 
-with open(filename, 'r') as csvfile:
-    # creating a csv reader object
-    csvreader = csv.reader(csvfile)
-
-    # extracting field names through first row
-    fields = next(csvreader)
-
-    # extracting each data row one by one
-    for row in csvreader:
-        f_i.append([row[7], int(row[8])])
-        intensities.append(int(row[8]))
-
-filter_results = []
 ints = [0, 25, 50, 75, 100]
+filter_types = ["OG", "Clarendon", "Juno", "Lark"]
 
-filter_results = dict({"OG": [], "Clarendon": [], "Juno": [], "Lark": []})
-
-for filter_type in filter_results.keys():
-    for intensity in ints:
-        count = 0
-
-        for row in f_i:
-            if row[0] == filter_type and row[1] == intensity:
-                count += 1
-
-        filter_results[filter_type].append(count)
-
+# how often each filter and intensity was chosen
+counts = count(table, ['chosen_f_og', 'chosen_i'],
+               categories={'chosen_f_og': filter_types, 'chosen_i': ints})
 
-total_results = []
-np_ints = np.asarray(intensities)
-for i in ints:
-    total_results.append(np.count_nonzero(np_ints == i))
+filter_results = {}
+for filter_type in filter_types:
+    filter_results[filter_type] = counts['count'][counts['chosen_f_og'] == filter_type]
 
+total_results = count(table, ['chosen_i'], categories={'chosen_i': ints})['count']
 
 
 labels = ["0", "25", "50", "75", "100"]
@@ -59,7 +40,7 @@ rects4 = ax.bar(x + 2*width, filter_results["Juno"], width, label='Juno')
 
 ax.set_xticks(x)
 ax.set_xticklabels(labels)
-plt.title("Pair Experiment")
+plt.title("Pair Experiment (%d observers)" % len(set(table['observer'])))
 plt.xlabel("Filter Intensities")
 ax.legend()
 
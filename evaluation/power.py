@@ -0,0 +1,216 @@
+"""
+Monte Carlo power analysis of the pair experiment.
+
+How many observers and trials are needed to detect a difference in the
+preferred filter intensity between social media users and non-users?
+Synthetic observers answer the pair experiment, many times, and every
+replication is analysed like the real results:
+
+    design      every observer gets a design of design_engine.pair_design
+                (the generator of design-creator/main.py), its first
+                'trials' rows (more than one design in a row if needed)
+    preference  an image of intensity i has the utility
+                -((i - ideal) / width) ** 2 for an observer, the ideal
+                intensity is drawn per observer from a normal distribution
+                with the mean of the group (user / non-user) and sd spread
+    detection   two images look different with the probability
+                1 - exp(-(d / threshold) ** slope), d the difference in
+                intensity for the same filter, i_a + i_b for two filters
+                (the distance over the original). If not, the observer
+                guesses; lapse is the rate of random answers
+    analysis    the counts of chosen_i per observer with aggregate.count
+                (as in main.py), the mean chosen intensity per observer,
+                and a two-sided permutation test of the difference of the
+                group means at level alpha
+
+The choices are drawn for a batch of replications and all observers at
+once (arrays replication x observer x trial), and the replications are
+split into chunks that run on a process pool. Within a chunk the designs
+are drawn once and shared by its replications (the trial order does not
+matter for the model or the analysis).
+
+Usage:
+
+python power.py
+python power.py --observers 5,10,20,40 --trials 78,156,312 --effect 15 --reps 2000
+python power.py --effect 0      # false positive rate instead of power
+
+curves = power_curves([5, 10, 20], [156], dict(MODEL, effect=10), reps=1000)
+
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from aggregate import count
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'design-creator'))
+from design_engine import stimulus_table, pair_design
+
+## stimuli of the pair experiment (design-creator/main.py)
+SCENES = ['Girl1', 'Girl2']
+FILTERS = ['OG', 'Clarendon', 'Lark', 'Juno']
+INTENSITIES = ['25', '50', '75', '100']
+
+## observer model, intensities in percent of the full filter. effect is the
+## difference of the mean ideal intensities, users minus non-users
+MODEL = {'ideal': 50.0, 'effect': 15.0, 'spread': 20.0, 'width': 40.0,
+         'threshold': 10.0, 'slope': 2.0, 'lapse': 0.02}
+
+## significance level and permutations of the test
+alpha = 0.05
+permutations = 999
+
+## replications simulated at once in a chunk (memory: batch x observers x trials)
+replication_batch = 100
+
+
+def draw_designs(nobservers, trials, rng):
+    """ Filter codes and intensities of the left and right image of the
+    first trials of one design per observer, arrays (observers x trials) """
+    table = stimulus_table(SCENES, FILTERS, INTENSITIES, '.jpg')
+    columns = [[], [], [], []]
+    for _ in range(nobservers):
+        rows = []
+        while len(rows) < trials:
+            rows += list(pair_design(table, rng))
+        rows = np.asarray(rows[:trials])
+        for j, (column, as_code) in enumerate([(2, True), (3, True), (4, False), (5, False)]):
+            values = rows[:, column]
+            columns[j].append([FILTERS.index(v) for v in values] if as_code else values.astype(int))
+    return [np.asarray(c) for c in columns]
+
+
+def choose(f_a, f_b, i_a, i_b, ideal, model, rng):
+    """ Intensities of the chosen images, for the ideal intensities of a
+    batch of replications (batch x observers) """
+    ideal = ideal[..., None]
+    utility_a = -((i_a - ideal) / model['width']) ** 2
+    utility_b = -((i_b - ideal) / model['width']) ** 2
+    preferred = 1.0 / (1.0 + np.exp(utility_b - utility_a))  # p(a over b)
+
+    difference = np.where(f_a == f_b, np.abs(i_a - i_b), i_a + i_b)
+    detected = 1.0 - np.exp(-(difference / model['threshold']) ** model['slope'])
+    p = model['lapse'] / 2 + (1 - model['lapse']) * (0.5 + detected * (preferred - 0.5))
+    return np.where(rng.random(p.shape) < p, i_a, i_b)
+
+
+def observer_means(chosen):
+    """ Mean chosen intensity of every observer (batch x observers), from
+    the counts of aggregate.count """
+    batch, nobservers, trials = chosen.shape
+    ints = [0] + [int(i) for i in INTENSITIES]
+    table = {'replication': np.repeat(np.arange(batch), nobservers * trials),
+             'observer': np.tile(np.repeat(np.arange(nobservers), trials), batch),
+             'chosen_i': chosen.ravel()}
+    counts = count(table, ['replication', 'observer', 'chosen_i'], within=['replication', 'observer'],
+                   categories={'replication': range(batch), 'observer': range(nobservers), 'chosen_i': ints})
+    return counts['proportion'].reshape(batch, nobservers, len(ints)) @ np.asarray(ints, dtype=float)
+
+
+def permutation_test(means, groups, rng):
+    """ Two-sided p-values of the difference of the group means (1 minus 0),
+    for every row of means (batch x observers) """
+    weights = np.where(groups == 1, 1.0 / (groups == 1).sum(), -1.0 / (groups == 0).sum())
+    shuffled = np.stack([rng.permutation(weights) for _ in range(permutations)])
+    observed = np.abs(means @ weights)
+    null = np.abs(means @ shuffled.T)
+    return (1 + (null >= observed[:, None] - 1e-12).sum(axis=1)) / (permutations + 1)
+
+
+def _simulate_chunk(args):
+    """ Significant replications and mean differences of one chunk (runs in
+    a worker process) """
+    nper_group, trials, model, reps, seed = args
+    rng = np.random.default_rng(seed)
+    nobservers = 2 * nper_group
+    groups = np.repeat([1, 0], nper_group)  # users first
+    f_a, f_b, i_a, i_b = draw_designs(nobservers, trials, rng)
+    center = model['ideal'] + np.where(groups == 1, model['effect'] / 2, -model['effect'] / 2)
+
+    significant, differences = [], []
+    for size in np.diff(np.r_[0:reps:replication_batch, reps]):
+        ideal = center + model['spread'] * rng.standard_normal((size, nobservers))
+        means = observer_means(choose(f_a, f_b, i_a, i_b, ideal, model, rng))
+        significant.append(permutation_test(means, groups, rng) < alpha)
+        differences.append(means[:, groups == 1].mean(axis=1) - means[:, groups == 0].mean(axis=1))
+    return np.concatenate(significant), np.concatenate(differences)
+
+
+def power_curves(observers, trials, model=None, reps=1000, seed=None, workers=None):
+    """ Power (proportion of significant replications) for every number of
+    observers per group and of trials per observer, arrays (observers x
+    trials), with the mean difference of the group means """
+    model = model or MODEL
+    workers = workers or os.cpu_count() or 1
+    sizes = [len(c) for c in np.array_split(np.arange(reps), workers) if len(c)]
+    cells = [(n, t) for n in observers for t in trials]
+    seeds = np.random.SeedSequence(seed).spawn(len(cells) * len(sizes))
+    chunks = [(n, t, model, size, seeds[i * len(sizes) + j])
+              for i, (n, t) in enumerate(cells) for j, size in enumerate(sizes)]
+
+    if workers <= 1:
+        results = [_simulate_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_simulate_chunk, chunks))
+
+    shape = (len(observers), len(trials))
+    power, difference = np.zeros(len(cells)), np.zeros(len(cells))
+    for i in range(len(cells)):
+        cell = results[i * len(sizes):(i + 1) * len(sizes)]
+        power[i] = np.concatenate([s for s, _ in cell]).mean()
+        difference[i] = np.concatenate([d for _, d in cell]).mean()
+    return power.reshape(shape), difference.reshape(shape)
+
+
+def plot(observers, trials, power, filename):
+    """ Power curves over the observers per group, one line per number of trials """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for j, t in enumerate(trials):
+        ax.plot(observers, power[:, j], marker='o', label='%d trials' % t)
+    ax.axhline(0.8, color='grey', linestyle='--', linewidth=1)
+    ax.set_ylim(0, 1)
+    ax.set_xlabel('Observers per group')
+    ax.set_ylabel('Power')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(filename)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    options = {'--observers': '5,10,15,20,30,40', '--trials': '78,156', '--reps': '1000', '--seed': None,
+               '--out': None}
+    options.update({'--' + k: None for k in MODEL})
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    if args:
+        print('usage: python power.py [--observers 5,10,20] [--trials 78,156] [--reps 1000] [--seed 0] '
+              '[--out power.png] [--%s <value> ...]' % ' | --'.join(MODEL))
+        sys.exit(1)
+
+    observers = [int(v) for v in options['--observers'].split(',')]
+    trials = [int(v) for v in options['--trials'].split(',')]
+    model = {k: v if options['--' + k] is None else float(options['--' + k]) for k, v in MODEL.items()}
+    seed = int(options['--seed']) if options['--seed'] else None
+    power, difference = power_curves(observers, trials, model, int(options['--reps']), seed)
+
+    print(', '.join('%s %g' % item for item in model.items()))
+    print('%-10s' % 'observers' + ''.join('%14s' % ('%d trials' % t) for t in trials))
+    for i, n in enumerate(observers):
+        print('%-10d' % n + ''.join('%8.3f (%+3.0f)' % (power[i, j], difference[i, j])
+                                    for j in range(len(trials))))
+    if options['--out']:
+        plot(observers, trials, power, options['--out'])
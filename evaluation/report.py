@@ -0,0 +1,196 @@
+"""
+Report of the pair experiment: all figures of the evaluation notebook in
+one run.
+
+Every figure is declared in FIGURES, as the counts of the chosen intensity
+split by up to three columns of the results table:
+
+    rows, cols  one panel per value (e.g. scene, chosen_f, usage)
+    series      one bar group or line per value in every panel
+    statistic   'count' (trials), or 'mean' (mean and standard deviation
+                of the counts of the observers in a series)
+    kind        'bar' or 'line'
+
+The counts are computed in the main process with aggregate.count (one
+bincount per figure), the figures are drawn in a process pool with the Agg
+backend. A hash of the declaration and the data of every figure is kept
+next to the figures (report_hashes.json), figures whose hash did not change
+are not drawn again.
+
+Usage:
+
+python report.py
+python report.py --out ../double_auswertung ../rating-experiments/pair_results/*.csv
+
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from aggregate import count
+from loader import discover, load_results
+
+## values shown, in this order
+CATEGORIES = {'chosen_i': [0, 25, 50, 75, 100],
+              'usage': ['yes', 'no'],
+              'chosen_f': ['Clarendon', 'Juno', 'Lark']}
+
+## names of the values in legends and titles
+LABELS = {'yes': 'User', 'no': 'Non-User'}
+PANEL_LABELS = {'yes': 'Social Media Users', 'no': 'Non-Social Media Users'}
+
+## figures of the report
+FIGURES = [
+    dict(file='Pref_ints_bar.png', kind='bar', series='usage', title='Preferred Intensities'),
+    dict(file='Pref_ints_graph.png', kind='line', series='usage', title='Preferred Intensities'),
+    dict(file='Pref_ints_groups.png', kind='line', cols='usage', series='observer'),
+    dict(file='group_abs.png', kind='bar', rows='scene', cols='chosen_f', series='usage'),
+    dict(file='group_graph.png', kind='line', cols='chosen_f', series='usage'),
+    dict(file='mean_group.png', kind='line', cols='chosen_f', series='usage', statistic='mean'),
+    dict(file='means.png', kind='bar', series='usage', statistic='mean', title='Preferred Intensities'),
+]
+
+## resolution of the saved figures
+dpi = 300
+
+
+def levels(table, key):
+    """ Values of a column in the order of CATEGORIES, or sorted """
+    if key in CATEGORIES:
+        return CATEGORIES[key]
+    return sorted(set(table[key]))
+
+
+def figure_data(table, spec):
+    """ Counts of the chosen intensities for a figure: values (rows x cols x
+    series x intensities), with the standard deviation for means, and the
+    names of the rows, cols and series """
+    keys = [k for k in (spec.get('rows'), spec.get('cols'), spec.get('series')) if k]
+    categories = {k: levels(table, k) for k in keys + ['chosen_i']}
+    names = {axis: categories[spec[axis]] if spec.get(axis) else [''] for axis in ('rows', 'cols', 'series')}
+    shape = tuple(len(names[axis]) for axis in ('rows', 'cols', 'series')) + (len(categories['chosen_i']),)
+
+    if spec.get('statistic', 'count') == 'count':
+        counts = count(table, keys + ['chosen_i'], categories=categories)['count']
+        values, sd = counts.reshape(shape).astype(float), np.zeros(shape)
+    else:
+        # counts of every observer, averaged over the observers of a series
+        categories['observer'] = levels(table, 'observer')
+        by = keys + ['observer', 'chosen_i']
+        counts = count(table, by, categories=categories)['count'].astype(float)
+        counts = counts.reshape(shape[:-1] + (len(categories['observer']), shape[-1]))
+        if spec.get('series'):
+            member = count(table, [spec['series'], 'observer'], categories=categories)['count']
+            member = member.reshape(shape[2], -1) > 0
+        else:
+            member = np.ones((1, len(categories['observer'])), dtype=bool)
+        member = member[None, None, :, :, None]
+        n = np.maximum(member.sum(axis=3), 1)
+        values = (counts * member).sum(axis=3) / n
+        sd = np.sqrt((((counts - values[:, :, :, None]) ** 2) * member).sum(axis=3) / n)
+
+    return {'values': values, 'sd': sd,
+            'rows': [str(v) for v in names['rows']], 'cols': [str(v) for v in names['cols']],
+            'series': [str(v) for v in names['series']],
+            'intensities': [str(v) for v in categories['chosen_i']]}
+
+
+def data_hash(spec, data):
+    """ Hash of the declaration and the data of a figure """
+    digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8'))
+    for k in sorted(data):
+        value = data[k]
+        digest.update(value.tobytes() if isinstance(value, np.ndarray) else json.dumps(value).encode('utf-8'))
+    digest.update(str(dpi).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def draw(job):
+    """ Draws and saves one figure (runs in a worker process) """
+    spec, data, path = job
+    values, sd = data['values'], data['sd']
+    nrows, ncols, nseries, nints = values.shape
+    x = np.arange(nints)
+    width = 0.7 / nseries
+    mean = spec.get('statistic', 'count') == 'mean'
+
+    fig, axis = plt.subplots(nrows=nrows, ncols=ncols, sharey=True, squeeze=False,
+                             figsize=(5 + 7 * ncols, 7 * nrows))
+    for r in range(nrows):
+        for c in range(ncols):
+            ax = axis[r, c]
+            for s in range(nseries):
+                label = LABELS.get(data['series'][s], data['series'][s].capitalize())
+                if spec['kind'] == 'bar':
+                    offset = (s - (nseries - 1) / 2) * width
+                    bars = ax.bar(x + offset, values[r, c, s], width=width, label=label,
+                                  yerr=sd[r, c, s] if mean else None)
+                    if not mean:
+                        ax.bar_label(bars)
+                else:
+                    ax.plot(x, values[r, c, s], linestyle='-', marker='o', label=label)
+            if spec['kind'] == 'line':
+                ax.grid()
+            ax.set_xticks(x)
+            ax.set_xticklabels(data['intensities'])
+            ax.set_xlabel('Intensity')
+            ax.set_ylabel('Mean of Frequency' if mean else 'Frequency')
+            title = ', '.join(PANEL_LABELS.get(v, v) for v in (data['rows'][r], data['cols'][c]) if v)
+            ax.set_title(title or spec.get('title', ''))
+            if nseries > 1:
+                ax.legend()
+
+    fig.savefig(path, dpi=dpi, bbox_inches='tight', pad_inches=0.3, facecolor='w')
+    plt.close(fig)
+    return path
+
+
+def build(files, out='report', workers=None, force=False):
+    """ Draws the figures whose data changed since the last report. Returns
+    the files drawn """
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = out / 'report_hashes.json'
+    hashes = json.loads(manifest.read_text()) if manifest.is_file() else {}
+
+    table = load_results(files)
+    jobs, new = [], {}
+    for spec in FIGURES:
+        data = figure_data(table, spec)
+        new[spec['file']] = data_hash(spec, data)
+        path = out / spec['file']
+        if force or hashes.get(spec['file']) != new[spec['file']] or not path.is_file():
+            jobs.append((spec, data, str(path)))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        drawn = [draw(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            drawn = list(pool.map(draw, jobs))
+
+    hashes.update(new)
+    manifest.write_text(json.dumps(hashes, indent=1, sort_keys=True))
+    return drawn
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    out = 'report'
+    if '--out' in args:
+        i = args.index('--out')
+        out = args[i + 1]
+        del args[i:i + 2]
+    force = '--force' in args
+    files = [a for a in args if a != '--force'] or discover("../rating-experiments", "pair")
+
+    drawn = build(files, out, force=force)
+    print('%d of %d figures drawn in %s' % (len(drawn), len(FIGURES), out))
@@ -0,0 +1,242 @@
+"""
+Paired comparison scaling of the pair experiment results.
+
+The results files (pair_results/*.csv of the rating experiment) are turned
+into a win matrix, wins[i, j] = number of times image i was preferred over
+image j, built in one np.bincount over the trials. From it, two scales:
+
+    bradley_terry   log strengths of the Bradley-Terry model,
+                    p(i over j) = 1 / (1 + exp(-(s_i - s_j))),
+                    maximum likelihood by Newton steps (method='newton') or
+                    by Hunter's MM algorithm (method='mm')
+    thurstone       Thurstone Case V scale values, least squares fit of
+                    s_i - s_j to the probit of the preference proportions,
+                    in units of the standard deviation of the differences
+
+Only images of the same scene are compared, so the scales are fitted
+separately for every connected set of images and centered to mean 0. A
+small prior (pseudo wins in both directions of every compared pair) keeps
+images that always or never won finite.
+
+Confidence intervals come from a bootstrap over trials, or over observers
+(resampling whole results files), computed in chunks on a process pool.
+
+Usage:
+
+python scaling.py ../rating-experiments/pair_results/*.csv
+python scaling.py --condition ../rating-experiments/pair_results/*.csv
+
+With --condition the images are pooled over scenes by filter and intensity
+(e.g. Lark_75), otherwise every image is scaled on its own.
+
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+from loader import load_results
+
+
+def condition_name(image):
+    """ Filter and intensity of an image file, without the scene:
+    Girl1_Lark_75.jpg -> Lark_75, Girl1_OG.jpg -> OG """
+    return image.rsplit('.', 1)[0].split('_', 1)[1]
+
+
+def load_pairs(files, condition=False):
+    """ Reads pair results files (through the cache of loader.py). Returns the
+    item names and, per trial, the codes of the preferred and the other item
+    and of the observer (file) """
+    table = load_results(files)
+    right = table['left_right'] == 'right'
+    preferred = np.where(right, table['image_b'], table['image_a'])
+    other = np.where(right, table['image_a'], table['image_b'])
+    _, observers = np.unique(table['file'], return_inverse=True)
+
+    names = np.concatenate([preferred, other])
+    if condition:
+        names = np.asarray([condition_name(n) for n in names])
+    items, codes = np.unique(names.astype(str), return_inverse=True)
+    n = len(preferred)
+    return items, codes[:n], codes[n:], observers
+
+
+def win_matrix(winners, losers, n):
+    """ wins[i, j]: number of trials in which i was preferred over j """
+    return np.bincount(winners * n + losers, minlength=n * n).reshape(n, n).astype(float)
+
+
+def components(compared):
+    """ Labels of the connected sets of items (compared: boolean matrix) """
+    n = len(compared)
+    labels = np.arange(n)
+    while True:
+        new = np.minimum(labels, np.where(compared, labels[None, :], n).min(axis=1))
+        if np.array_equal(new, labels):
+            return labels
+        labels = new[new]  # follow the labels, converges in log steps
+
+
+def _constraint(labels):
+    """ Averaging matrix of the connected sets: entry (i, j) is 1/size of the
+    set if i and j are in the same set. Added to a Hessian or Laplacian it
+    removes the free shift of every set """
+    same = labels[:, None] == labels[None, :]
+    return same / np.bincount(labels)[labels][:, None]
+
+
+def _center(scores, average):
+    """ Shifts the scores of every connected set to mean 0 """
+    return scores - scores @ average.T
+
+
+def _bradley_terry(wins, compared, average, method, prior, tol, max_iter):
+    """ Bradley-Terry fit of a stack of win matrices (..., n, n) """
+    wins = wins + prior * compared
+    total = wins + np.swapaxes(wins, -1, -2)
+    diagonal = np.arange(wins.shape[-1])
+
+    if method == 'mm':
+        # Hunter (2004): p_i = W_i / sum_j N_ij / (p_i + p_j)
+        won = wins.sum(axis=-1)
+        logp = np.zeros(wins.shape[:-1])
+        for _ in range(max_iter):
+            p = np.exp(logp)
+            denominator = (total / (p[..., :, None] + p[..., None, :])).sum(axis=-1)
+            # geometric mean 1 within every connected set
+            new = _center(np.log(won / denominator), average)
+            if np.abs(new - logp).max() < tol:
+                return new
+            logp = new
+        return logp
+
+    s = np.zeros(wins.shape[:-1])
+    for _ in range(max_iter):
+        prob = 1.0 / (1.0 + np.exp(-(s[..., :, None] - s[..., None, :])))  # p(i over j)
+        grad = (wins - total * prob).sum(axis=-1)
+        hessian = -total * prob * (1 - prob)
+        hessian[..., diagonal, diagonal] -= hessian.sum(axis=-1)
+        step = np.linalg.solve(hessian + average, grad[..., None])[..., 0]
+        s = _center(s + step, average)
+        if np.abs(step).max() < tol:
+            break
+    return s
+
+
+def bradley_terry(wins, method='newton', prior=0.5, tol=1e-8, max_iter=1000):
+    """ Bradley-Terry log strengths from a win matrix """
+    compared = (wins + wins.T) > 0
+    average = _constraint(components(compared))
+    return _bradley_terry(wins, compared, average, method, prior, tol, max_iter)
+
+
+_probit = np.frompyfunc(NormalDist().inv_cdf, 1, 1)
+
+
+def _thurstone(wins, compared, average, prior):
+    """ Thurstone Case V fit of a stack of win matrices (..., n, n) """
+    total = wins + np.swapaxes(wins, -1, -2)
+    proportion = (wins + prior) / (total + 2 * prior)
+    z = np.where(compared, _probit(proportion).astype(float), 0.0)
+
+    # weighted least squares of s_i - s_j = z_ij: laplacian system
+    diagonal = np.arange(wins.shape[-1])
+    laplacian = -total
+    laplacian[..., diagonal, diagonal] -= laplacian.sum(axis=-1)
+    b = (total * z).sum(axis=-1)
+    s = np.linalg.solve(laplacian + average, b[..., None])[..., 0]
+    return _center(s, average)
+
+
+def thurstone(wins, prior=0.5):
+    """ Thurstone Case V scale values from a win matrix """
+    compared = (wins + wins.T) > 0
+    return _thurstone(wins, compared, _constraint(components(compared)), prior)
+
+
+def fit(wins, compared, average, scale='bradley_terry', method='newton', prior=0.5):
+    """ Scale values of a stack of win matrices, with the compared pairs and
+    connected sets of the full data """
+    if scale == 'thurstone':
+        return _thurstone(wins, compared, average, prior)
+    return _bradley_terry(wins, compared, average, method, prior, 1e-8, 1000)
+
+
+## bootstrap replicates fitted at once in a stack (memory: batch x n x n)
+bootstrap_batch = 100
+
+
+def _bootstrap_chunk(args):
+    """ Bootstrap replicates of one chunk (runs in a worker process). The
+    resampled win matrices are drawn as multinomial counts, over the trial
+    cells or over the observers, and fitted as stacks """
+    cells, group_cells, n, nboot, seed, scale, method = args
+    rng = np.random.default_rng(seed)
+    full = cells.reshape(n, n)
+    compared = (full + full.T) > 0
+    average = _constraint(components(compared))
+
+    samples = []
+    for size in np.diff(np.r_[0:nboot:bootstrap_batch, nboot]):
+        if group_cells is None:
+            counts = rng.multinomial(int(cells.sum()), cells / cells.sum(), size=size)
+        else:
+            # whole observers, drawn with replacement
+            ngroups = len(group_cells)
+            counts = rng.multinomial(ngroups, np.full(ngroups, 1.0 / ngroups), size=size) @ group_cells
+        wins = counts.reshape(size, n, n).astype(float)
+        samples.append(fit(wins, compared, average, scale, method))
+    return np.concatenate(samples)
+
+
+def bootstrap(winners, losers, n, nboot=1000, groups=None, scale='bradley_terry',
+              method='newton', seed=None, workers=None):
+    """ Bootstrap distribution of the scale values (nboot x n), resampling trials
+    or, with groups (e.g. observer codes), whole groups. Chunks of replicates
+    run in parallel on a process pool. """
+    cells = np.bincount(winners * n + losers, minlength=n * n)
+    group_cells = None
+    if groups is not None:
+        _, groups = np.unique(groups, return_inverse=True)
+        group_cells = np.bincount(groups * n * n + winners * n + losers,
+                                  minlength=(groups.max() + 1) * n * n).reshape(-1, n * n)
+
+    workers = workers or os.cpu_count() or 1
+    sizes = [len(c) for c in np.array_split(np.arange(nboot), workers) if len(c)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [(cells, group_cells, n, size, s, scale, method) for size, s in zip(sizes, seeds)]
+
+    if len(chunks) == 1:
+        return _bootstrap_chunk(chunks[0])
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        return np.concatenate(list(pool.map(_bootstrap_chunk, chunks)))
+
+
+def confidence_intervals(samples, level=0.95):
+    """ Percentile intervals of the bootstrap samples """
+    alpha = (1 - level) / 2
+    return np.quantile(samples, alpha, axis=0), np.quantile(samples, 1 - alpha, axis=0)
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    condition = '--condition' in args
+    files = [a for a in args if a != '--condition']
+    if not files:
+        print('usage: python scaling.py [--condition] <pair results files>')
+        sys.exit(1)
+
+    items, winners, losers, observers = load_pairs(files, condition=condition)
+    wins = win_matrix(winners, losers, len(items))
+
+    bt = bradley_terry(wins)
+    th = thurstone(wins)
+    lower, upper = confidence_intervals(bootstrap(winners, losers, len(items), groups=observers))
+
+    print('%d trials, %d observers, %d items' % (len(winners), len(files), len(items)))
+    print('%-28s %8s %18s %10s' % ('item', 'BT', '95% CI (observers)', 'Thurstone'))
+    for i in np.argsort(-bt):
+        print('%-28s %8.2f   [%6.2f, %6.2f] %10.2f' % (items[i], bt[i], lower[i], upper[i], th[i]))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive pair selection (active sampling) for the pair experiment.
+
+Instead of running through all pairs of a design, the next pair is chosen
+from the responses so far. The scores of the images are estimated with a
+Bradley-Terry model (logistic version of Thurstone's model), p(i preferred
+over j) = 1 / (1 + exp(-(s_i - s_j))), with a normal prior on the scores.
+After every response the maximum a posteriori scores are refitted with a
+few Newton steps, and the inverse Hessian is taken as the covariance of the
+scores (Laplace approximation).
+
+The next pair is the one with the largest expected information gain, i.e.
+the largest expected reduction of the posterior entropy of the scores:
+
+    gain(i, j) = 0.5 * log(1 + p (1 - p) var(s_i - s_j))
+
+Pairs sharing an image with the previous trial are skipped. Only pairs
+within a scene are compared, so the scores are relative to the mean score
+of their scene. The session stops when the posterior standard deviation of
+every relative score is below target_sd (or after max_trials), which takes
+a number of trials roughly linear in the number of images, instead of
+quadratic for all pairs.
+
+The sampler is used by experiment.py (see rating_experiment_double.py,
+design argument 'adaptive'). It needs design-creator/ on sys.path.
+
+"""
+
+import numpy as np
+from design_engine import pairs_within, design_rows
+
+## design columns of the trials, as in design-creator/main.py
+FIELDS = ['image_a', 'image_b', 'f_a_og', 'f_b_og', 'i_a', 'i_b']
+
+
+class AdaptivePairs:
+    """ Chooses the pairs of a session by expected information gain """
+
+    def __init__(self, table, rng, target_sd=1.0, max_trials=None, min_trials=0,
+                 prior_sd=2.0, newton_steps=5):
+        self.table = table  # stimulus table of design_engine
+        self.rng = rng
+        self.target_sd = target_sd
+        self.max_trials = max_trials
+        self.min_trials = min_trials
+        self.prior_precision = 1.0 / prior_sd ** 2
+        self.newton_steps = newton_steps
+
+        self.candidates = pairs_within(table['scene'])  # pairs within each scene
+        self.index = {name: i for i, name in enumerate(table['image'])}
+
+        # scores relative to their scene mean: centering matrix
+        same_scene = table['scene'][:, None] == table['scene'][None, :]
+        self.center = np.eye(len(same_scene)) - same_scene / same_scene.sum(axis=1, keepdims=True)
+
+        n = len(table['image'])
+        self.scores = np.zeros(n)
+        self.cov = np.eye(n) / self.prior_precision
+        self.winners = []  # compared images, index of the preferred and the other one
+        self.losers = []
+        self.previous = None  # images of the last trial
+
+    def images(self):
+        """ All image files the sampler can choose from """
+        return list(self.table['image'])
+
+    def _derivatives(self, s, winners, losers):
+        """ Gradient and Hessian of the negative log posterior at the scores s """
+        n = len(s)
+        p = 1.0 / (1.0 + np.exp(-(s[winners] - s[losers])))
+        w = p * (1.0 - p)
+        grad = self.prior_precision * s \
+            - np.bincount(winners, 1.0 - p, n) + np.bincount(losers, 1.0 - p, n)
+        hessian = self.prior_precision * np.eye(n)
+        hessian[np.diag_indices(n)] += np.bincount(winners, w, n) + np.bincount(losers, w, n)
+        np.add.at(hessian, (winners, losers), -w)
+        np.add.at(hessian, (losers, winners), -w)
+        return grad, hessian
+
+    def fit(self):
+        """ Newton steps towards the MAP scores, then the Laplace covariance """
+        winners = np.asarray(self.winners, dtype=np.intp)
+        losers = np.asarray(self.losers, dtype=np.intp)
+        s = self.scores
+        for _ in range(self.newton_steps):
+            grad, hessian = self._derivatives(s, winners, losers)
+            s = s - np.linalg.solve(hessian, grad)
+        self.scores = s
+        # covariance at the scores that were returned, not before the last step
+        _, hessian = self._derivatives(s, winners, losers)
+        self.cov = np.linalg.inv(hessian)
+
+    def gains(self):
+        """ Expected information gain of every candidate pair """
+        i, j = self.candidates[:, 0], self.candidates[:, 1]
+        var = self.cov[i, i] + self.cov[j, j] - 2 * self.cov[i, j]
+        # predicted preference, averaged over the uncertainty (probit approximation)
+        p = 1.0 / (1.0 + np.exp(-(self.scores[i] - self.scores[j]) / np.sqrt(1 + np.pi * var / 8)))
+        return 0.5 * np.log1p(p * (1 - p) * var)
+
+    def converged(self):
+        ntrials = len(self.winners)
+        if self.max_trials is not None and ntrials >= self.max_trials:
+            return True
+        if ntrials < self.min_trials:
+            return False
+        return np.sqrt(np.diag(self.center @ self.cov @ self.center.T)).max() < self.target_sd
+
+    def next_trial(self):
+        """ The most informative next pair as design columns (left and right at
+        random), or None when the scores have converged """
+        if self.converged():
+            return None
+
+        gains = self.gains()
+        if self.previous is not None:
+            # no image twice in a row
+            gains[np.isin(self.candidates, self.previous).any(axis=1)] = -np.inf
+        best = np.flatnonzero(gains == gains.max())
+        pair = self.candidates[self.rng.choice(best)]
+        if self.rng.random() < 0.5:
+            pair = pair[::-1]
+
+        self.previous = pair
+        row = design_rows(self.table, pair[None, :])[0]
+        return dict(zip(FIELDS, row))
+
+    def update(self, trial, resp):
+        """ Adds the response to a trial (0 for image_a, 1 for image_b) """
+        a, b = self.index[trial['image_a']], self.index[trial['image_b']]
+        if resp == 1:
+            a, b = b, a
+        self.winners.append(a)
+        self.losers.append(b)
+        self.fit()
+
+    def replay(self, result):
+        """ Adds a trial of the results file of an interrupted session and
+        returns it as design columns """
+        trial = {k: result[k] for k in FIELDS}
+        self.update(trial, 0 if result['left_right'] == 'left' else 1)
+        self.previous = np.array([self.index[trial['image_a']], self.index[trial['image_b']]])
+        return trial
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the experiment loop with a synthetic observer.
+
+Runs a rating experiment (a paradigm script like rating_experiment_double.py)
+through a full design without a human: the observer answers 'no' to the
+usage question, presses ENTER and then a random response key as soon as
+every stimulus is on the screen. Vsync is off, so the trials run as fast as
+the engine allows. Reported are the distributions of
+
+    load_images     loading the images of a trial (textures, sprites)
+    on_draw         drawing a frame (with load_images on the first frame
+                    of a trial)
+    savetrial       saving a response
+    switch          trial switch: response key press until the flip that
+                    shows the next stimulus
+
+By default pyglet runs headless (EGL, no display needed). With --display the
+normal display is used, e.g. a virtual one with software GL:
+
+    Xvfb :99 &
+    DISPLAY=:99 LIBGL_ALWAYS_SOFTWARE=1 python bench_experiment.py rating_experiment_single.py --display
+
+The results files written by the run are deleted afterwards (--keep keeps them).
+
+Usage:
+
+python bench_experiment.py rating_experiment_double.py
+python bench_experiment.py rating_experiment_double.py design_pair_experiment_1.csv --json bench.json
+python bench_experiment.py rating_experiment_single.py adaptive:1 --size 1200x800
+
+"""
+
+import sys
+
+# headless unless a display is asked for, before pyglet creates any window
+if '--display' not in sys.argv:
+    import pyglet
+    pyglet.options['headless'] = True
+
+import importlib.util
+import json
+import os
+import time
+from pathlib import Path
+import numpy as np
+import pyglet
+from pyglet import clock
+from pyglet.window import key
+from experiment import Experiment, parse_design_argument
+
+## percentiles in the report
+PERCENTILES = [50, 90, 99]
+
+
+class BenchExperiment(Experiment):
+    """ Experiment window with timers around the steps of a trial, answered
+    by a synthetic observer """
+
+    def __init__(self, *args, observer_seed=0, **kwargs):
+        self.times = {'load_images': [], 'on_draw': [], 'savetrial': [], 'switch': []}
+        self.rng = np.random.default_rng(observer_seed)
+        self.pressed = None  # time of the last response key press
+        Experiment.__init__(self, *args, **kwargs)
+        self.keys = list(self.paradigm.response_keys)
+
+    def _timed(self, name, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self.times[name].append(time.perf_counter() - start)
+        return result
+
+    def load_images(self):
+        return self._timed('load_images', Experiment.load_images, self)
+
+    def on_draw(self):
+        return self._timed('on_draw', Experiment.on_draw, self)
+
+    def savetrial(self, resp, resptime):
+        return self._timed('savetrial', Experiment.savetrial, self, resp, resptime)
+
+    def flip(self):
+        stimulus = self.onset_pending
+        Experiment.flip(self)
+        if stimulus:
+            if self.pressed is not None:
+                self.times['switch'].append(time.perf_counter() - self.pressed)
+            # the observer answers as soon as the stimulus is on the screen
+            clock.schedule_once(self.respond, 0)
+
+    def respond(self, dt):
+        if self.experimentphase != 1:
+            return
+        self.pressed = time.perf_counter()
+        self.dispatch_event('on_key_press', self.keys[self.rng.integers(len(self.keys))], 0)
+
+    def start(self, dt):
+        """ Answers the usage question and starts the trials """
+        self.dispatch_event('on_key_press', key.N, 0)
+        self.dispatch_event('on_key_press', key.ENTER, 0)
+
+    def on_close(self):
+        Experiment.on_close(self)
+        pyglet.app.exit()
+
+
+def load_paradigm(script):
+    """ Paradigm of a rating experiment script, without running it """
+    spec = importlib.util.spec_from_file_location(Path(script).stem, script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.paradigm
+
+
+def summary(times):
+    """ Count, mean, percentiles and maximum in milliseconds """
+    if not times:
+        return {'n': 0}
+    ms = np.asarray(times) * 1000
+    result = {'n': len(ms), 'mean': float(ms.mean())}
+    for p in PERCENTILES:
+        result['p%d' % p] = float(np.percentile(ms, p))
+    result['max'] = float(ms.max())
+    return result
+
+
+def run(script, design='random:0', size=(1400, 1000), observer_seed=0, keep=False):
+    """ Runs a full session of the paradigm of a script, returns the summaries """
+    paradigm = load_paradigm(script)
+    designfile, seed, adaptive = parse_design_argument(design)
+    win = BenchExperiment(paradigm, designfile, None, seed, adaptive, observer_seed=observer_seed,
+                          caption='Benchmark', vsync=False, width=size[0], height=size[1])
+    clock.schedule_once(win.start, 0)
+
+    start = time.perf_counter()
+    pyglet.app.run()
+    total = time.perf_counter() - start
+
+    if not keep:
+        for f in (win.resultsfile, win.timing.filename):
+            if os.path.isfile(f):
+                os.remove(f)
+
+    report = {name: summary(times) for name, times in win.times.items()}
+    report['session'] = {'trials': win.currenttrial, 'seconds': total}
+    return report
+
+
+if __name__ == "__main__":
+
+    args = [a for a in sys.argv[1:] if a not in ('--display', '--keep')]
+    options = {}
+    for option in ('--json', '--size'):
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    if not args:
+        print('usage: python bench_experiment.py <experiment script> [design] '
+              '[--size WxH] [--json file] [--display] [--keep]')
+        sys.exit(1)
+
+    script = args[0]
+    design = args[1] if len(args) > 1 else 'random:0'
+    size = tuple(int(v) for v in options.get('--size', '1400x1000').split('x'))
+    report = run(script, design, size, keep='--keep' in sys.argv)
+
+    print()
+    print('%d trials in %.2f s' % (report['session']['trials'], report['session']['seconds']))
+    print('%-12s %6s %9s' % ('ms', 'n', 'mean') + ''.join('%9s' % ('p%d' % p) for p in PERCENTILES) + '%9s' % 'max')
+    for name in ('load_images', 'on_draw', 'savetrial', 'switch'):
+        s = report[name]
+        if s['n']:
+            print('%-12s %6d %9.3f' % (name, s['n'], s['mean']) +
+                  ''.join('%9.3f' % s['p%d' % p] for p in PERCENTILES) + '%9.3f' % s['max'])
+    if '--json' in options:
+        with open(options['--json'], 'w') as f:
+            json.dump(report, f, indent=1)
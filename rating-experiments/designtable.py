@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Typed design table of the rating experiments.
+
+The trials of a design are kept as one NumPy column per design column:
+
+    int64       columns that only hold whole numbers (i_a, i_b, intensity)
+    object      text columns (image names, filters), dictionary encoded
+                while reading: every distinct value is one string object,
+                the column only holds references to them, and its
+                categorical codes are kept for codes()
+
+Design files are read with the csv module into one list per column, then
+every column is typed at once: columns of whole numbers are converted with
+int, the others are encoded with np.unique, so a design of 100,000 trials
+keeps one string object per distinct value instead of one per field.
+trial() returns the columns of one trial without touching the others, and
+append() grows the columns in place (amortized doubling) for adaptive
+sessions.
+
+Usage:
+
+design = read_design_csv('design_pair_experiment_1.csv')
+len(design), design.fields
+design['image_a']                   # column as NumPy array
+design.trial(3)                     # {'image_a': 'Girl1_Lark_75.jpg', ..., 'i_a': 75, 'i_b': 100}
+categories, codes = design.codes('f_a_og')
+
+"""
+
+import csv
+import re
+import numpy as np
+
+## values of integer columns
+INTEGER = re.compile(r'^-?\d+$')
+
+
+def _is_integer(value):
+    return isinstance(value, (int, np.integer)) or bool(INTEGER.match(str(value)))
+
+
+def _encode(values):
+    """ Text column as an object array of the distinct values, and the
+    sorted categories and codes """
+    categories, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    categories = categories.astype(object)
+    return categories[codes], (categories, codes.astype(np.int32))
+
+
+def _typed(values):
+    """ Typed column of a sequence of values: int64 if they are all whole
+    numbers, else an encoded text column. Returns the column and its
+    categories and codes (None for numbers) """
+    if len(values) and _is_integer(values[0]):
+        try:
+            return np.fromiter(map(int, values), dtype=np.int64, count=len(values)), None
+        except ValueError:
+            pass  # not all of them
+    return _encode(values)
+
+
+class DesignTable:
+    """ Trials of a design, as typed NumPy columns """
+
+    def __init__(self, columns=None, codes=None):
+        columns = columns or {}
+        self.fields = list(columns)
+        self._data = {k: np.asarray(v) for k, v in columns.items()}
+        self._size = len(self._data[self.fields[0]]) if self.fields else 0
+        # categories and codes of the text columns, filled when needed
+        self._codes = dict(codes or {})
+
+    @classmethod
+    def from_columns(cls, columns):
+        """ Table of a dictionary of equally long columns (e.g. make_design) """
+        data, codes = {}, {}
+        for k, values in columns.items():
+            data[k], encoded = _typed(list(values))
+            if encoded is not None:
+                codes[k] = encoded
+        return cls(data, codes)
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return 'DesignTable(%d trials, %s)' % (self._size, ', '.join(self.fields))
+
+    def __getitem__(self, field):
+        """ Column of all trials as NumPy array (int64 or object) """
+        return self._data[field][:self._size]
+
+    def codes(self, field):
+        """ Sorted categories of a column and the code of every trial """
+        if field not in self._codes:
+            self._codes[field] = np.unique(self[field], return_inverse=True)
+        categories, codes = self._codes[field]
+        order = np.argsort(categories)
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        return categories[order], rank[codes]
+
+    def trial(self, i):
+        """ Columns of trial i, as dictionary """
+        if not 0 <= i < self._size:
+            raise IndexError('trial %d of a design with %d trials' % (i, self._size))
+        return {k: v[i].item() if v.dtype != object else v[i] for k, v in self._data.items()}
+
+    def take(self, order):
+        """ Table of the trials in order (trial indices) """
+        order = np.asarray(order, dtype=np.intp)
+        codes = {k: (categories, codes[order]) for k, (categories, codes) in self._codes.items()}
+        return DesignTable({k: self[k][order] for k in self.fields}, codes)
+
+    def append(self, trial):
+        """ Appends a trial (dictionary of its columns), typed like the
+        columns of a design file """
+        if not self.fields:
+            self.fields = list(trial)
+            self._data = {k: np.empty(16, dtype=np.int64 if _is_integer(v) else object)
+                          for k, v in trial.items()}
+        if self._size == len(self._data[self.fields[0]]):
+            # capacity doubles, appending is amortized constant time
+            for k, v in self._data.items():
+                self._data[k] = np.concatenate([v, np.empty_like(v)])
+
+        for k in self.fields:
+            value = trial[k]
+            column = self._data[k]
+            if column.dtype != object and not _is_integer(value):
+                column = self._data[k] = column.astype(object)
+            column[self._size] = int(value) if column.dtype != object else value
+        self._size += 1
+        self._codes = {}
+
+
+def read_design_csv(fname):
+    """ Reads a CSV design file into a DesignTable """
+    with open(fname, newline='') as f:
+        # quoted fields can hold commas and line breaks
+        rows = csv.reader(f)
+        fields = next((row for row in rows if row), [])
+        columns = [[] for _ in fields]
+        appends = [column.append for column in columns]
+        for row in rows:
+            if len(row) != len(fields):
+                if not row:
+                    continue  # blank line
+                row = (row + [''] * len(fields))[:len(fields)]
+            for append, value in zip(appends, row):
+                append(value)
+
+    data, codes = {}, {}
+    for k, values in zip(fields, columns):
+        data[k], encoded = _typed(values)
+        if encoded is not None:
+            codes[k] = encoded
+    return DesignTable(data, codes)
@@ -0,0 +1,676 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Experiment engine shared by the rating experiments.
+
+A paradigm definition says what is shown and what is saved: the design
+columns with the image files (one for single stimulus, two for pairs, N for
+N-AFC layouts), where they are placed, which keys are responses and how a
+response is turned into a row of the results file. The Experiment window
+runs any paradigm through the same code path: welcome screen, trials and
+good bye, with prefetching, batched drawing, frame locked timing, journaled
+results and resuming of interrupted sessions.
+
+E.g. (see rating_experiment_single.py and rating_experiment_double.py)
+
+paradigm = Paradigm('single', instructions, instructions_ontrial,
+                    image_columns=['image'], imagedir='single_images_tiny/',
+                    response_keys={key._1: (1, '1'), key._2: (2, '2')},
+                    header=['usage', 'image', 'response', 'resptime'],
+                    make_row=lambda trial, usage, resp, resptime:
+                        [usage, trial['image'], resp, resptime])
+win = Experiment(paradigm, 'mydesignfile.csv', width=1200, height=800)
+pyglet.app.run()
+
+Instead of a design file, a paradigm can build a randomized design for every
+observer at startup (make_design). Pass designfile=None and optionally a
+seed; the seed is drawn at random otherwise. It is saved in every row of the
+results file (column 'seed'), so the design can be rebuilt, e.g. when the
+session is resumed.
+
+Adaptive sessions (adaptive=True) choose every trial from the responses so
+far, with a sampler of the paradigm (make_sampler, e.g. adaptive.py). The
+sampler has the methods images() (all image files it can choose from),
+next_trial() (design columns of the next trial, None at the end),
+update(trial, resp) and replay(result) (a results row of an interrupted
+session, returns the trial).
+
+With publish_address set, every saved trial is also sent to a local UDP
+port (publisher.py), for the live dashboard evaluation/live.py.
+
+With results_db set, every saved trial is also written into a SQLite
+results database (resultsdb.py) on the local disk, in the background with
+the group commit of the results file, with the observer id passed as
+observer (e.g. from the --observer option of the paradigm scripts), or none.
+
+Before the session starts, every image of the design (or every image an
+adaptive sampler can choose) is checked against the stimulus catalog of the
+image folder (design-creator/catalog.py); missing files stop the start
+instead of crashing the session when their trial comes.
+
+With pyramid_dir set, the images come from the level of the resolution
+pyramid (pyramid.py) that fills the stimulus slots of the window, and are
+scaled down to the slot size.
+
+
+Seminar: Image quality and human visual perception, SoSe 2020, TU Berlin
+@author: G. Aguilar, June 2020
+
+"""
+
+import secrets
+import sys
+import numpy as np
+import pyglet
+from pyglet import window
+from pyglet import clock
+from pyglet.window import key
+from pathlib import Path
+from prefetch import ImagePrefetcher
+from stimpack import StimulusPack
+from timing import TrialTiming
+from resultswriter import ResultsWriter, recover_journals
+from resume import resume_design, read_results
+from designtable import DesignTable, read_design_csv
+from publisher import TrialPublisher
+from resultsdb import ResultsDB
+import imagecache
+import pyramid
+
+# the stimulus catalog is shared with the design generator
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'design-creator'))
+from catalog import check_design
+
+
+## refresh rate of the display in Hz, the presentation time is counted in frames;
+## None takes the rate of the screen's current mode (60 Hz if it reports none)
+refresh_rate = None
+
+## number of trials whose images are decoded ahead in the background
+prefetch_depth = 4
+
+## group commit of the results file: every n trials or every n milliseconds
+results_flush_trials = 10
+results_flush_ms = 1000
+
+## memory limits of the decoded image and texture caches, in MB
+decoded_cache_mb = 256
+texture_cache_mb = 256
+
+## resolution pyramid (built with pyramid.py) the images are taken from,
+## instead of the image folder of the paradigm, None to switch it off
+pyramid_dir = None
+
+## fraction of the window height available for the stimuli
+stimulus_height = 0.75
+
+## saved trials are published to this address for the live dashboard,
+## e.g. ('127.0.0.1', 5005), None to switch it off
+publish_address = None
+
+## results database (resultsdb.py) on a local disk the saved trials are also
+## written to, e.g. 'results.db', None to switch it off
+results_db = None
+
+
+def parse_design_argument(argument):
+    """ Design argument of the command line: a design file, 'random' or
+    'random:<seed>' for a design built at startup, or 'adaptive' or
+    'adaptive:<seed>' for an adaptive session. Returns (designfile, seed, adaptive) """
+    for mode in ('random', 'adaptive'):
+        if argument == mode:
+            return None, None, mode == 'adaptive'
+        if argument.startswith(mode + ':'):
+            return None, int(argument[len(mode) + 1:]), mode == 'adaptive'
+    return argument, None, False
+
+
+def parse_observer_argument(argv):
+    """ Takes the option '--observer <id>' out of the command line argv.
+    Returns the observer id, or None without the option. Exits with a usage
+    message if no id follows it """
+    if '--observer' not in argv:
+        return None
+    i = argv.index('--observer')
+    if i + 1 == len(argv) or argv[i + 1].startswith('--'):
+        sys.exit('usage: %s [--observer <id>] [design] [results file to resume]' % argv[0])
+    observer = argv[i + 1]
+    del argv[i:i + 2]
+    return observer
+
+
+class Paradigm:
+    """ Definition of a rating paradigm """
+
+    def __init__(self, name, instructions, instructions_ontrial, image_columns, imagedir,
+                 response_keys, header, make_row, labels=None, positions=None,
+                 presentation_time=None, make_design=None, make_sampler=None):
+
+        self.name = name  # results go to <name>_results/<name>_result_N.csv
+        self.instructions = instructions
+        self.instructions_ontrial = instructions_ontrial
+
+        # design columns with the image files, one per stimulus on the screen
+        self.image_columns = image_columns
+        self.imagedir = imagedir
+        # pre-decoded stimulus pack (built with stimpack.py), used instead of the
+        # JPEG files if it exists
+        self.stimulus_pack = imagedir.rstrip('/') + '.pack'
+
+        # horizontal positions relative to the window width, evenly spaced by default
+        n = len(image_columns)
+        self.positions = positions or [(i + 0.5) / n for i in range(n)]
+        self.labels = labels or []  # text above each image, if any
+
+        # key symbol -> (response, name printed on the console)
+        self.response_keys = response_keys
+
+        # results file columns, and function making a row of them from
+        # (trial as dictionary, usage, response, response time)
+        self.header = header
+        self.make_row = make_row
+
+        # presentation time in seconds, None for unlimited presentation
+        self.presentation_time = presentation_time
+
+        # function building a randomized design from a numpy random generator,
+        # as a dictionary of columns (turned into a DesignTable)
+        self.make_design = make_design
+
+        # function creating the trial sampler of an adaptive session from a
+        # numpy random generator
+        self.make_sampler = make_sampler
+
+
+def screen_rate(screen, default=60):
+    """ Refresh rate of the current mode of a screen in Hz, or default if the
+    platform doesn't report one (e.g. headless) """
+    try:
+        rate = screen.get_mode().rate
+    except (AttributeError, NotImplementedError):
+        return default
+    return rate or default
+
+
+###############################################################################
+class Experiment(window.Window):
+
+    def __init__(self, paradigm, designfile, resumefile=None, seed=None, adaptive=False, observer=None,
+                 *args, **kwargs):
+
+        # TODO: ask when starting
+        self.usage = ""
+
+        # Let all of the arguments pass through
+        self.win = window.Window.__init__(self, *args, **kwargs)
+
+        self.debug = False
+
+        self.paradigm = paradigm
+        self.presentation_time = paradigm.presentation_time
+        self.refresh_rate = refresh_rate or screen_rate(self.screen)
+        if self.presentation_time is not None:
+            print('Refresh rate %d Hz, stimuli are shown for %d frames'
+                  % (self.refresh_rate, round(self.presentation_time * self.refresh_rate)))
+
+        # Setting up batches: welcome screen, stimuli and on trial instructions
+        self.welcome_batch = pyglet.graphics.Batch()
+        self.stim_batch = pyglet.graphics.Batch()
+        self.trial_batch = pyglet.graphics.Batch()
+
+        # Setting up text objects
+        self.welcome_text = pyglet.text.Label(paradigm.instructions,
+                                              font_name='Arial', multiline=True,
+                                              font_size=25, x=int(self.width / 2.0), y=int(self.height / 2.0),
+                                              width=int(self.width * 0.75), color=(0, 0, 0, 255),
+                                              anchor_x='center', anchor_y='center',
+                                              batch=self.welcome_batch)
+
+        self.instructions_ontrial = pyglet.text.Label(paradigm.instructions_ontrial,
+                                                      font_name='Arial', multiline=False,
+                                                      font_size=20, x=int(self.width / 2.0), y=int(self.height * 0.1),
+                                                      width=int(self.width * 0.75), color=(0, 0, 0, 255),
+                                                      anchor_x='center', anchor_y='center',
+                                                      batch=self.trial_batch)
+
+        self.image_texts = [pyglet.text.Label(text,
+                                              font_name='Arial', multiline=False,
+                                              font_size=20, x=int(self.width * position), y=int(self.height * 0.9),
+                                              width=int(self.width * 0.75), color=(0, 0, 0, 255),
+                                              anchor_x='center', anchor_y='center',
+                                              batch=self.stim_batch)
+                            for text, position in zip(paradigm.labels, paradigm.positions)]
+
+        # sprites of the images, created with the textures of the first trial
+        self.sprites = []
+
+        # image folder, or the pyramid level chosen when the design is loaded
+        self.imagedir = paradigm.imagedir
+        self.stimulus_pack = paradigm.stimulus_pack
+        positions = sorted(paradigm.positions)
+        spacing = min(np.diff(positions)) if len(positions) > 1 else 1.0
+        # edge of the square slot of every stimulus, in pixels of the framebuffer
+        self.slot = min(self.width * spacing, self.height * stimulus_height) * self.get_pixel_ratio()
+        self.stimulus_scale = 1.0
+
+        # Design file
+        self.designfile = designfile
+        self.resumefile = resumefile
+        self.adaptive = adaptive
+        if adaptive and paradigm.make_sampler is None:
+            raise ValueError('the %s paradigm has no adaptive mode' % paradigm.name)
+
+        # trials of crashed sessions are recovered from their journals
+        resultsdir = paradigm.name + '_results/'
+        recover_journals(resultsdir)
+
+        # Results file - assigning filename
+        self.resultsfile = resultsdir + paradigm.name + '_result_1.csv'
+
+        file = Path(self.resultsfile)
+        index = 2
+
+        # prevents result from being replaced by new results
+        while file.is_file():
+            self.resultsfile = resultsdir + paradigm.name + '_result_' + str(index) + '.csv'
+            file = Path(self.resultsfile)
+            index += 1
+
+        # resuming an interrupted session: appending to its results file
+        if resumefile is not None:
+            self.resultsfile = resumefile
+
+        # design built for this observer or adaptive session: the seed goes
+        # into the results file
+        self.seed = None
+        header = paradigm.header
+        if designfile is None:
+            done = read_results(resumefile) if resumefile is not None else []
+            if done:
+                if not done[0].get('seed'):
+                    # e.g. a results file of a session with a design file
+                    raise SystemExit('%s has no seed column, the design of the session can not be '
+                                     'rebuilt. Resume it with its design file' % resumefile)
+                seed = int(done[0]['seed'])  # same design as in the interrupted session
+            elif seed is None:
+                seed = secrets.randbits(32)
+            self.seed = seed
+            header = header + ['seed']
+
+        # opening the results file, writing the header. Trials are journaled
+        # and committed to the file in the background
+        self.resultswriter = ResultsWriter(self.resultsfile, header,
+                                           flush_trials=results_flush_trials,
+                                           flush_ms=results_flush_ms)
+        self.header = header
+
+        # live dashboard
+        self.publisher = None
+        if publish_address is not None:
+            self.publisher = TrialPublisher(publish_address, paradigm.name, self.resultsfile)
+
+        # results database, a resumed session continues its session there
+        self.resultsdb = None
+        if results_db is not None:
+            self.resultsdb = ResultsDB(results_db, paradigm.name, header, self.resultsfile, observer=observer,
+                                       seed=self.seed, resume=resumefile is not None,
+                                       flush_trials=results_flush_trials, flush_ms=results_flush_ms)
+
+        # frame locked timestamps, written next to the results file
+        self.timing = TrialTiming(self.resultsfile)
+
+        # experiment control
+        self.experimentphase = 0  # 0 for intro, 1 for running trials, 2 for good bye
+        self.firstframe = True
+        self.present_stim = True
+        self.stimframes = 0  # frames drawn with the stimulus in the current trial
+        self.onset_pending = False  # next flip shows the stimulus for the first time
+
+        # image caches, shared with other sessions in this process
+        imagecache.configure(decoded_bytes=decoded_cache_mb * 2**20,
+                             texture_bytes=texture_cache_mb * 2**20)
+
+        # calling some routines on start
+        self.loaddesign()
+
+    def loaddesign(self):
+        """ Loads the design file specifications"""
+        if self.adaptive:
+            self.loadsampler()
+            return
+
+        self.sampler = None
+        if self.designfile is None:
+            columns = self.paradigm.make_design(np.random.default_rng(self.seed))
+            self.design = DesignTable.from_columns(columns)
+            print('Design built with seed %d' % self.seed)
+        else:
+            self.design = read_design_csv(self.designfile)
+        self.totaltrials = len(self.design)
+
+        if self.debug:
+            print(self.design)
+            print('total number of trials: %d ' % self.totaltrials)
+
+        self.currenttrial = 0
+
+        # skipping the trials already done in the interrupted session
+        if self.resumefile is not None:
+            self.design, self.currenttrial, done = resume_design(self.design, self.resumefile,
+                                                                 self.paradigm.image_columns)
+            if done:
+                self.usage = done[0]['usage']
+            print('Resuming %s at trial %d' % (self.resumefile, self.currenttrial))
+
+        self.selectlevel([name for c in self.paradigm.image_columns for name in self.design[c]])
+        self.checkimages(self.design, self.paradigm.image_columns)
+
+        # pre-decoded images, if a pack was built
+        pack = self.loadpack([name for c in self.paradigm.image_columns for name in self.design[c]])
+
+        # decoding the images of the next trials in the background
+        trials = list(zip(*[self.design[c] for c in self.paradigm.image_columns]))
+        self.prefetcher = ImagePrefetcher(self.imagedir, trials, depth=prefetch_depth,
+                                          start=self.currenttrial,
+                                          pack=pack)
+        self.prefetcher.start()
+        # textures of the first trials, while the instructions are shown
+        clock.schedule_once(self.update, 1.0)
+
+    def loadpack(self, names):
+        """ Stimulus pack of the image folder, if one was built and none of the
+        images in names changed since, None otherwise """
+        if not Path(self.stimulus_pack).is_file():
+            return None
+        pack = StimulusPack(self.stimulus_pack)
+        stale = pack.stale(self.imagedir, names)
+        if stale:
+            print('Stimulus pack %s is out of date (%d images changed, e.g. %s), using the '
+                  'image files. Rebuild it with stimpack.py' % (self.stimulus_pack, len(stale), stale[0]))
+            return None
+        print('Using stimulus pack %s' % self.stimulus_pack)
+        return pack
+
+    def selectlevel(self, names):
+        """ Takes the images from the pyramid level that fills the stimulus slots """
+        if pyramid_dir is None:
+            return
+        size, folder = pyramid.select_level(pyramid_dir, self.slot, names)
+        if folder is None:
+            smallest = Path(pyramid_dir) / str(min(pyramid.levels_of(pyramid_dir), default=0))
+            missing = sorted(n for n in set(names) if not (smallest / n).is_file())
+            raise ValueError('no level of the pyramid %s has all images, missing: %s'
+                             % (pyramid_dir, ', '.join(missing)))
+        self.imagedir = folder
+        self.stimulus_pack = folder.rstrip('/') + '.pack'
+        # larger levels are scaled down to the slot, smaller ones are never scaled up
+        self.stimulus_scale = min(1.0, self.slot / size) / self.get_pixel_ratio()
+        print('Pyramid level %d for slots of %d pixels' % (size, self.slot))
+
+    def checkimages(self, design, image_columns):
+        """ Stops the start if images of the design are not in the image folder """
+        problems = check_design(design, image_columns, self.imagedir)
+        for message in problems:
+            print(message)
+        if problems:
+            raise ValueError('%d problems with the images in %s' % (len(problems), self.imagedir))
+
+    def loadsampler(self):
+        """ Starts an adaptive session: the design grows trial by trial """
+        self.sampler = self.paradigm.make_sampler(np.random.default_rng(self.seed))
+        print('Adaptive session with seed %d' % self.seed)
+        self.design = DesignTable()
+        self.totaltrials = 0
+        self.currenttrial = 0
+
+        # the responses of the interrupted session are replayed
+        if self.resumefile is not None:
+            done = read_results(self.resumefile)
+            for result in done:
+                self.addtrial(self.sampler.replay(result))
+            if done:
+                self.usage = done[0]['usage']
+            self.currenttrial = self.totaltrials
+            print('Resuming %s at trial %d' % (self.resumefile, self.currenttrial))
+
+        self.addtrial(self.sampler.next_trial())
+        self.selectlevel(self.sampler.images())
+        self.checkimages({'image': self.sampler.images()}, ['image'])
+
+        pack = self.loadpack(self.sampler.images())
+
+        # the next trials are not known: the images the sampler can choose
+        # from are decoded in the background and kept in the caches, those of
+        # the first trial first
+        first = []
+        if self.currenttrial < self.totaltrials:
+            trial = self.design.trial(self.currenttrial)
+            first = [trial[c] for c in self.paradigm.image_columns]
+        images = [(f,) for f in dict.fromkeys(first + self.sampler.images())]
+        self.prefetcher = ImagePrefetcher(self.imagedir, images, depth=prefetch_depth,
+                                          pack=pack)
+
+        # textures of the first trial, uploaded while the instructions are
+        # shown; the images that fit into the texture cache next to them are
+        # kept uploaded ahead
+        if first:
+            nbytes = max(imagecache.image_nbytes(t) for t in self.prefetcher.load(first))
+            self.prefetcher.depth = min(len(images), max(len(first), texture_cache_mb * 2**20 // nbytes))
+        self.prefetcher.start()
+        clock.schedule_once(self.update, 1.0)
+
+    def addtrial(self, trial):
+        """ Appends a trial to the design of an adaptive session (None when the
+        sampler has converged) """
+        if trial is None:
+            return
+        self.design.append(trial)
+        self.totaltrials += 1
+
+    def update(self, dt):
+        # uploading prefetched images to textures
+        self.prefetcher.pump()
+
+    def next_frame(self, dt):
+        # scheduled on every iteration of the event loop while a stimulus is
+        # presented for a limited time, which makes the loop redraw the window
+        # on every (vsync aligned) frame
+        pass
+
+    def flip(self):
+        """ Flips the buffers and waits for the flip to be done, so that its
+        timestamp is locked to the frame. Then uses the time until the next
+        trial to upload prefetched images """
+        if self.context is None:
+            return  # window was closed during on_draw
+        window.Window.flip(self)
+        pyglet.gl.glFinish()
+        self.timing.flipped(self.currenttrial, onset=self.onset_pending)
+        self.onset_pending = False
+        self.update(0)
+
+    def on_draw(self):
+        """ Executed when draws on the screen. The event loop calls it only when
+        the window was invalidated, and flips the buffers afterwards"""
+
+        self.timing.start_draw()
+
+        # clear the buffer
+        pyglet.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
+        self.clear()
+
+        if self.debug:
+            print('-------- ondraw')
+            print('self.present_stim %d' % self.present_stim)
+
+        if self.experimentphase == 0:
+            if self.debug:
+                print('experiment phase 0: welcome')
+            # draws instruction text
+            self.welcome_batch.draw()
+
+        # go through the trials
+        elif self.experimentphase == 1:
+
+            if self.debug:
+                print('experiment phase 1: going through the trials')
+
+            # load images only on the first frame
+            if self.firstframe:
+                print('trial: %d' % self.currenttrial)
+
+                # load images
+                self.load_images()
+
+                # the next flip is the stimulus onset
+                self.onset_pending = True
+
+                self.firstframe = False
+
+            # draw images and their labels for a limited number of frames
+            if self.present_stim:
+                self.stim_batch.draw()
+                self.stimframes += 1
+
+                if self.presentation_time is not None and \
+                        self.stimframes >= round(self.presentation_time * self.refresh_rate):
+                    # last frame with the stimulus, the next one is blank
+                    self.present_stim = False
+            else:
+                # stimulus is gone, no more redraws on every frame
+                clock.unschedule(self.next_frame)
+
+            # draw instruction text
+            self.trial_batch.draw()
+
+        elif self.experimentphase == 2:
+            if self.debug:
+                print('experiment phase 2: goodbye')
+            # closing after this frame, not while the event loop goes through the windows
+            clock.schedule_once(self.finish, 0)
+
+        self.timing.end_draw()
+
+        # nothing to redraw until the state changes
+        self.invalid = False
+
+    def checkcontinue(self):
+        """ Checks if we're at the end of the trials"""
+        self.firstframe = True
+        self.present_stim = True
+        self.stimframes = 0
+
+        if self.currenttrial >= self.totaltrials:
+            self.experimentphase = 2
+            # self.dispatch_event('on_close')
+        elif self.presentation_time is not None:
+            clock.schedule(self.next_frame)
+
+        # the state has changed, the window is redrawn
+        self.invalid = True
+
+    def load_images(self):
+        """ Loads images of current trial """
+        # load files
+        if self.debug:
+            print('loading files')
+
+        if self.sampler is None:
+            self.images = self.prefetcher.get(self.currenttrial)
+        else:
+            trial = self.design.trial(self.currenttrial)
+            self.images = self.prefetcher.load([trial[c] for c in self.paradigm.image_columns])
+
+        for image in self.images:
+            # changes anchor to the center of the image
+            image.anchor_x = image.width // 2
+            image.anchor_y = image.height // 2
+
+        if not self.sprites:
+            self.sprites = [pyglet.sprite.Sprite(image, int(self.width * position),
+                                                 int(self.height * 0.5), batch=self.stim_batch)
+                            for image, position in zip(self.images, self.paradigm.positions)]
+            for sprite in self.sprites:
+                sprite.scale = self.stimulus_scale
+        else:
+            # a trial switch only swaps the textures
+            for sprite, image in zip(self.sprites, self.images):
+                sprite.image = image
+
+    def savetrial(self, resp, resptime):
+        """ Save the response of the current trial to the results file """
+
+        trial = self.design.trial(self.currenttrial)
+        row = self.paradigm.make_row(trial, self.usage, resp, resptime)
+        if self.seed is not None:
+            row = row + [self.seed]
+        self.resultswriter.writerow(row)
+        if self.resultsdb is not None:
+            self.resultsdb.writerow(row)
+        if self.publisher is not None:
+            self.publisher.publish(self.currenttrial, self.header, row)
+        print('Trial %d saved' % self.currenttrial)
+
+        # adaptive session: the response decides the next trial
+        if self.sampler is not None:
+            self.sampler.update(trial, resp)
+            self.addtrial(self.sampler.next_trial())
+
+    def finish(self, dt):
+        """ Ends the experiment """
+        self.dispatch_event('on_close')
+
+    ## Event handlers
+    def on_expose(self):
+        """ Executed when the window was covered and is shown again """
+        # the frame is gone, the event loop only redraws invalidated windows
+        self.invalid = True
+
+    def on_resize(self, width, height):
+        """ Executed when the window is resized """
+        window.Window.on_resize(self, width, height)  # viewport and projection
+        self.invalid = True
+
+    def on_close(self):
+        """ Executed when program finishes """
+
+        self.prefetcher.stop()
+        print('Image caches: %s' % imagecache.stats())
+        self.timing.close()
+        self.resultswriter.close()  # committing and closing results csv file
+        if self.resultsdb is not None:
+            self.resultsdb.close()
+        if self.publisher is not None:
+            self.publisher.close()
+        self.close()  # closing window
+
+    def on_key_press(self, symbol, modifiers):
+        """ Executed when a key is pressed"""
+
+        # response keys only count once the stimulus is on the screen
+        responding = self.experimentphase == 1 and not self.firstframe
+
+        if symbol == key.ESCAPE:
+            self.dispatch_event('on_close')
+
+        if symbol == key.Y:
+            self.usage = 'yes'
+
+        if symbol == key.N:
+            self.usage = 'no'
+
+        elif symbol in self.paradigm.response_keys and responding:
+            resp, name = self.paradigm.response_keys[symbol]
+            print("Press: %s" % name)
+            resptime = self.timing.key_pressed(self.currenttrial)
+            self.savetrial(resp=resp, resptime=resptime)
+            self.currenttrial += 1
+            self.checkcontinue()
+
+        elif symbol == key.ENTER and self.experimentphase == 0:
+            if self.debug:
+                print("ENTER")
+            self.experimentphase += 1
+            self.checkcontinue()
+
+    #####################################################################
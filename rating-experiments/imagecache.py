@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory bounded LRU caches for decoded images and their GL textures.
+
+The same stimulus appears in many trials (e.g. Girl1_OG.jpg in the pair
+design), so decoded pixel buffers and textures are kept in two module
+level caches, shared by all trials and by all experiment windows of the
+same process. Entries are keyed by the absolute path and the modification
+time of the file, so a changed file on disk is decoded again.
+
+Usage:
+
+imagecache.configure(decoded_bytes=256 * 2**20, texture_bytes=256 * 2**20)
+key, image = imagecache.load_image("images_tiny/Girl1_OG.jpg")  # any thread
+texture = imagecache.load_texture(key, image)                  # main thread only
+print(imagecache.stats())
+
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import pyglet
+
+
+class LRUCache:
+    """ Least recently used cache with a limit on the total size in bytes """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()  # decoding runs on a worker thread
+
+    def get(self, key):
+        """ Returns the cached value or None, counting hits and misses """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """ Adds a value, evicting the least recently used ones if needed """
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return  # would evict everything else, don't cache it
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # membership test, doesn't count as hit or miss
+        return key in self._entries
+
+    def stats(self):
+        """ Returns the counters of the cache as a dictionary """
+        return {'entries': len(self._entries), 'bytes': self.nbytes,
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+## caches shared by all trials and sessions of this process
+decoded_cache = LRUCache(256 * 2**20)
+texture_cache = LRUCache(256 * 2**20)
+
+
+def configure(decoded_bytes=None, texture_bytes=None):
+    """ Sets the byte limits of the caches """
+    if decoded_bytes is not None:
+        decoded_cache.max_bytes = decoded_bytes
+    if texture_bytes is not None:
+        texture_cache.max_bytes = texture_bytes
+
+
+def cache_key(path):
+    """ Key of an image file: absolute path and modification time """
+    return (os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def image_nbytes(image):
+    """ Size of the pixel buffer of an image, as uploaded (RGBA) """
+    return image.width * image.height * 4
+
+
+def load_image(path):
+    """ Returns the key and the decoded image of a file, decoding it only if
+    it's not in the cache. Safe to call from a worker thread. """
+    key = cache_key(path)
+    image = decoded_cache.get(key)
+    if image is None:
+        image = pyglet.image.load(path)
+        decoded_cache.put(key, image, image_nbytes(image))
+    return key, image
+
+
+def load_texture(key, image):
+    """ Returns the texture of a decoded image, uploading it only if it's not
+    in the cache. If image is None, the file is decoded here. Needs the GL
+    context, so only call it from the main thread. """
+    texture = texture_cache.get(key)
+    if texture is None:
+        if image is None:
+            image = load_image(key[0])[1]
+        # create_texture() doesn't keep a reference in the image, so both
+        # caches evict independently
+        texture = image.create_texture(pyglet.image.Texture)
+        texture_cache.put(key, texture, image_nbytes(image))
+    return texture
+
+
+def stats():
+    """ Hit and miss counters of both caches """
+    return {'decoded': decoded_cache.stats(), 'textures': texture_cache.stats()}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background prefetching of the stimulus images of the next trials.
+
+JPEG decoding and disk I/O run on a worker thread, which puts the decoded
+images of the next trials into a bounded queue. The upload to GL textures
+happens on the main thread (the only thread with the GL context), ahead
+of time, by calling pump() from the window's update loop. A trial switch
+is then only a texture swap, and the stimulus onset doesn't depend on the
+decode time of the images. Decoded images and textures go through the
+caches in imagecache, so a stimulus shown in several trials is decoded
+and uploaded only once. With a stimulus pack (see stimpack.py) the images
+are taken from the memory-mapped pack instead of decoding the JPEG files.
+
+Usage:
+
+prefetcher = ImagePrefetcher("images_tiny/", [("a.jpg", "b.jpg"), ...], depth=4)
+prefetcher.start()
+...
+prefetcher.pump()                        # regularly, on the main thread
+ref, test = prefetcher.get(currenttrial) # textures of the trial
+
+When the trials are not known in advance (adaptive sessions), the prefetcher
+runs over the images the session can draw from, one per 'trial', with a
+depth of as many of them as fit into the texture cache, which fills the
+caches. The textures of a trial are then taken from the caches with load().
+The depth can be set until the prefetcher is started, e.g. from the size of
+the first images loaded.
+
+prefetcher = ImagePrefetcher("images_tiny/", [(f,) for f in files])
+ref, test = prefetcher.load(["a.jpg", "b.jpg"])
+prefetcher.depth = texture_bytes // imagecache.image_nbytes(ref)
+prefetcher.start()
+
+"""
+
+import queue
+import threading
+import imagecache
+
+
+class ImagePrefetcher:
+    """ Decodes the images of the next trials in the background """
+
+    def __init__(self, imagedir, trials, depth=4, start=0, pack=None):
+        self.imagedir = imagedir
+        self.pack = pack  # optional StimulusPack with the pre-decoded images
+        self.trials = trials  # list of filename tuples, one per trial
+        self.depth = depth  # how many trials are kept decoded ahead
+        self.start_trial = start
+
+        self._queue = queue.Queue()
+        self._textures = {}
+        self._uploaded = start  # next trial index expected from the worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """ Starts the decoding worker """
+        # decoded images waiting for the upload are bounded by the depth
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the decoding worker and releases all textures """
+        self._stop.set()
+        # unblocks the worker if it waits on a full queue
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._thread.join(timeout=1.0)
+        self._textures.clear()
+
+    def decode(self, filename):
+        """ Decodes a single image (runs on the worker thread). Returns the
+        cache key and the image, or None if the texture is already cached. """
+        if self.pack is not None and filename in self.pack:
+            # mapped pixels, nothing to decode
+            return self.pack.key(filename), self.pack.image(filename)
+
+        path = self.imagedir + filename
+        key = imagecache.cache_key(path)
+        if key in imagecache.texture_cache:
+            return key, None
+        return imagecache.load_image(path)
+
+    def _run(self):
+        """ Worker loop: decodes trial after trial into the queue """
+        for index in range(self.start_trial, len(self.trials)):
+            if self._stop.is_set():
+                return
+            try:
+                images = [self.decode(f) for f in self.trials[index]]
+            except Exception as e:  # re-raised on the main thread in get()
+                images = e
+
+            while not self._stop.is_set():
+                try:
+                    self._queue.put((index, images), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _upload(self, index, images):
+        """ Creates the textures of a trial (main thread only) """
+        if isinstance(images, Exception):
+            raise images
+        self._textures[index] = [imagecache.load_texture(key, image) for key, image in images]
+        self._uploaded = index + 1
+
+    def pump(self):
+        """ Uploads the decoded images to textures, has to be called from the
+        main thread. Uploads at most 'depth' trials ahead. """
+        while len(self._textures) < self.depth:
+            try:
+                index, images = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._upload(index, images)
+
+    def load(self, filenames):
+        """ Returns the textures of the given files, through the caches. Has to
+        be called from the main thread. """
+        images = [self.decode(f) for f in filenames]
+        return [imagecache.load_texture(key, image) for key, image in images]
+
+    def get(self, index):
+        """ Returns the textures of trial 'index'. Waits for the worker if the
+        trial has not been decoded yet. """
+
+        if index not in self._textures and index < self._uploaded:
+            # trial was already dropped, e.g. requested again: load directly
+            return self.load(self.trials[index])
+
+        while index not in self._textures:
+            self._upload(*self._queue.get())
+
+        # textures of previous trials are not needed anymore
+        for i in [i for i in self._textures if i < index]:
+            del self._textures[i]
+
+        return self._textures[index]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live publishing of the saved trials.
+
+Every trial saved by the experiment is also sent as a small JSON datagram
+to a local UDP port, where a dashboard (evaluation/live.py) can pick it
+up while the session runs. Sending never blocks: if nobody listens or the
+socket buffer is full, the datagram is dropped. The results file stays
+the only complete record of the session.
+
+Message:
+
+    {"session": "pair_results/pair_result_3.csv", "paradigm": "pair",
+     "trial": 12, "row": {"usage": "no", "image_a": ..., "resptime": 0.81}}
+
+Usage:
+
+publisher = TrialPublisher(('127.0.0.1', 5005), 'pair', 'pair_results/pair_result_3.csv')
+publisher.publish(12, header, row)
+publisher.close()
+
+"""
+
+import json
+import socket
+
+
+class TrialPublisher:
+    """ Sends the saved trials to a local UDP port """
+
+    def __init__(self, address, paradigm, session):
+        self.address = address
+        self.paradigm = paradigm
+        self.session = session
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.dropped = 0
+
+    def publish(self, trial, header, row):
+        message = {'session': self.session, 'paradigm': self.paradigm, 'trial': trial,
+                   'row': dict(zip(header, row))}
+        try:
+            self.sock.sendto(json.dumps(message, default=str).encode('utf-8'), self.address)
+        except OSError:
+            self.dropped += 1  # nobody listening, or the buffer is full
+
+    def close(self):
+        self.sock.close()
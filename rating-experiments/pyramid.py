@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolution pyramid of the stimuli.
+
+The stimuli of images/ are stored once per level, pyramid/<size>/<name>,
+with the long edge of every image resized to <size> pixels. Levels larger
+than an original are not written (nothing is upscaled), so a level only
+holds the images that are at least that large.
+
+The experiment picks the level for the window it runs in (select_level):
+the smallest level whose images fill a stimulus slot, or the largest level
+that has all images of the design if none does. Textures are then never
+much larger than their slot, and never upscaled.
+
+The single stimulus design also uses <Scene>_<Filter>_0.jpg, the original
+under the name of each filter; these are written from <Scene>_OG.jpg for
+the filters of the scene.
+
+Building a pyramid from the command line:
+
+python pyramid.py ../images/people ../images/landscape
+python pyramid.py ../images/people ../images/landscape --out pyramid
+
+"""
+
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+## long edges of the levels, in pixels
+LEVELS = [320, 480, 640, 800, 1024, 1280, 1600, 2048, 2560]
+
+## JPEG quality of the levels
+jpeg_quality = 95
+
+
+def _resize_all(job):
+    """ Writes all levels of one original (runs in a worker process), the
+    smaller levels resized from the larger ones. Returns the files written """
+    source, names, root, levels = job
+    written = []
+    with Image.open(source) as im:
+        image = im.convert('RGB')
+    for size in sorted(levels, reverse=True):
+        if size > max(image.size):
+            continue  # no upscaling
+        scale = size / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+        folder = Path(root) / str(size)
+        for name in names:
+            image.save(folder / name, quality=jpeg_quality)
+            written.append(str(folder / name))
+    return written
+
+
+def build_pyramid(srcdirs, root='pyramid', levels=None, workers=None):
+    """ Writes the levels of all .jpg files of the source folders. Returns
+    the files written """
+    levels = levels or LEVELS
+    for size in levels:
+        (Path(root) / str(size)).mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for srcdir in srcdirs:
+        paths = sorted(Path(srcdir).glob('*.jpg'))
+        filters = defaultdict(list)  # scene -> filters, once per intensity
+        for path in paths:
+            parts = path.stem.split('_')
+            if len(parts) == 3:
+                filters[parts[0]].append(parts[1])
+        for path in paths:
+            names = [path.name]
+            scene = path.stem.split('_')[0]
+            if path.stem == scene + '_OG':
+                # filters with a single file are typos like Lake_Juni_50.jpg
+                names += ['%s_%s_0.jpg' % (scene, f) for f in sorted(set(filters[scene]))
+                          if filters[scene].count(f) > 1]
+            jobs.append((str(path), names, root, levels))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        written = [_resize_all(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(_resize_all, jobs))
+    return [f for files in written for f in files]
+
+
+def levels_of(root):
+    """ Sizes of the levels in a pyramid folder """
+    if not Path(root).is_dir():
+        return []
+    return sorted(int(d.name) for d in Path(root).iterdir() if d.is_dir() and d.name.isdigit())
+
+
+def select_level(root, slot, names):
+    """ Smallest level of the pyramid whose images are at least slot pixels
+    large and that has all images in names, or the largest level with all
+    images. Returns the size and folder of the level, or (None, None) """
+    complete = [size for size in levels_of(root)
+                if all((Path(root) / str(size) / name).is_file() for name in set(names))]
+    if not complete:
+        return None, None
+    filling = [size for size in complete if size >= slot]
+    size = filling[0] if filling else complete[-1]
+    return size, str(Path(root) / str(size)) + '/'
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    root = 'pyramid'
+    if '--out' in args:
+        i = args.index('--out')
+        root = args[i + 1]
+        del args[i:i + 2]
+    if not args:
+        print('usage: python pyramid.py <image folders> [--out <pyramid folder>]')
+        sys.exit(1)
+
+    written = build_pyramid(args, root)
+    for size in levels_of(root):
+        print('%5d: %d images' % (size, len(list((Path(root) / str(size)).glob('*.jpg')))))
+    print('%d files written to %s' % (len(written), root))
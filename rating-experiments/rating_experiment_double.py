@@ -12,27 +12,66 @@ E.g.
 
 python rating_experiment_double.py mydesignfile.csv
 
+Without a design file (or with 'random'), a randomized design is built for
+every observer at startup. The seed is drawn at random and saved in the
+results file; to repeat a design, pass the seed as 'random:<seed>'.
+E.g.
+
+python rating_experiment_double.py random:1234
+
 It saves the responses from the observer in a results file.
 
+To resume an interrupted session, pass its results file as the second parameter.
+The trials already done are skipped and the results are appended to that file.
+E.g.
+
+python rating_experiment_double.py mydesignfile.csv pair_results/pair_result_3.csv
+
+A session with a randomized design is resumed with the same design, its seed
+is read from the results file.
+E.g.
+
+python rating_experiment_double.py random pair_results/pair_result_3.csv
+
+With 'adaptive' (or 'adaptive:<seed>') the pairs are chosen one by one from the
+responses so far, by expected information gain under a Bradley-Terry model, until
+the scores of the images have converged (see adaptive.py). It saves trials only
+for larger image sets: 51 images of one scene need about 190 trials instead of
+all 1275 pairs, but the 26 images of the default design still need about 130 of
+its 156 pairs at adaptive_target_sd = 1.0.
+E.g.
+
+python rating_experiment_double.py adaptive
+
+With experiment.results_db set, the trials also go into the results database.
+--observer <id> stores the id of the observer with them (none otherwise).
+E.g.
+
+python rating_experiment_double.py random --observer o17
+
 
 v2: it allows unlimited or limited presentation time. Change the global variable
     presentation_time
 
+v3: the experiment itself runs in experiment.py, this file only defines the
+    pair paradigm (images, keys and results columns)
+
 
 Seminar: Image quality and human visual perception, SoSe 2020, TU Berlin
 @author: G. Aguilar, June 2020
 
 """
 
-import csv
-import datetime
 import sys
 import pyglet
-from pyglet import window
-from pyglet import clock
-from pyglet.gl import glBindTexture, glEnable
 from pyglet.window import key
 from pathlib import Path
+from experiment import Experiment, Paradigm, parse_design_argument, parse_observer_argument
+
+# the design engine lives in design-creator/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'design-creator'))
+from design_engine import stimulus_table, pair_design, design_columns
+from adaptive import AdaptivePairs
 
 ## Excerpt from Bosse (2018) p. 11
 ## In double stimulus assessment, such as Degradation Category Rating (DCR) 
@@ -66,311 +105,111 @@ instructions_ontrial = """ Linke Pfeiltaste     :     Rechte Pfeiltaste """
 # presentation_time = 1 # presentation time in seconds, None for unlimited presentation
 presentation_time = None
 
+## results file of an interrupted session to resume, None for a new session
+resumefile = None
 
-def read_design_csv(fname):
-    """ Reads a CSV design file and returns it in a dictionary"""
-
-    design = open(fname)
-    header = design.readline().strip('\n').split(',')
-    # print header
-    data = design.readlines()
-
-    new_data = {}
-
-    for k in header:
-        new_data[k] = []
-    for l in data:
-        curr_line = l.strip().split(',')
-        for j, k in enumerate(header):
-            new_data[k].append(curr_line[j])
-    return new_data
-
-
-###############################################################################
-class Experiment(window.Window):
-
-    def __init__(self, *args, **kwargs):
-
-        # TODO: ask when starting
-        self.usage = ""
-
-        # Let all of the arguments pass through
-        self.win = window.Window.__init__(self, *args, **kwargs)
-
-        self.debug = False
-
-        clock.schedule_interval(self.update, 1.0 / 30)  # update at FPS of Hz
-
-        # Setting up text objects
-        self.welcome_text = pyglet.text.Label(instructions,
-                                              font_name='Arial', multiline=True,
-                                              font_size=25, x=int(self.width / 2.0), y=int(self.height / 2.0),
-                                              width=int(self.width * 0.75), color=(0, 0, 0, 255),
-                                              anchor_x='center', anchor_y='center')
-
-        self.instructions_ontrial = pyglet.text.Label(instructions_ontrial,
-                                                      font_name='Arial', multiline=False,
-                                                      font_size=20, x=int(self.width / 2.0), y=int(self.height * 0.1),
-                                                      width=int(self.width * 0.75), color=(0, 0, 0, 255),
-                                                      anchor_x='center', anchor_y='center')
-
-        self.reference_text = pyglet.text.Label("Image A",
-                                                font_name='Arial', multiline=False,
-                                                font_size=20, x=int(self.width / 2.0), y=int(self.height * 0.9),
-                                                width=int(self.width * 0.75), color=(0, 0, 0, 255),
-                                                anchor_x='center', anchor_y='center')
-
-        self.test_text = pyglet.text.Label("Image B",
-                                           font_name='Arial', multiline=False,
-                                           font_size=20, x=int(self.width / 2.0), y=int(self.height * 0.9),
-                                           width=int(self.width * 0.75), color=(0, 0, 0, 255),
-                                           anchor_x='center', anchor_y='center')
-
-        # Design file
-        global designfile
-        self.designfile = designfile
-
-        # Results file - assigning filename
-        self.resultsfile = 'pair_results/pair_result_1.csv'
-
-        file = Path(self.resultsfile)
-        index = 2
+## observer id stored with the trials in the results database
+## (experiment.results_db), None to leave it empty
+observer = None
 
-        # prevents result from being replaced by new results
-        while file.is_file():
-            self.resultsfile = 'pair_results/pair_result_' + str(index) + '.csv'
-            file = Path(self.resultsfile)
-            index += 1
+## randomized designs built at startup: scenes, filters and intensities, and
+## the maximum number of trials of the same scene in a row
+design_scenes = ["Girl1", "Girl2"]
+design_filters = ["OG", "Clarendon", "Lark", "Juno"]
+design_intensities = ["25", "50", "75", "100"]
+design_max_run = 3
 
+## adaptive sessions: posterior standard deviation of the scores at which the
+## session stops, and the maximum number of trials (None for no limit)
+adaptive_target_sd = 1.0
+adaptive_max_trials = None
 
-        # opening the results file, writing the header
-        self.rf = open(self.resultsfile, 'w')
-        self.resultswriter = csv.writer(self.rf)
-        header = ['usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b',
-                  'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime']
-        self.resultswriter.writerow(header)
 
-        # experiment control 
-        self.experimentphase = 0  # 0 for intro, 1 for running trials, 2 for good bye
-        self.firstframe = True
-        self.present_stim = True
+def make_design(rng):
+    """ Builds the randomized design of an observer """
+    table = stimulus_table(design_scenes, design_filters, design_intensities, ".jpg")
+    rows = pair_design(table, rng, max_run=design_max_run)
+    return design_columns(rows, ['image_a', 'image_b', 'f_a_og', 'f_b_og', 'i_a', 'i_b'])
 
-        # calling some routines on start
-        self.loaddesign()
-        # forces a first draw of the screen
-        self.dispatch_event('on_draw')
 
-    def loaddesign(self):
-        """ Loads the design file specifications"""
-        self.design = read_design_csv(self.designfile)
-        self.totaltrials = len(self.design['image_a'])
+def make_sampler(rng):
+    """ Pair sampler of an adaptive session """
+    table = stimulus_table(design_scenes, design_filters, design_intensities, ".jpg")
+    return AdaptivePairs(table, rng, target_sd=adaptive_target_sd, max_trials=adaptive_max_trials)
 
-        if self.debug:
-            print(self.design)
-            print('total number of trials: %d ' % self.totaltrials)
 
-        self.currenttrial = 0
+def make_row(trial, usage, resp, resptime):
+    """ Row of the results file for the response to a pair """
 
-    def update(self, dt):
-        pass
-
-    def on_draw(self):
-        """ Executed when draws on the screen"""
-
-        # clear the buffer
-        pyglet.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
-        self.clear()
-
-        # ticks the clock
-        # dt = clock.tick() # ticking the clock
-        # print(f"FPS is {clock.get_fps()}")
-
-        if self.debug:
-            print('-------- ondraw')
-            print('self.present_stim %d' % self.present_stim)
-
-        if self.experimentphase == 0:
-            if self.debug:
-                print('experiment phase 0: welcome')
-            # draws instruction text
-            self.welcome_text.draw()
-
-        # go through the trials 
-        elif self.experimentphase == 1:
-
-            if self.debug:
-                print('experiment phase 1: going through the trials')
-
-            # load images only on the first frame
-            if self.firstframe:
-                print('trial: %d' % self.currenttrial)
-
-                # load images
-                self.load_images()
-
-                # saves presentation time
-                self.stimstarttime = datetime.datetime.now()
-
-            # draw images on the screen for a limited time
-            if (presentation_time is None) or (self.present_stim):
-
-                self.ref_image.blit(int(self.width * self.ref_position), int(self.height * 0.5))
-                self.test_image.blit(int(self.width * self.test_position), int(self.height * 0.5))
-
-
-                # draw label texts
-                self.reference_text.x = int(self.width * self.ref_position)
-                self.reference_text.draw()
-
-                self.test_text.x = int(self.width * self.test_position)
-                self.test_text.draw()
-
-            # draw instruction text
-            self.instructions_ontrial.draw()
-
-            # timing
-            self.firstframe = False
-
-            # checking if stim time has passed
-            if presentation_time is not None and self.present_stim:
-                deltat = datetime.datetime.now() - self.stimstarttime
-
-                if deltat.total_seconds() > presentation_time:
-                    self.present_stim = False
-
-        elif self.experimentphase == 2:
-            if self.debug:
-                print('experiment phase 2: goodbye')
-            self.dispatch_event('on_close')
-
-            # flipping the buffers
-        self.flip()
-        # pyglet.gl.glFlush()
-
-    def checkcontinue(self):
-        """ Checks if we're at the end of the trials"""
-        self.firstframe = True
-        self.present_stim = True
-
-        if self.currenttrial >= self.totaltrials:
-            self.experimentphase = 2
-            # self.dispatch_event('on_close')
-
-    def load_images(self):
-        """ Loads images of current trial """
-        # load files 
-        if self.debug:
-            print('loading files')
-
-        self.ref_image = pyglet.image.load("images_tiny/" + self.design['image_a'][self.currenttrial])
-        self.test_image = pyglet.image.load("images_tiny/" + self.design['image_b'][self.currenttrial])
-
-        # changes anchor to the center of the image
-        self.ref_image.anchor_x = self.ref_image.width // 2
-        self.ref_image.anchor_y = self.ref_image.height // 2
-
-        self.test_image.anchor_x = self.test_image.width // 2
-        self.test_image.anchor_y = self.test_image.height // 2
-
-        self.ref_position = 0.25
-        self.test_position = 0.75
+    left_right = 'left' if resp == 0 else 'right'
+# 'usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b', 'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime'
+    coresp_filter_a = trial['f_a_og']
+    coresp_filter_b = trial['f_b_og']
 
+    if coresp_filter_a == 'OG':
+        coresp_filter_a = coresp_filter_b
 
-    def savetrial(self, resp, resptime):
-        """ Save the response of the current trial to the results file """
+    if coresp_filter_b == 'OG':
+        coresp_filter_b = coresp_filter_a
 
-        left_right = 'left' if resp == 0 else 'right'
-# 'usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b', 'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime'
-        coresp_filter_a = self.design['f_a_og'][self.currenttrial]
-        coresp_filter_b = self.design['f_b_og'][self.currenttrial]
-
-        if coresp_filter_a == 'OG':
-            coresp_filter_a = coresp_filter_b
-
-        if coresp_filter_b == 'OG':
-            coresp_filter_b = coresp_filter_a
-
-        if left_right == 'left':
-            selected_filter = self.design['f_a_og'][self.currenttrial]
-            selected_intensity = self.design['i_a'][self.currenttrial]
-            coresp_selected_filter = coresp_filter_a
-        else:
-            selected_filter = self.design['f_b_og'][self.currenttrial]
-            selected_intensity = self.design['i_b'][self.currenttrial]
-            coresp_selected_filter = coresp_filter_b
-
-
-        row = [self.usage,
-               self.design['image_a'][self.currenttrial],
-               self.design['image_b'][self.currenttrial],
-               self.design['f_a_og'][self.currenttrial],
-               self.design['f_b_og'][self.currenttrial],
-               coresp_filter_a,
-               coresp_filter_b,
-               self.design['i_a'][self.currenttrial],
-               self.design['i_b'][self.currenttrial],
-               selected_filter,
-               coresp_selected_filter,
-               selected_intensity,
-               left_right,
-               resptime]
-        self.resultswriter.writerow(row)
-        print('Trial %d saved' % self.currenttrial)
-
-    ## Event handlers
-    def on_close(self):
-        """ Executed when program finishes """
-
-        self.rf.close()  # closing results csv file
-        self.close()  # closing window
-
-    def on_key_press(self, symbol, modifiers):
-        """ Executed when a key is pressed"""
-
-        if symbol == key.ESCAPE:
-            self.dispatch_event('on_close')
-
-        if symbol == key.Y:
-            self.usage = 'yes'
-
-        if symbol == key.N:
-            self.usage = 'no'
-
-        elif (symbol == key.NUM_1 or symbol == key.LEFT) and self.experimentphase == 1:
-            print("Press: Left arrow")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=0, resptime=deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-
-        elif (symbol == key.NUM_1 or symbol == key.RIGHT) and self.experimentphase == 1:
-            print("Press: Right arrow")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=1, resptime=deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-
-
-        elif symbol == key.ENTER and self.experimentphase == 0:
-            if self.debug:
-                print("ENTER")
-            self.experimentphase += 1
-
-        self.dispatch_event('on_draw')
-
-    #####################################################################
+    if left_right == 'left':
+        selected_filter = trial['f_a_og']
+        selected_intensity = trial['i_a']
+        coresp_selected_filter = coresp_filter_a
+    else:
+        selected_filter = trial['f_b_og']
+        selected_intensity = trial['i_b']
+        coresp_selected_filter = coresp_filter_b
+
+    return [usage,
+            trial['image_a'],
+            trial['image_b'],
+            trial['f_a_og'],
+            trial['f_b_og'],
+            coresp_filter_a,
+            coresp_filter_b,
+            trial['i_a'],
+            trial['i_b'],
+            selected_filter,
+            coresp_selected_filter,
+            selected_intensity,
+            left_right,
+            resptime]
+
+
+paradigm = Paradigm('pair', instructions, instructions_ontrial,
+                    image_columns=['image_a', 'image_b'], imagedir='images_tiny/',
+                    labels=['Image A', 'Image B'], positions=[0.25, 0.75],
+                    response_keys={key.NUM_1: (0, 'Left arrow'),
+                                   key.LEFT: (0, 'Left arrow'),
+                                   key.RIGHT: (1, 'Right arrow')},
+                    header=['usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b',
+                            'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime'],
+                    make_row=make_row, presentation_time=presentation_time,
+                    make_design=make_design, make_sampler=make_sampler)
 
 
 if __name__ == "__main__":
 
+    # --observer <id>: observer id of the results database
+    if '--observer' in sys.argv:
+        observer = parse_observer_argument(sys.argv)
+
+    # design file, 'random' / 'random:<seed>' for a design built at startup,
+    # or 'adaptive' / 'adaptive:<seed>' for adaptive pair selection
     if len(sys.argv) > 1:
-        designfile = sys.argv[1]
+        designfile, seed, adaptive = parse_design_argument(sys.argv[1])
 
-    # it no argument passed, uses default design file    
+    # it no argument passed, builds a randomized design
     else:
-        designfile = 'design_pair_experiment_2.csv'
+        designfile, seed, adaptive = None, None, False
+
+    # second argument: results file of an interrupted session
+    if len(sys.argv) > 2:
+        resumefile = sys.argv[2]
 
     # for fullscreen, use fullscreen=True and give your correct screen resolution in width= and height=
-    win = Experiment(caption="Rating experiment - double stimulus assessment",
-                     vsync=False, height=1000, width=1400, fullscreen=False)
+    win = Experiment(paradigm, designfile, resumefile, seed, adaptive, observer=observer,
+                     caption="Rating experiment - double stimulus assessment",
+                     vsync=True, height=1000, width=1400, fullscreen=False)
     pyglet.app.run()
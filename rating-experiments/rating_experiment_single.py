@@ -12,26 +12,64 @@ E.g.
 
 python rating_experiment_single.py mydesignfile.csv
 
+Without a design file (or with 'random'), a randomized design is built for
+every observer at startup. The seed is drawn at random and saved in the
+results file; to repeat a design, pass the seed as 'random:<seed>'.
+E.g.
+
+python rating_experiment_single.py random:1234
+
 It saves the responses from the observer in a results file.
 
+To resume an interrupted session, pass its results file as the second parameter.
+The trials already done are skipped and the results are appended to that file.
+E.g.
+
+python rating_experiment_single.py mydesignfile.csv single_results/single_result_3.csv
+
+A session with a randomized design is resumed with the same design, its seed
+is read from the results file.
+E.g.
+
+python rating_experiment_single.py random single_results/single_result_3.csv
+
+With 'adaptive' (or 'adaptive:<seed>') the intensity of every trial is chosen
+for each filter from the answers so far (Psi method), until the detection
+threshold of every filter is estimated (see staircase.py). Only the images in
+single_images_tiny/ are used.
+E.g.
+
+python rating_experiment_single.py adaptive
+
+With experiment.results_db set, the trials also go into the results database.
+--observer <id> stores the id of the observer with them (none otherwise).
+E.g.
+
+python rating_experiment_single.py random --observer o17
+
 
 v2: it allows unlimited or limited presentation time. Change the global variable
     presentation_time
 
+v3: the experiment itself runs in experiment.py, this file only defines the
+    single stimulus paradigm (image, keys and results columns)
+
 
 Seminar: Image quality and human visual perception, SoSe 2020, TU Berlin
 @author: G. Aguilar, June 2020
 
 """
 
-import csv
-import datetime
 import sys
 import pyglet
-from pyglet import window
-from pyglet import clock
 from pyglet.window import key
 from pathlib import Path
+from experiment import Experiment, Paradigm, parse_design_argument, parse_observer_argument
+
+# the design engine lives in design-creator/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'design-creator'))
+from design_engine import stimulus_table, single_design, design_columns
+from staircase import index_images, AdaptiveThresholds
 
 
 
@@ -61,295 +99,82 @@ instructions_ontrial = """ 1: unedited - ... - 5: heavily edited """
 #presentation_time = 1 # presentation time in seconds, None for unlimited presentation
 presentation_time = None
 
+## results file of an interrupted session to resume, None for a new session
+resumefile = None
 
-def read_design_csv(fname):
-    """ Reads a CSV design file and returns it in a dictionary"""
-    
-    design = open(fname)
-    header = design.readline().strip('\n').split(',')
-    #print header
-    data   = design.readlines()
-    
-    new_data = {}
-    
-    for k in header:
-        new_data[k] = []
-    for l in data:
-        curr_line = l.strip().split(',')
-        for j, k in enumerate(header):
-            new_data[k].append(curr_line[j])
-    return new_data
+## observer id stored with the trials in the results database
+## (experiment.results_db), None to leave it empty
+observer = None
 
+## randomized designs built at startup: scenes, filters and intensities, and
+## the maximum number of trials of the same scene in a row
+design_scenes = ["Girl1", "Girl2", "Lake", "Temple"]
+design_filters = ["Clarendon", "Lark", "Juno"]
+design_intensities = ["0", "25", "50", "75", "100"]
+design_max_run = 3
 
-###############################################################################
-class Experiment(window.Window):
-    
+## adaptive sessions: posterior standard deviation of the thresholds at which a
+## filter is done (in intensity units), and the maximum number of trials per filter
+adaptive_target_sd = 8.0
+adaptive_max_trials_per_filter = 40
 
-    def __init__(self, *args, **kwargs):
-
-        #Let all of the arguments pass through
-        self.usage = ""
-        self.win = window.Window.__init__(self, *args, **kwargs)
-        
-        self.debug = False
-        
-        
-        clock.schedule_interval(self.update, 1.0/30) # update at FPS of Hz
-        
-        # Setting up text objects
-        self.welcome_text = pyglet.text.Label(instructions,
-                                  font_name='Arial', multiline=True,
-                                  font_size=25, x=int(self.width/2.0), y=int(self.height/2.0),
-                                  width=int(self.width*0.75), color=(0, 0, 0, 255),
-                                  anchor_x='center', anchor_y='center')
-        
-        self.instructions_ontrial = pyglet.text.Label(instructions_ontrial,
-                                  font_name='Arial', multiline=False,
-                                  font_size=20, x=int(self.width/2.0), y=int(self.height*0.1),
-                                  width=int(self.width*0.75), color=(0, 0, 0, 255),
-                                  anchor_x='center', anchor_y='center')
-    
-                
-        # Design file
-        global designfile
-        self.designfile = designfile
-        
-        # Results file - assigning filename
-        s = designfile.split('.')
-        s[-1] = '_results.csv'
-        self.resultsfile = ''.join(s)
 
+def make_design(rng):
+    """ Builds the randomized design of an observer """
+    table = stimulus_table(design_scenes, design_filters, design_intensities, ".jpg")
+    rows = single_design(table, rng, max_run=design_max_run)
+    return design_columns(rows, ['image', 'filter', 'intensity'])
 
 
-        # Results file - assigning filename
-        self.resultsfile = 'single_results/single_result_1.csv'
+def make_sampler(rng):
+    """ Threshold staircases of an adaptive session, over the images on disk """
+    index = index_images(paradigm.imagedir, scenes=design_scenes, filters=design_filters)
+    return AdaptiveThresholds(index, rng, target_sd=adaptive_target_sd,
+                              max_trials_per_filter=adaptive_max_trials_per_filter)
 
-        file = Path(self.resultsfile)
-        index = 2
 
-        # prevents result from being replaced by new results
-        while file.is_file():
-            self.resultsfile = 'single_results/single_result_' + str(index) + '.csv'
-            file = Path(self.resultsfile)
-            index += 1
+def make_row(trial, usage, resp, resptime):
+    """ Row of the results file for the rating of an image """
+    return [usage, trial['image'], trial['filter'], trial['intensity'], resp, resptime]
 
 
-        
-        # opening the results file, writing the header
-        self.rf = open(self.resultsfile, 'w')
-        self.resultswriter = csv.writer(self.rf)  
-        header = ['usage', 'image', 'filter', 'intensity', 'response', 'resptime']
-        self.resultswriter.writerow(header)
-    
-        
-        # experiment control 
-        self.experimentphase = 0 # 0 for intro, 1 for running trials, 2 for good bye
-        self.firstframe = True
-        self.present_stim = True
-        
-        # calling some routines on start
-        self.loaddesign()
-        # forces a first draw of the screen
-        self.dispatch_event('on_draw')
-
-        self.test_position = 0.5
-        
-    def loaddesign(self):
-        """ Loads the design file specifications"""
-        self.design = read_design_csv(self.designfile)
-        self.totaltrials = len(self.design['image'])
-        
-        if self.debug:
-            print(self.design)
-            print('total number of trials: %d ' % self.totaltrials)
-            
-        self.currenttrial = 0
-    
-    def update(self, dt):
-        pass
-    
-    def on_draw(self):
-        """ Executed when draws on the screen"""
-        
-        
-        # clear the buffer
-        pyglet.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
-        self.clear()
-        
-        # ticks the clock
-        #dt = clock.tick() # ticking the clock
-        #print(f"FPS is {clock.get_fps()}")
-        
-        
-        if self.debug:
-            print('-------- ondraw')
-            print('self.present_stim %d' % self.present_stim)
-        
-        
-        if self.experimentphase == 0:
-            if self.debug:
-                print('experiment phase 0: welcome')
-            # draws instruction text
-            self.welcome_text.draw()
-            
-        # go through the trials 
-        elif self.experimentphase == 1:
-            
-            if self.debug:
-                print('experiment phase 1: going through the trials')
-            
-            
-            # load images only on the first frame
-            if self.firstframe:
-                print('trial: %d' % self.currenttrial)
-            
-                # load images
-                self.load_images()
-                
-                # saves presentation time
-                self.stimstarttime =  datetime.datetime.now()
-            
-           
-            # draw images on the screen for a limited time
-            if (presentation_time is None) or (self.present_stim):
-                self.test_image.blit(int(self.width*self.test_position), int(self.height*0.5))
-            
-            
-            # draw instruction text
-            self.instructions_ontrial.draw()
-
-            
-            # timing
-            self.firstframe = False
-            
-            # checking if stim time has passed
-            if presentation_time is not None and self.present_stim:
-                deltat = datetime.datetime.now() - self.stimstarttime
-                
-                if deltat.total_seconds() > presentation_time:
-                    self.present_stim = False
-            
-        elif self.experimentphase == 2:
-            if self.debug:
-                print('experiment phase 2: goodbye')
-            self.dispatch_event('on_close')  
-            
-        
-        # flipping the buffers
-        self.flip()
-        #pyglet.gl.glFlush()
-    
-    def checkcontinue(self):
-        """ Checks if we're at the end of the trials"""
-        self.firstframe = True
-        self.present_stim = True
-        
-        if self.currenttrial>=self.totaltrials:
-             self.experimentphase = 2
-             #self.dispatch_event('on_close')  
-             
-        
-    def load_images(self):
-        """ Loads images of current trial """
-        # load files 
-        if self.debug:
-            print('loading files')
-            
-        self.test_image = pyglet.image.load("single_images_tiny/" + self.design['image'][self.currenttrial])
-        
-        # changes anchor to the center of the image
-        self.test_image.anchor_x = self.test_image.width // 2
-        self.test_image.anchor_y = self.test_image.height // 2
-        
-
-
-    def savetrial(self, resp, resptime):
-        """ Save the response of the current trial to the results file """
-        
-        row = [self.usage, self.design['image'][self.currenttrial],
-               self.design['filter'][self.currenttrial],
-               self.design['intensity'][self.currenttrial],
-               resp, resptime]
-        self.resultswriter.writerow(row)
-        print('Trial %d saved' % self.currenttrial)
-        
-        
-    ## Event handlers
-    def on_close(self):
-        """ Executed when program finishes """
-        
-        self.rf.close() # closing results csv file
-        self.close() # closing window
-        
-    def on_key_press(self, symbol, modifiers):
-        """ Executed when a key is pressed"""
-        
-        if symbol == key.ESCAPE:
-            self.dispatch_event('on_close')  
-
-        if symbol == key.Y:
-            self.usage = 'yes'
-
-        if symbol == key.N:
-            self.usage = 'no'
-
-        elif (symbol == key.NUM_1 or symbol == key._1) and self.experimentphase==1:
-            print("Press: 1")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=1, resptime = deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-            
-        elif (symbol == key.NUM_2 or symbol == key._2) and self.experimentphase==1:
-            print("Press: 2")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=2, resptime = deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-            
-        elif (symbol == key.NUM_3 or symbol == key._3) and self.experimentphase==1:
-            print("Press: 3")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=3, resptime = deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-            
-        elif (symbol == key.NUM_4 or symbol == key._4) and self.experimentphase==1:
-            print("Press: 4")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=4, resptime = deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-        
-        elif (symbol == key.NUM_5 or symbol == key._5) and self.experimentphase==1:
-            print("Press: 5")
-            deltat = datetime.datetime.now() - self.stimstarttime
-            self.savetrial(resp=5, resptime = deltat.total_seconds())
-            self.currenttrial += 1
-            self.checkcontinue()
-                
-        elif symbol == key.ENTER and self.experimentphase==0:
-            if self.debug:
-                print("ENTER")
-            self.experimentphase += 1
-        
-        self.dispatch_event('on_draw') 
-                 
+# keys 1-5, on the number row and on the numpad
+response_keys = {}
+for k in range(1, 6):
+    response_keys[getattr(key, 'NUM_%d' % k)] = (k, str(k))
+    response_keys[getattr(key, '_%d' % k)] = (k, str(k))
+
+paradigm = Paradigm('single', instructions, instructions_ontrial,
+                    image_columns=['image'], imagedir='single_images_tiny/',
+                    response_keys=response_keys,
+                    header=['usage', 'image', 'filter', 'intensity', 'response', 'resptime'],
+                    make_row=make_row, presentation_time=presentation_time,
+                    make_design=make_design, make_sampler=make_sampler)
 
 
 #####################################################################
 if __name__ == "__main__":
     
+    # --observer <id>: observer id of the results database
+    if '--observer' in sys.argv:
+        observer = parse_observer_argument(sys.argv)
+
+    # design file, 'random' / 'random:<seed>' for a design built at startup,
+    # or 'adaptive' / 'adaptive:<seed>' for adaptive thresholds
     if len(sys.argv) > 1:
-        designfile = sys.argv[1]
+        designfile, seed, adaptive = parse_design_argument(sys.argv[1])
 
-    # it no argument passed, uses default design file    
+    # it no argument passed, builds a randomized design
     else:
-        designfile = 'design_single_experiment_2.csv'
+        designfile, seed, adaptive = None, None, False
+
+    # second argument: results file of an interrupted session
+    if len(sys.argv) > 2:
+        resumefile = sys.argv[2]
 
     
     # for fullscreen, use fullscreen=True and give your correct screen resolution in width= and height=
-    win = Experiment(caption="Rating experiment - single stimulus assessment", 
-                     vsync=False, height=800, width=1200, fullscreen=False)
+    win = Experiment(paradigm, designfile, resumefile, seed, adaptive, observer=observer,
+                     caption="Rating experiment - single stimulus assessment", 
+                     vsync=True, height=800, width=1200, fullscreen=False)
     pyglet.app.run()
-
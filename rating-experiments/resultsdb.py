@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Results database of the rating experiments.
+
+Besides its results file, a session can write every trial into a SQLite
+database (experiment.results_db), so analyses can query the trials while
+the experiment runs and nothing has to be copied from rating-experiments/
+into the evaluation folders by hand:
+
+    observers   id, name
+    sessions    id, paradigm, observer, station, resultsfile, seed,
+                started, header
+    trials      session, trial, observer, usage, scene, filter,
+                intensity, image, response, resptime, row
+
+The observer of a session is the id the experiment was started with
+(--observer of the paradigm scripts), or empty. Imported results files
+get the observer of their name if they were renamed after it
+(chris_pair_result_1.csv).
+
+A trial keeps its whole results row (row, as JSON) and, for the queries,
+the scene, the filter and intensity of the image that was chosen (pair)
+or rated (single), with indexes on the observer, scene, filter and
+intensity. The results file stays the complete record of a session (it is
+journaled and used for resuming). A session resumed from its results file
+(resume=True) continues the last session of that file and station in the
+database, every other start is a new session, even if a results file name
+comes again (e.g. after the results folder was cleaned up).
+
+The database is local to a station: it runs in WAL mode (analyses read
+while the experiment writes), which doesn't work on network filesystems,
+so it must not be on a shared folder. Trials of other stations are added by
+importing their results files (import_csv).
+
+ResultsDB has the interface of resultswriter.ResultsWriter (writerow,
+close) and writes like it: writerow() only queues the row, a background
+thread commits the queued rows in groups, and the render loop never waits
+for the database (or its lock). query() returns the results rows of a subset of the trials, and
+evaluation/loader.py turns them into a table (load_database).
+
+Usage:
+
+python resultsdb.py results.db import pair_results/*.csv single_results/*.csv
+python resultsdb.py results.db
+
+rows = query('results.db', paradigm='pair', filter=['Lark', 'Juno'], intensity=[75, 100])
+
+"""
+
+import json
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from resume import read_results
+
+## seconds a writer waits for the lock of the database held by another
+## connection (e.g. an import), on the background thread of ResultsDB
+busy_timeout = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    paradigm TEXT NOT NULL,
+    observer INTEGER REFERENCES observers(id),
+    station TEXT,
+    resultsfile TEXT,
+    seed INTEGER,
+    started TEXT,
+    header TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    session INTEGER NOT NULL REFERENCES sessions(id),
+    trial INTEGER NOT NULL,
+    observer INTEGER REFERENCES observers(id),
+    usage TEXT,
+    scene TEXT,
+    filter TEXT,
+    intensity INTEGER,
+    image TEXT,
+    response TEXT,
+    resptime REAL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (session, trial)
+);
+CREATE INDEX IF NOT EXISTS trials_observer ON trials (observer);
+CREATE INDEX IF NOT EXISTS trials_scene ON trials (scene, filter, intensity);
+CREATE INDEX IF NOT EXISTS trials_filter ON trials (filter, intensity);
+CREATE INDEX IF NOT EXISTS trials_intensity ON trials (intensity);
+CREATE INDEX IF NOT EXISTS sessions_resultsfile ON sessions (resultsfile, station);
+"""
+
+
+def connect(filename):
+    """ Connection to a results database, created if needed """
+    db = sqlite3.connect(filename, timeout=busy_timeout)
+    db.execute('PRAGMA journal_mode=WAL')
+    # in WAL mode a commit survives a crash of the experiment without an fsync
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+def observer_name(resultsfile):
+    """ Observer of a results file renamed after its observer (as in
+    evaluation/aggregate.py): chris_pair_result_1.csv -> chris, None for a
+    file as the experiment names it (pair_result_1.csv) """
+    stem = Path(resultsfile).stem
+    for marker in ('_pair_result', '_single_result'):
+        if marker in stem and stem.split(marker)[0]:
+            return stem.split(marker)[0]
+    return None
+
+
+def trial_columns(row):
+    """ Indexed columns of a results row (dictionary): scene, filter,
+    intensity and image of the chosen (pair) or rated (single) image,
+    response and response time """
+    if 'image_a' in row:
+        image = row['image_b'] if row.get('left_right') == 'right' else row['image_a']
+        filter_name, intensity, response = row.get('chosen_f_og'), row.get('chosen_i'), row.get('left_right')
+    else:
+        image = row.get('image')
+        filter_name, intensity, response = row.get('filter'), row.get('intensity'), row.get('response')
+    scene = image.split('_', 1)[0] if image else None
+    intensity = int(intensity) if intensity not in (None, '') else None
+    resptime = float(row['resptime']) if row.get('resptime') not in (None, '') else None
+    return scene, filter_name, intensity, image, None if response is None else str(response), resptime
+
+
+class ResultsDB:
+    """ Writes the trials of a session into a results database, like
+    ResultsWriter writes them into the results file: the rows are queued,
+    a background thread commits them every flush_trials trials or flush_ms
+    milliseconds """
+
+    def __init__(self, filename, paradigm, header, resultsfile, observer=None, seed=None, station=None,
+                 resume=False, flush_trials=10, flush_ms=1000):
+        self.filename = filename
+        self.header = header
+        self.flush_trials = flush_trials
+        self.flush_ms = flush_ms
+        self._start = (paradigm, str(resultsfile), observer, seed, station or socket.gethostname(), resume)
+        self.db = None
+        self.session = None
+
+        self._pending = []  # rows queued, but not in the database yet
+        self._lock = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        """ Connects and starts (or continues) the session, on the background thread """
+        paradigm, resultsfile, observer, seed, station, resume = self._start
+        self.db = self.db or connect(self.filename)
+        with self.db:
+            # without an observer id the observer of the session stays empty
+            self.observer = None
+            if observer is not None:
+                self.db.execute('INSERT OR IGNORE INTO observers (name) VALUES (?)', (observer,))
+                self.observer = self.db.execute('SELECT id FROM observers WHERE name = ?',
+                                                (observer,)).fetchone()[0]
+            # a resumed session continues where its trials end, with its observer
+            found = None
+            if resume:
+                found = self.db.execute('SELECT id, observer FROM sessions WHERE resultsfile = ? AND station = ? '
+                                        'ORDER BY id DESC LIMIT 1', (resultsfile, station)).fetchone()
+            if found is not None:
+                session = found[0]
+                if self.observer is None:
+                    self.observer = found[1]
+            else:
+                session = self.db.execute(
+                    'INSERT INTO sessions (paradigm, observer, station, resultsfile, seed, started, header) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (paradigm, self.observer, station, resultsfile, seed,
+                     datetime.now().isoformat(timespec='seconds'), json.dumps(self.header))).lastrowid
+        self.ntrials = self.db.execute('SELECT COUNT(*) FROM trials WHERE session = ?', (session,)).fetchone()[0]
+        self.session = session
+
+    def writerow(self, row):
+        """ Queues the results row of the next trial """
+        self.writerows([row])
+
+    def writerows(self, rows):
+        """ Queues the results rows of the next trials """
+        with self._lock:
+            self._pending += [list(row) for row in rows]
+            if len(self._pending) >= self.flush_trials:
+                self._lock.notify()
+
+    def _commit(self, rows):
+        """ Writes rows into the database, in one transaction """
+        values = []
+        for row in rows:
+            record = dict(zip(self.header, row))
+            values.append((self.session, self.ntrials + len(values), self.observer, record.get('usage'))
+                          + trial_columns(record) + (json.dumps(record, default=str),))
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', values)
+        self.ntrials += len(values)
+
+    def _run(self):
+        """ Group commit loop on the background thread. A database that is
+        locked longer than busy_timeout is tried again with the next commit """
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_ms / 1000.0
+                while not self._closing and len(self._pending) < self.flush_trials:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(remaining)
+                rows, self._pending = self._pending, []
+                closing = self._closing
+
+            try:
+                if self.session is None:
+                    self._open()
+                if rows:
+                    self._commit(rows)
+            except sqlite3.Error as error:
+                with self._lock:
+                    self._pending[:0] = rows
+                    missing = len(self._pending)
+                if closing:
+                    print('Results database %s: %s, %d trials are only in the results file'
+                          % (self.filename, error, missing))
+                else:
+                    print('Results database %s: %s, trying again' % (self.filename, error))
+            if closing:
+                break
+        if self.db is not None:
+            self.db.close()
+
+    def close(self):
+        """ Commits the remaining rows and closes the database """
+        with self._lock:
+            self._closing = True
+            self._lock.notify()
+        self._thread.join()
+
+
+def import_csv(filename, files, station='import'):
+    """ Imports results files into a results database, files imported
+    before are skipped. Returns the number of trials imported """
+    db = connect(filename)
+    imported = 0
+    for resultsfile in files:
+        resultsfile = str(resultsfile)
+        done = db.execute('SELECT 1 FROM sessions WHERE resultsfile = ? AND station = ?',
+                          (resultsfile, station)).fetchone()
+        rows = read_results(resultsfile)
+        if done or not rows:
+            continue
+        header = list(rows[0])
+        paradigm = 'pair' if 'image_a' in header else 'single'
+        seed = int(rows[0]['seed']) if rows[0].get('seed') else None
+        writer = ResultsDB(filename, paradigm, header, resultsfile, observer=observer_name(resultsfile),
+                           seed=seed, station=station)
+        writer.writerows([[r[k] for k in header] for r in rows])
+        writer.close()
+        imported += len(rows)
+    db.close()
+    return imported
+
+
+def query(filename, paradigm=None, observer=None, usage=None, scene=None, filter=None, intensity=None):
+    """ Results rows (dictionaries, with observer, session and file) of the
+    trials that match all given conditions, a value or a list of values
+    each. The observer of sessions without an observer id is None """
+    conditions, parameters = [], []
+    for column, value in [('sessions.paradigm', paradigm), ('observers.name', observer),
+                          ('trials.usage', usage), ('trials.scene', scene),
+                          ('trials.filter', filter), ('trials.intensity', intensity)]:
+        if value is None:
+            continue
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        conditions.append('%s IN (%s)' % (column, ', '.join('?' * len(values))))
+        parameters += values
+
+    sql = ('SELECT observers.name, trials.session, sessions.resultsfile, trials.row FROM trials '
+           'JOIN sessions ON sessions.id = trials.session '
+           'LEFT JOIN observers ON observers.id = trials.observer')
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY trials.session, trials.trial'
+
+    db = connect(filename)
+    rows = []
+    for name, session, resultsfile, row in db.execute(sql, parameters):
+        row = json.loads(row)
+        row['observer'], row['session'], row['file'] = name, session, resultsfile
+        rows.append(row)
+    db.close()
+    return rows
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    if not args or (len(args) > 1 and args[1] != 'import'):
+        print('usage: python resultsdb.py <database> [import <results files>]')
+        sys.exit(1)
+
+    if len(args) > 1:
+        print('%d trials imported' % import_csv(args[0], args[2:]))
+
+    db = connect(args[0])
+    summary = db.execute('SELECT sessions.paradigm, observers.name, COUNT(DISTINCT sessions.id), COUNT(*) '
+                         'FROM trials JOIN sessions ON sessions.id = trials.session '
+                         'LEFT JOIN observers ON observers.id = trials.observer '
+                         'GROUP BY sessions.paradigm, observers.name ORDER BY 1, 2').fetchall()
+    print('%-8s %-24s %8s %8s' % ('paradigm', 'observer', 'sessions', 'trials'))
+    for paradigm, name, sessions, trials in summary:
+        print('%-8s %-24s %8d %8d' % (paradigm, name or '-', sessions, trials))
+    db.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Buffered, crash safe, append only writer for the results files.
+
+Every trial is first appended to a write-ahead journal next to the results
+file (pair_result_1.csv -> pair_result_1.csv.journal) and handed to the OS,
+which is a single small write on the main thread. A background thread does
+the group commit: every 'flush_trials' trials or 'flush_ms' milliseconds it
+fsyncs the journal, appends the new rows to the results file and fsyncs it.
+The render loop never waits for the disk, and a trial that was journaled
+survives a crash or kill of the experiment.
+
+When the writer is closed properly, the journal is deleted. A journal that
+is still there on the next start belongs to a session that crashed: the
+rows that didn't make it into the results file are replayed from it
+(recover / recover_journals).
+
+Journal lines are CSV rows, prefixed with the index of the row in the
+results file (0 for the first row after the header).
+
+"""
+
+import csv
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+JOURNAL_SUFFIX = '.journal'
+
+
+def _complete_lines(data):
+    """ Splits bytes into lines, without a last incomplete line (no newline) """
+    end = data.rfind(b'\n')
+    if end < 0:
+        return [], 0
+    return data[:end + 1].decode('utf-8').splitlines(), end + 1
+
+
+def _format_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(row)
+    return buffer.getvalue()
+
+
+def count_rows(filename):
+    """ Returns the number of complete data rows of a results file, truncating
+    a last line that was only partially written """
+    if not Path(filename).is_file():
+        return 0
+    with open(filename, 'rb+') as f:
+        data = f.read()
+        lines, end = _complete_lines(data)
+        if end < len(data):
+            f.truncate(end)
+    return max(len(lines) - 1, 0)  # without the header
+
+
+def recover(filename):
+    """ Appends the journaled rows that are missing in a results file and
+    deletes the journal. Returns the number of recovered rows. """
+    journal = filename + JOURNAL_SUFFIX
+    if not Path(journal).is_file():
+        return 0
+
+    nrows = count_rows(filename)
+    with open(journal, 'rb') as f:
+        lines, _ = _complete_lines(f.read())
+
+    missing = []
+    for record in csv.reader(lines):
+        index, row = int(record[0]), record[1:]
+        if index == nrows + len(missing):
+            missing.append(row)
+
+    with open(filename, 'a', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(missing)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal)
+
+    return len(missing)
+
+
+def recover_journals(folder):
+    """ Recovers all results files of a folder that have a journal left """
+    recovered = {}
+    for journal in sorted(Path(folder).glob('*' + JOURNAL_SUFFIX)):
+        filename = str(journal)[:-len(JOURNAL_SUFFIX)]
+        recovered[filename] = recover(filename)
+        print('Recovered %d trials into %s' % (recovered[filename], filename))
+    return recovered
+
+
+class ResultsWriter:
+    """ Drop-in for csv.writer on a results file, with group commit """
+
+    def __init__(self, filename, header, flush_trials=10, flush_ms=1000):
+        self.filename = filename
+        self.journalfile = filename + JOURNAL_SUFFIX
+        self.flush_trials = flush_trials
+        self.flush_ms = flush_ms
+
+        # rows of a crashed session are recovered first, then appended to
+        recover(filename)
+        self.nrows = count_rows(filename)
+
+        self.f = open(filename, 'a', newline='')
+        if self.f.tell() == 0:
+            self.f.write(_format_row(header))
+            self._sync(self.f)
+        self.journal = open(self.journalfile, 'a', newline='')
+
+        self._pending = []  # rows journaled, but not in the results file yet
+        self._lock = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def writerow(self, row):
+        """ Journals a row and queues it for the next group commit """
+        line = _format_row(row)
+        with self._lock:
+            self.journal.write(_format_row([self.nrows] + list(row)))
+            self.journal.flush()  # in the OS from now on, survives a kill
+            self.nrows += 1
+            self._pending.append(line)
+            if len(self._pending) >= self.flush_trials:
+                self._lock.notify()
+
+    def _commit(self, lines):
+        """ Makes the rows durable: journal first, then the results file """
+        os.fsync(self.journal.fileno())
+        self.f.write(''.join(lines))
+        self._sync(self.f)
+
+    def _run(self):
+        """ Group commit loop on the background thread """
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_ms / 1000.0
+                while not self._closing and len(self._pending) < self.flush_trials:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(remaining)
+                lines, self._pending = self._pending, []
+                closing = self._closing
+
+            if lines:
+                # the journal is flushed after every row by the main thread,
+                # here it's only fsynced
+                self._commit(lines)
+            if closing:
+                return
+
+    def close(self):
+        """ Commits the remaining rows, closes the files and deletes the journal """
+        if self.f.closed:
+            return
+        with self._lock:
+            self._closing = True
+            self._lock.notify()
+        self._thread.join()
+
+        self.f.close()
+        self.journal.close()
+        os.remove(self.journalfile)
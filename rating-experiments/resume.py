@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resuming an interrupted session from its results file.
+
+The rows of the results file are matched against the rows of the design by
+their key columns (e.g. image_a and image_b). The design is reordered so that
+the completed rows come first, in the order they were done, followed by the
+remaining ones in design order. The experiment then continues with
+currenttrial = number of completed rows, appending to the same results file.
+
+"""
+
+import csv
+from collections import defaultdict
+
+
+def read_results(resultsfile):
+    """ Reads a results file into a list of dictionaries, one per trial """
+    with open(resultsfile, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def resume_design(design, resultsfile, keys):
+    """ Returns the reordered design (a DesignTable), the number of completed
+    trials and the results rows of the completed trials """
+
+    ntrials = len(design)
+    results = read_results(resultsfile)
+
+    # design rows by key, in design order (the same row can appear twice),
+    # as text like the results rows
+    rows_by_key = defaultdict(list)
+    for i, row in enumerate(zip(*[[str(v) for v in design[k].tolist()] for k in keys])):
+        rows_by_key[row].append(i)
+
+    done = []
+    for row in results:
+        candidates = rows_by_key.get(tuple(row[k] for k in keys))
+        if not candidates:
+            raise ValueError('trial %s of %s is not in the design' %
+                             ([row[k] for k in keys], resultsfile))
+        done.append(candidates.pop(0))
+
+    done_set = set(done)
+    order = done + [i for i in range(ntrials) if i not in done_set]
+    return design.take(order), len(done), results
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive threshold estimation for the single stimulus experiment.
+
+Instead of presenting every filter/intensity combination, the intensity of
+the next trial is chosen for each filter from the answers so far (Psi
+method, Kontsevich & Tyler 1999, for the threshold only). A rating above 1
+('unedited') counts as the filter being detected. The probability of a
+detection at intensity x is a logistic psychometric function
+
+    p(x) = guess + (1 - guess - lapse) / (1 + exp(-slope (x - threshold)))
+
+and the posterior of the threshold is kept on a grid. The next intensity
+is the one that minimizes the expected entropy of the posterior. The
+filters are interleaved at random, every trial shows a random scene that
+has an image of the chosen filter and intensity. A filter is done when the
+posterior standard deviation of its threshold is below target_sd (in
+intensity units) or after max_trials_per_filter trials.
+
+Only images that exist on disk are used: the image folder is indexed by
+the file names <Scene>_<Filter>_<Intensity>.jpg (index_images).
+
+The sampler is used by experiment.py (see rating_experiment_single.py,
+design argument 'adaptive').
+
+"""
+
+import re
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+
+## file names of the filtered images
+IMAGE_PATTERN = re.compile(r'^(?P<scene>[^_]+)_(?P<filter>[^_]+)_(?P<intensity>\d+)\.jpg$')
+
+
+def index_images(folder, scenes=None, filters=None):
+    """ Index of the images in a folder: filter -> intensity -> file names.
+    Files that don't match <Scene>_<Filter>_<Intensity>.jpg are skipped """
+    index = defaultdict(lambda: defaultdict(list))
+    for path in sorted(Path(folder).glob('*.jpg')):
+        match = IMAGE_PATTERN.match(path.name)
+        if match is None:
+            continue
+        if scenes is not None and match['scene'] not in scenes:
+            continue
+        if filters is not None and match['filter'] not in filters:
+            continue
+        index[match['filter']][int(match['intensity'])].append(path.name)
+    return {f: dict(levels) for f, levels in index.items()}
+
+
+class PsiStaircase:
+    """ Threshold posterior of one filter on a grid, over the intensities on disk """
+
+    def __init__(self, levels, grid, slope, guess, lapse):
+        self.levels = np.asarray(sorted(levels), dtype=float)
+        self.grid = grid
+        self.posterior = np.full(len(grid), 1.0 / len(grid))
+        self.ntrials = 0
+
+        # p(detected | intensity, threshold), levels x grid
+        self.p_detect = guess + (1 - guess - lapse) / \
+            (1 + np.exp(-slope * (self.levels[:, None] - grid[None, :])))
+
+    def next_level(self):
+        """ Intensity with the smallest expected posterior entropy """
+        joint_yes = self.p_detect * self.posterior
+        joint_no = (1 - self.p_detect) * self.posterior
+        p_yes = joint_yes.sum(axis=1)
+        p_no = 1 - p_yes
+
+        def entropy(joint, p):
+            post = joint / p[:, None]
+            return -(post * np.log(np.where(post > 0, post, 1))).sum(axis=1)
+
+        expected = p_yes * entropy(joint_yes, p_yes) + p_no * entropy(joint_no, p_no)
+        return int(self.levels[np.argmin(expected)])
+
+    def update(self, level, detected):
+        likelihood = self.p_detect[np.flatnonzero(self.levels == level)[0]]
+        self.posterior *= likelihood if detected else 1 - likelihood
+        self.posterior /= self.posterior.sum()
+        self.ntrials += 1
+
+    def threshold(self):
+        """ Posterior mean and standard deviation of the threshold """
+        mean = (self.grid * self.posterior).sum()
+        sd = np.sqrt(((self.grid - mean) ** 2 * self.posterior).sum())
+        return mean, sd
+
+
+class AdaptiveThresholds:
+    """ Interleaved Psi staircases, one per filter """
+
+    def __init__(self, index, rng, target_sd=8.0, max_trials_per_filter=40, detect_from=2,
+                 slope=0.1, guess=0.05, lapse=0.02):
+        self.index = index  # from index_images
+        self.rng = rng
+        self.target_sd = target_sd
+        self.max_trials_per_filter = max_trials_per_filter
+        self.detect_from = detect_from  # lowest rating that counts as detected
+
+        levels = sorted({level for f in index for level in index[f]})
+        grid = np.linspace(min(levels), max(levels), 201)
+        self.staircases = {f: PsiStaircase(index[f], grid, slope, guess, lapse) for f in index}
+        self.previous = None  # image of the last trial
+        self.finished = False
+
+    def images(self):
+        """ All image files the sampler can choose from """
+        return [name for f in self.index for names in self.index[f].values() for name in names]
+
+    def done(self, filter_name):
+        staircase = self.staircases[filter_name]
+        return staircase.ntrials >= self.max_trials_per_filter or \
+            staircase.threshold()[1] < self.target_sd
+
+    def thresholds(self):
+        """ Threshold estimates, filter -> (mean, sd) """
+        return {f: staircase.threshold() for f, staircase in self.staircases.items()}
+
+    def next_trial(self):
+        """ Image of the next trial as design columns, or None when all filters
+        are done """
+        running = [f for f in sorted(self.staircases) if not self.done(f)]
+        if not running:
+            if not self.finished:
+                for f, (mean, sd) in self.thresholds().items():
+                    print('Threshold %s: %.1f (sd %.1f)' % (f, mean, sd))
+                self.finished = True
+            return None
+
+        filter_name = running[self.rng.integers(len(running))]
+        level = self.staircases[filter_name].next_level()
+        names = self.index[filter_name][level]
+        if len(names) > 1 and self.previous in names:
+            names = [n for n in names if n != self.previous]  # no image twice in a row
+        image = names[self.rng.integers(len(names))]
+
+        self.previous = image
+        return {'image': image, 'filter': filter_name, 'intensity': str(level)}
+
+    def update(self, trial, resp):
+        """ Adds the rating of a trial """
+        self.staircases[trial['filter']].update(int(trial['intensity']), int(resp) >= self.detect_from)
+
+    def replay(self, result):
+        """ Adds a trial of the results file of an interrupted session and
+        returns it as design columns """
+        trial = {k: result[k] for k in ('image', 'filter', 'intensity')}
+        self.update(trial, result['response'])
+        self.previous = trial['image']
+        return trial
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pre-decoded stimulus packs.
+
+A pack is a single binary file with the raw RGBA pixels of all images of a
+stimulus folder, plus an index of name -> offset and shape. The experiment
+memory-maps the pack and creates the textures directly from the mapped
+buffers, so no JPEG is decoded during the experiment, and every observer
+sees exactly the same pixels (the index holds a SHA-256 of every image).
+
+The index also holds the size and modification time of every source file.
+A pack whose images were re-rendered, renamed or removed since it was built
+is stale (stale()) and is not used by the experiment until it is rebuilt.
+
+Layout of the file:
+
+    8 bytes  magic b'STIMPACK'
+    8 bytes  length of the index (little endian uint64)
+    n bytes  index as JSON (utf-8)
+    ...      pixel planes, each one aligned to 4096 bytes
+
+Building a pack from the command line:
+
+python stimpack.py images_tiny/ images_tiny.pack
+python stimpack.py single_images_tiny/ single_images_tiny.pack
+
+"""
+
+import ctypes
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+import pyglet
+
+MAGIC = b'STIMPACK'
+ALIGNMENT = 4096
+
+
+def decode_rgba(path):
+    """ Decodes an image file with pyglet (same decoder as in the experiment)
+    into RGBA rows, bottom row first """
+    image = pyglet.image.load(str(path))
+    width, height = image.width, image.height
+    if image.format == 'RGBA':
+        return width, height, image.get_data('RGBA', width * 4)
+
+    # adding an opaque alpha channel by slicing, pyglet's own format
+    # conversion is very slow
+    rgb = image.get_data('RGB', width * 3)
+    rgba = bytearray(b'\xff') * (width * height * 4)
+    for c in range(3):
+        rgba[c::4] = rgb[c::3]
+    return width, height, bytes(rgba)
+
+
+def build_pack(folder, packfile, pattern='*.jpg'):
+    """ Decodes all images of a folder and writes them into a pack """
+
+    index = {}
+    planes = []
+    offset = 0
+    for path in sorted(Path(folder).glob(pattern)):
+        stat = path.stat()
+        width, height, data = decode_rgba(path)
+        pitch = width * 4
+
+        index[path.name] = {'offset': offset, 'width': width, 'height': height,
+                            'format': 'RGBA', 'pitch': pitch,
+                            'sha256': hashlib.sha256(data).hexdigest(),
+                            'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        planes.append(data)
+        offset += -(-len(data) // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({'source': str(folder), 'images': index}).encode('utf-8')
+    # pixel offsets in the index are relative to the first aligned plane
+    start = -(-(16 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(packfile, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, data in zip(index, planes):
+            f.seek(start + index[name]['offset'])
+            f.write(data)
+        f.truncate(start + offset)
+
+    return index
+
+
+class StimulusPack:
+    """ Memory-mapped, read only view of a pack file """
+
+    def __init__(self, packfile):
+        self.packfile = os.path.abspath(packfile)
+        self.mtime = os.stat(self.packfile).st_mtime_ns
+
+        with open(self.packfile, 'rb') as f:
+            if f.read(8) != MAGIC:
+                raise ValueError('%s is not a stimulus pack' % packfile)
+            length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length).decode('utf-8'))
+            # copy-on-write mapping: ctypes needs a writable buffer, but
+            # nothing is ever written back to the file
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        self.source = header['source']
+        self.index = header['images']
+        self.start = -(-(16 + length) // ALIGNMENT) * ALIGNMENT
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def names(self):
+        return list(self.index)
+
+    def key(self, name):
+        """ Cache key of an image in the pack, as in imagecache.cache_key """
+        return (self.packfile + '/' + name, self.mtime)
+
+    def image(self, name):
+        """ Returns the image as pyglet ImageData on top of the mapped pixels,
+        without copying or decoding """
+        entry = self.index[name]
+        nbytes = entry['pitch'] * entry['height']
+        data = (ctypes.c_ubyte * nbytes).from_buffer(self._mmap, self.start + entry['offset'])
+        return pyglet.image.ImageData(entry['width'], entry['height'], entry['format'],
+                                      data, entry['pitch'])
+
+    def stale(self, folder, names=None):
+        """ Returns the names of the images (all in the pack by default) whose
+        source file in folder is missing or changed since the pack was built """
+        changed = []
+        for name in sorted(set(self.index if names is None else names) & set(self.index)):
+            entry = self.index[name]
+            path = Path(folder) / name
+            if not path.is_file():
+                changed.append(name)
+                continue
+            stat = path.stat()
+            # packs of an earlier version have no size and time of the sources
+            if entry.get('size') != stat.st_size or entry.get('mtime') != stat.st_mtime_ns:
+                changed.append(name)
+        return changed
+
+    def verify(self):
+        """ Returns the names of the images whose pixels don't match the index """
+        corrupted = []
+        for name, entry in self.index.items():
+            begin = self.start + entry['offset']
+            data = self._mmap[begin:begin + entry['pitch'] * entry['height']]
+            if hashlib.sha256(data).hexdigest() != entry['sha256']:
+                corrupted.append(name)
+        return corrupted
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3:
+        print('usage: python stimpack.py <image folder> <pack file>')
+        sys.exit(1)
+
+    index = build_pack(sys.argv[1], sys.argv[2])
+    print('%d images written to %s' % (len(index), sys.argv[2]))
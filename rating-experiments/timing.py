@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+High resolution, frame locked timing of the experiment.
+
+All timestamps come from time.perf_counter_ns. The experiment window reports
+the start and end of every on_draw, every buffer flip and every key press,
+and the timestamps are written to a sidecar file next to the results file
+(pair_result_1.csv -> pair_result_1_timing.csv, appended to when a session
+is resumed), one row per event:
+
+    trial, event, time_ns, duration_ns
+
+event is one of
+    'flip'   - a buffer flip, duration_ns is the draw time of that frame
+    'onset'  - the flip that showed the stimulus of the trial for the first time
+    'key'    - a response key press, duration_ns is the time since the onset
+
+The response time of a trial is measured from the onset flip to the key
+event, so it doesn't include loading or drawing of the images. Key events
+are timestamped when pyglet dispatches them, i.e. with the latency of the
+event loop (at most one frame while the loop waits for vsync).
+
+"""
+
+import csv
+import time
+from pathlib import Path
+
+
+def sidecar_filename(resultsfile):
+    """ Name of the timing file that belongs to a results file """
+    path = Path(resultsfile)
+    return str(path.with_name(path.stem + '_timing' + path.suffix))
+
+
+class TrialTiming:
+    """ Collects the frame and key timestamps of a session """
+
+    def __init__(self, resultsfile):
+        self.filename = sidecar_filename(resultsfile)
+        self.f = open(self.filename, 'a', newline='')
+        self.writer = csv.writer(self.f)
+        if self.f.tell() == 0:
+            self.writer.writerow(['trial', 'event', 'time_ns', 'duration_ns'])
+
+        self.onset_ns = None  # onset flip of the current trial
+        self._draw_start = 0
+        self._draw_duration = 0
+
+    def start_draw(self):
+        self._draw_start = time.perf_counter_ns()
+
+    def end_draw(self):
+        self._draw_duration = time.perf_counter_ns() - self._draw_start
+
+    def flipped(self, trial, onset=False):
+        """ Records a flip, to be called right after the buffers were swapped """
+        t = time.perf_counter_ns()
+        self.writer.writerow([trial, 'flip', t, self._draw_duration])
+        if onset:
+            self.onset_ns = t
+            self.writer.writerow([trial, 'onset', t, 0])
+        return t
+
+    def key_pressed(self, trial):
+        """ Records a response key and returns the response time in seconds,
+        from the onset flip of the trial """
+        t = time.perf_counter_ns()
+        resptime = t - self.onset_ns
+        self.writer.writerow([trial, 'key', t, resptime])
+        return resptime / 1e9
+
+    def close(self):
+        self.f.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rendering of the filtered stimuli from the original images.
+
+The stimuli <Scene>_<Filter>_<Intensity>.jpg were exported one by one from
+the Instagram app. Here the filters are approximated by NumPy operations on
+the pixels of <Scene>_OG.jpg, so any grid of filters and intensities can
+be rendered again in one run:
+
+    curves      one tone curve per channel (control points, interpolated
+                into a 256 entry lookup table)
+    matrix      3 x 3 color matrix, applied after the curves, combined
+                with a saturation factor
+
+The intensity is the blend between the original and the fully filtered
+image, intensity 100 is the full filter, 0 the original. The filters only
+resemble the Instagram looks, they are not the same pixels as the app.
+
+Every original is rendered on a process pool, one job per original and
+filter (the full filter is computed once and blended to all intensities),
+and each image is written at full size and, resized, to the _tiny folder.
+
+Usage:
+
+python filters.py ../images/people rendered/people
+python filters.py ../images/landscape rendered/landscape rendered/landscape_tiny
+
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+## filters and intensities rendered from the command line
+filters = ['Clarendon', 'Juno', 'Lark']
+intensities = [25, 50, 75, 100]
+
+## edge length of the _tiny images in pixels, and JPEG quality
+tiny_size = 640
+jpeg_quality = 95
+
+## rows processed at once (bounds the memory of the float buffers)
+chunk_rows = 512
+
+## luma weights, for the saturation
+LUMA = np.array([0.299, 0.587, 0.114])
+
+## filter definitions: tone curve control points per channel (R, G, B),
+## color matrix and saturation
+FILTERS = {
+    'Clarendon': {  # more contrast and saturation, cool shadows
+        'curves': [[(0, 0), (64, 54), (128, 134), (192, 210), (255, 255)],
+                   [(0, 5), (64, 60), (128, 136), (192, 208), (255, 255)],
+                   [(0, 25), (64, 78), (128, 142), (192, 204), (255, 248)]],
+        'matrix': np.eye(3),
+        'saturation': 1.3},
+    'Juno': {  # warm, saturated, slightly faded blues
+        'curves': [[(0, 0), (64, 70), (128, 142), (192, 206), (255, 255)],
+                   [(0, 0), (64, 66), (128, 134), (192, 198), (255, 250)],
+                   [(0, 12), (64, 60), (128, 118), (192, 180), (255, 232)]],
+        'matrix': np.array([[1.05, 0.0, -0.05], [0.0, 1.0, 0.0], [-0.03, 0.0, 1.03]]),
+        'saturation': 1.25},
+    'Lark': {  # brighter, muted reds, lifted greens and blues
+        'curves': [[(0, 18), (64, 84), (128, 150), (192, 210), (255, 255)],
+                   [(0, 16), (64, 86), (128, 154), (192, 214), (255, 255)],
+                   [(0, 20), (64, 86), (128, 152), (192, 210), (255, 250)]],
+        'matrix': np.array([[0.9, 0.06, 0.04], [0.0, 1.0, 0.0], [0.0, 0.02, 0.98]]),
+        'saturation': 0.85},
+}
+
+
+def lookup_tables(curves):
+    """ Lookup tables (3 x 256) of the tone curves """
+    x = np.arange(256)
+    return np.stack([np.interp(x, *zip(*points)) for points in curves]).astype(np.float32)
+
+
+def color_matrix(spec):
+    """ Color matrix of a filter, with its saturation """
+    s = spec['saturation']
+    saturation = s * np.eye(3) + (1 - s) * np.tile(LUMA, (3, 1))
+    return (spec['matrix'] @ saturation).astype(np.float32)
+
+
+def apply_filter(pixels, spec):
+    """ Fully filtered image (float32, 0..255) of an RGB image (uint8, h x w x 3) """
+    luts = lookup_tables(spec['curves'])
+    matrix = color_matrix(spec).T
+    out = np.empty(pixels.shape, dtype=np.float32)
+    for start in range(0, pixels.shape[0], chunk_rows):
+        block = pixels[start:start + chunk_rows]
+        curved = np.stack([luts[c][block[..., c]] for c in range(3)], axis=-1)
+        out[start:start + chunk_rows] = np.clip(curved @ matrix, 0, 255)
+    return out
+
+
+def blend(pixels, filtered, intensity):
+    """ Image at an intensity (0..100) between the original and the full filter """
+    a = intensity / 100.0
+    out = pixels.astype(np.float32)
+    out *= 1 - a
+    out += a * filtered
+    return np.rint(out).astype(np.uint8)
+
+
+def variant_name(original, filter_name, intensity):
+    """ Girl1_OG.jpg -> Girl1_Lark_75.jpg """
+    scene = Path(original).name.rsplit('_OG', 1)[0]
+    return '%s_%s_%d.jpg' % (scene, filter_name, intensity)
+
+
+def render(job):
+    """ All intensities of one filter for one original (runs in a worker
+    process). Returns the names of the files written """
+    original, filter_name, levels, outdir, tinydir = job
+    with Image.open(original) as im:
+        pixels = np.asarray(im.convert('RGB'))
+    filtered = apply_filter(pixels, FILTERS[filter_name])
+
+    written = []
+    for intensity in levels:
+        name = variant_name(original, filter_name, intensity)
+        image = Image.fromarray(blend(pixels, filtered, intensity))
+        image.save(Path(outdir) / name, quality=jpeg_quality)
+        if tinydir is not None:
+            tiny = image.resize((tiny_size, round(tiny_size * image.height / image.width)), Image.LANCZOS)
+            tiny.save(Path(tinydir) / name, quality=jpeg_quality)
+        written.append(name)
+    return written
+
+
+def render_grid(srcdir, outdir, tinydir=None, filter_names=None, levels=None, workers=None):
+    """ Renders every filter and intensity of all originals (*_OG.jpg) in
+    srcdir. Returns the names of the files written """
+    filter_names = filter_names or filters
+    levels = levels or intensities
+    for folder in (outdir, tinydir):
+        if folder is not None:
+            Path(folder).mkdir(parents=True, exist_ok=True)
+
+    originals = sorted(Path(srcdir).glob('*_OG.jpg'))
+    jobs = [(str(o), f, levels, outdir, tinydir) for o in originals for f in filter_names]
+    if tinydir is not None:
+        # the originals are stimuli too
+        for o in originals:
+            with Image.open(o) as im:
+                im.resize((tiny_size, round(tiny_size * im.height / im.width)), Image.LANCZOS) \
+                    .save(Path(tinydir) / o.name, quality=jpeg_quality)
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        written = [render(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(render, jobs))
+    return [name for names in written for name in names]
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3:
+        print('usage: python filters.py <folder with *_OG.jpg> <output folder> [<tiny folder>]')
+        sys.exit(1)
+
+    srcdir, outdir = sys.argv[1], sys.argv[2]
+    tinydir = sys.argv[3] if len(sys.argv) > 3 else outdir.rstrip('/') + '_tiny'
+    written = render_grid(srcdir, outdir, tinydir)
+    print('%d images written to %s and %s' % (len(written), outdir, tinydir))
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# no display needed for decoding images with pyglet
+os.environ.setdefault('PYGLET_HEADLESS', 'True')
+
+# the modules import each other from their folders, like the scripts do
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ('design-creator', 'evaluation', 'rating-experiments'):
+    sys.path.insert(0, str(ROOT / folder))
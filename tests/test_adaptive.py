@@ -0,0 +1,65 @@
+""" Adaptive pair selection (adaptive.py) """
+
+import numpy as np
+from design_engine import stimulus_table
+from adaptive import AdaptivePairs
+
+
+def table():
+    return stimulus_table(['Girl1', 'Girl2'], ['OG', 'Clarendon', 'Lark'], ['25', '100'], '.jpg')
+
+
+def run(sampler, true_scores, rng):
+    """ Session of a simulated observer with Bradley-Terry preferences """
+    trials = []
+    while (trial := sampler.next_trial()) is not None:
+        a, b = sampler.index[trial['image_a']], sampler.index[trial['image_b']]
+        p_a = 1.0 / (1.0 + np.exp(-(true_scores[a] - true_scores[b])))
+        sampler.update(trial, 0 if rng.random() < p_a else 1)
+        trials.append(trial)
+    return trials
+
+
+def test_stops_at_target_sd():
+    t = table()
+    rng = np.random.default_rng(1)
+    true_scores = np.tile(np.linspace(-2, 2, 5), 2)  # 5 images per scene
+    sampler = AdaptivePairs(t, np.random.default_rng(2), target_sd=0.6, max_trials=2000)
+    trials = run(sampler, true_scores, rng)
+
+    assert 0 < len(trials) < 2000
+    relative = sampler.center @ sampler.cov @ sampler.center.T
+    assert np.sqrt(np.diag(relative)).max() < 0.6
+    # pairs within a scene, and no image twice in a row
+    scene = dict(zip(t['image'], t['scene']))
+    assert all(scene[x['image_a']] == scene[x['image_b']] for x in trials)
+    for prev, cur in zip(trials, trials[1:]):
+        assert not {prev['image_a'], prev['image_b']} & {cur['image_a'], cur['image_b']}
+    # the estimated order within each scene follows the true scores
+    for s in np.unique(t['scene']):
+        mine = t['scene'] == s
+        assert np.corrcoef(sampler.scores[mine], true_scores[mine])[0, 1] > 0.9
+
+
+def test_max_trials():
+    t = table()
+    sampler = AdaptivePairs(t, np.random.default_rng(0), target_sd=0.01, max_trials=7)
+    trials = run(sampler, np.zeros(len(t['image'])), np.random.default_rng(0))
+    assert len(trials) == 7
+
+
+def test_chooses_most_informative_pair():
+    t = table()
+    sampler = AdaptivePairs(t, np.random.default_rng(0))
+    first = sampler.next_trial()
+    sampler.update(first, 0)
+    # a compared pair is less uncertain than the pairs not compared yet
+    gains = sampler.gains()
+    a, b = sorted((sampler.index[first['image_a']], sampler.index[first['image_b']]))
+    compared = np.flatnonzero((sampler.candidates == [a, b]).all(axis=1))[0]
+    assert gains[compared] < np.delete(gains, compared).max()
+    second = sampler.next_trial()
+    pair = sorted((sampler.index[second['image_a']], sampler.index[second['image_b']]))
+    chosen = np.flatnonzero((sampler.candidates == pair).all(axis=1))[0]
+    allowed = ~np.isin(sampler.candidates, [a, b]).any(axis=1)
+    assert gains[chosen] == gains[allowed].max()
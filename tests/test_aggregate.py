@@ -0,0 +1,56 @@
+""" Grouped counting of the results (aggregate.py) """
+
+import csv
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from aggregate import read_results, count, observer_name
+
+RESULTS = Path(__file__).resolve().parent.parent / 'rating-experiments' / 'pair_results'
+FILTERS = ['OG', 'Clarendon', 'Juno', 'Lark']
+INTENSITIES = [0, 25, 50, 75, 100]
+
+
+def test_count_matches_loop():
+    files = sorted(RESULTS.glob('*.csv'))
+    table = read_results(files)
+
+    # the counting loop of the former evaluation/main.py
+    expected = Counter()
+    for filename in files:
+        with open(filename, newline='') as f:
+            for row in csv.DictReader(f):
+                expected[row['chosen_f_og'], int(row['chosen_i'])] += 1
+
+    counts = count(table, ['chosen_f_og', 'chosen_i'], within=['chosen_f_og'],
+                   categories={'chosen_f_og': FILTERS, 'chosen_i': INTENSITIES})
+    assert len(counts['count']) == len(FILTERS) * len(INTENSITIES)
+    for f, i, n in zip(counts['chosen_f_og'], counts['chosen_i'], counts['count']):
+        assert n == expected[f, i]
+    # proportions within every filter
+    for f in FILTERS:
+        mine = counts['chosen_f_og'] == f
+        if counts['count'][mine].sum():
+            assert np.isclose(counts['proportion'][mine].sum(), 1.0)
+
+
+def test_observers_and_old_columns(tmp_path):
+    new = tmp_path / 'anna_single_result_1.csv'
+    new.write_text('usage,image,filter,intensity,response,resptime\n'
+                   'no,Girl1_Lark_75.jpg,Lark,75,3,1.5\n'
+                   'no,Girl2_OG.jpg,OG,0,1,0.8\n')
+    old = tmp_path / 'ben_single_result_1.csv'
+    old.write_text('User,image,filter,intensity,response\n'
+                   'yes,Girl1_Juno_25.jpg,Juno,25,2\n')
+    table = read_results([new, old])
+
+    assert list(table['observer']) == ['anna', 'anna', 'ben']
+    assert list(table['usage']) == ['no', 'no', 'yes']
+    assert list(table['scene']) == ['Girl1', 'Girl2', 'Girl1']
+    assert np.isnan(table['resptime'][2])
+    assert table['intensity'].tolist() == [75, 0, 25]
+
+    counts = count(table, ['observer', 'response'], dropzero=True)
+    assert set(zip(counts['observer'], counts['response'], counts['count'])) == \
+        {('anna', 1, 1), ('anna', 3, 1), ('ben', 2, 1)}
+    assert observer_name('x/chris_pair_result_2.csv') == 'chris'
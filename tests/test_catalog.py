@@ -0,0 +1,55 @@
+""" Catalog of the stimulus images (catalog.py) """
+
+from PIL import Image
+import pytest
+from catalog import scan, problems, check, check_design, parse_name
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'images'
+    folder.mkdir()
+    for name in ['Girl1_OG.jpg', 'Girl1_Lark_25.jpg', 'Girl1_Lark_50.jpg', 'Girl1_Juno_25.jpg',
+                 'Lake_Juni_50.jpg', 'notes.jpg']:
+        Image.new('RGB', (8, 6)).save(folder / name)
+    Image.new('RGB', (16, 12)).save(folder / 'Girl2_OG.jpg')
+    return folder
+
+
+def test_parse_name():
+    assert parse_name('Girl1_Lark_75.jpg') == ('Girl1', 'Lark', 75)
+    assert parse_name('Girl1_OG.jpg') == ('Girl1', 'OG', 0)
+    assert parse_name('Girl1.jpg') is None
+
+
+def test_problems(folder, tmp_path):
+    table = scan([folder], tmp_path / 'catalog.json')
+    assert len(table['image']) == 7
+    messages = problems(table)
+    assert any('notes.jpg does not match' in m for m in messages)
+    assert any('Lake_Juni_50.jpg has the unknown filter Juni (Juno?)' in m for m in messages)
+    assert any('Girl1_Juno_50.jpg is missing' in m for m in messages)
+    assert len(messages) == 3
+
+
+def test_check_design(folder, tmp_path):
+    cache_file = tmp_path / 'catalog.json'
+    design = {'image_a': ['Girl1_OG.jpg', 'Girl1_Lark_25.jpg'],
+              'image_b': ['Girl1_Lark_50.jpg', 'Girl1_Lark_52.jpg']}
+    messages = check_design(design, ['image_a', 'image_b'], folder, cache_file)
+    assert messages == ['row 2: Girl1_Lark_52.jpg is not in %s (Girl1_Lark_50.jpg?)' % folder]
+
+    table = scan([folder], cache_file)
+    assert check(table, folder, ['Girl1_OG.jpg', 'Girl1_Lark_25.jpg']) == []
+    mixed = check(table, folder, ['Girl1_OG.jpg', 'Girl2_OG.jpg'])
+    assert mixed == ['%s: the images have different resolutions [(8, 6), (16, 12)]' % folder]
+    assert check(table, tmp_path / 'other', ['Girl1_OG.jpg']) == ['%s: no images found' % (tmp_path / 'other')]
+
+
+def test_cache_reads_changed_files(folder, tmp_path):
+    cache_file = tmp_path / 'catalog.json'
+    scan([folder], cache_file)
+    Image.new('RGB', (32, 24)).save(folder / 'Girl1_OG.jpg')
+    table = scan([folder], cache_file)
+    here = table['image'] == 'Girl1_OG.jpg'
+    assert (table['width'][here][0], table['height'][here][0]) == (32, 24)
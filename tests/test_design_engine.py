@@ -0,0 +1,87 @@
+""" Constraints of the randomized designs (design_engine.py) """
+
+import numpy as np
+import pytest
+from design_engine import (stimulus_table, pairs_within, counterbalance, run_lengths, violations,
+                           shuffle_order, pair_design, single_design)
+
+SCENES = ['Girl1', 'Girl2', 'Lake']
+FILTERS = ['OG', 'Clarendon', 'Lark', 'Juno']
+INTENSITIES = ['25', '50', '75', '100']
+
+
+@pytest.fixture
+def table():
+    return stimulus_table(SCENES, FILTERS, INTENSITIES, '.jpg')
+
+
+def test_pairs_within_scenes(table):
+    pairs = pairs_within(table['scene'])
+    per_scene = 1 + 3 * len(INTENSITIES)  # OG once
+    assert len(pairs) == len(SCENES) * per_scene * (per_scene - 1) // 2
+    assert (table['scene'][pairs[:, 0]] == table['scene'][pairs[:, 1]]).all()
+    assert (pairs[:, 0] < pairs[:, 1]).all()
+
+
+def test_counterbalance_swaps_half(table):
+    pairs = pairs_within(table['scene'])
+    swapped = counterbalance(pairs, np.random.default_rng(0))
+    assert (swapped[:, 0] > swapped[:, 1]).sum() == len(pairs) // 2
+    assert (np.sort(swapped, axis=1) == pairs).all()
+
+
+def test_run_lengths():
+    assert run_lengths(np.array([1, 1, 2, 2, 2, 1])).tolist() == [0, 1, 0, 1, 2, 0]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_shuffle_order_meets_constraints(table, seed):
+    rng = np.random.default_rng(seed)
+    pairs = pairs_within(table['scene'])
+    keys = table['scene'][pairs[:, 0]]
+    order = shuffle_order(pairs, rng, keys, max_run=2)
+
+    assert sorted(order.tolist()) == list(range(len(pairs)))
+    assert len(violations(pairs[order], keys[order], 2)) == 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_shuffle_order_small_scene(seed):
+    # 5 stimuli of one scene: only few orders of the 10 pairs share no image
+    table = stimulus_table(['Girl1'], ['OG', 'Lark', 'Juno'], ['25', '75'], '.jpg')
+    rows = pair_design(table, np.random.default_rng(seed))
+    images = list(table['image'])
+    pairs = np.array([[images.index(a), images.index(b)] for a, b in rows[:, :2]])
+    assert len(rows) == 10
+    assert len(violations(pairs)) == 0
+
+
+def test_shuffle_order_impossible():
+    # every trial shows image 0, so two of them always follow each other
+    pairs = np.array([[0, 1], [0, 2], [0, 3]])
+    with pytest.raises(ValueError):
+        shuffle_order(pairs, np.random.default_rng(0), max_tries=10)
+    # one scene can't be split into runs of 3
+    keys = np.zeros(3, dtype=int)
+    with pytest.raises(ValueError):
+        shuffle_order(np.array([[0, 1], [2, 3], [4, 5]]), np.random.default_rng(0), keys, max_run=2)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pair_design(table, seed):
+    rows = pair_design(table, np.random.default_rng(seed), max_run=3)
+    images = list(table['image'])
+    left = np.array([images.index(v) for v in rows[:, 0]])
+    right = np.array([images.index(v) for v in rows[:, 1]])
+    pairs = np.stack([left, right], axis=1)
+
+    assert len(rows) == len(pairs_within(table['scene']))
+    assert len(violations(pairs, table['scene'][left], 3)) == 0
+    assert (left > right).sum() == len(rows) // 2
+
+
+def test_single_design_runs(table):
+    rows = single_design(table, np.random.default_rng(0), max_run=1)
+    scenes = np.array([image.split('_')[0] for image in rows[:, 0]])
+    assert sorted(rows[:, 0]) == sorted(table['image'])
+    assert (scenes[1:] != scenes[:-1]).all()
@@ -0,0 +1,77 @@
+""" Design files as typed tables (designtable.py) """
+
+import csv
+import numpy as np
+import pytest
+from designtable import DesignTable, read_design_csv
+
+FIELDS = ['image_a', 'image_b', 'f_a_og', 'f_b_og', 'i_a', 'i_b']
+ROWS = [['Girl1_Lark_75.jpg', 'Girl1_Juno_100.jpg', 'Lark', 'Juno', 75, 100],
+        ['Girl1_OG.jpg', 'Girl1_Clarendon_a_very_long_name_25.jpg', 'OG', 'Clarendon', 0, 25],
+        ['Girl2_Lark_-5.jpg', 'Girl2_Lark_75.jpg', 'Lark', 'Lark', -5, 123456789012]]
+
+
+def write_design(path, rows, lineterminator='\r\n'):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator=lineterminator)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.mark.parametrize('lineterminator', ['\r\n', '\n'])
+def test_round_trip(tmp_path, lineterminator):
+    design = read_design_csv(write_design(tmp_path / 'design.csv', ROWS, lineterminator))
+    assert len(design) == len(ROWS)
+    assert design.fields == FIELDS
+    assert design['i_a'].dtype == np.int64 and design['image_a'].dtype == object
+    for i, row in enumerate(ROWS):
+        assert design.trial(i) == dict(zip(FIELDS, row))
+
+
+def test_quoted_fields(tmp_path):
+    rows = [['Girl1, Lark.jpg', 'b.jpg', 'Lark', 'Juno', 25, 50]] + ROWS
+    design = read_design_csv(write_design(tmp_path / 'design.csv', rows))
+    assert design['image_a'].tolist() == [row[0] for row in rows]
+    assert design['i_b'].tolist() == [row[5] for row in rows]
+
+
+def test_mixed_column_is_text(tmp_path):
+    rows = [row[:4] + ['x' if i == 1 else row[4], row[5]] for i, row in enumerate(ROWS)]
+    design = read_design_csv(write_design(tmp_path / 'design.csv', rows))
+    assert design['i_a'].tolist() == ['75', 'x', '-5']
+
+
+def test_codes(tmp_path):
+    design = read_design_csv(write_design(tmp_path / 'design.csv', ROWS * 3))
+    categories, codes = design.codes('f_a_og')
+    assert categories.tolist() == ['Lark', 'OG']
+    assert (categories[codes] == design['f_a_og']).all()
+
+    taken = design.take([2, 0])
+    categories, codes = taken.codes('f_a_og')
+    assert (categories[codes] == taken['f_a_og']).all()
+    assert taken.trial(0) == dict(zip(FIELDS, ROWS[2]))
+
+
+def test_append(tmp_path):
+    design = DesignTable()
+    for i in range(40):
+        design.append(dict(zip(FIELDS, ROWS[i % 3][:4] + [str(i), i])))
+    assert len(design) == 40
+    assert design['i_a'].tolist() == list(range(40))
+    assert design['i_a'].dtype == np.int64
+    assert design.trial(39)['image_a'] == ROWS[0][0]
+    with pytest.raises(IndexError):
+        design.trial(40)
+
+
+def test_blank_lines(tmp_path):
+    path = tmp_path / 'design.csv'
+    lines = [','.join(FIELDS)] + [','.join(map(str, row)) for row in ROWS]
+    path.write_bytes(('\r\n'.join(lines[:2]) + '\r\n\r\n' + '\r\n'.join(lines[2:]) + '\r\n\r\n').encode())
+    design = read_design_csv(str(path))
+    assert len(design) == len(ROWS)
+    assert design['i_b'].dtype == np.int64
+    for i, row in enumerate(ROWS):
+        assert design.trial(i) == dict(zip(FIELDS, row))
@@ -0,0 +1,32 @@
+""" Helpers of the experiment engine (experiment.py) """
+
+import pytest
+from types import SimpleNamespace
+from experiment import screen_rate, parse_observer_argument
+
+
+class Screen:
+    def __init__(self, mode):
+        self.mode = mode
+
+    def get_mode(self):
+        return self.mode
+
+
+def test_screen_rate():
+    assert screen_rate(Screen(SimpleNamespace(rate=144))) == 144
+    # no mode (headless) or no rate reported
+    assert screen_rate(Screen(None)) == 60
+    assert screen_rate(Screen(SimpleNamespace(rate=0)), default=50) == 50
+
+
+def test_parse_observer_argument():
+    argv = ['rating_experiment_double.py', '--observer', 'chris', 'random:3']
+    assert parse_observer_argument(argv) == 'chris'
+    assert argv == ['rating_experiment_double.py', 'random:3']
+    assert parse_observer_argument(argv) is None
+
+    # no id after the option
+    for argv in (['x.py', 'random', '--observer'], ['x.py', '--observer', '--observer']):
+        with pytest.raises(SystemExit):
+            parse_observer_argument(argv)
@@ -0,0 +1,32 @@
+""" Memory bounded LRU cache (imagecache.py) """
+
+from imagecache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=30)
+    cache.put('a', 1, 10)
+    cache.put('b', 2, 10)
+    cache.put('c', 3, 10)
+    assert cache.get('a') == 1  # a is now the most recently used
+    cache.put('d', 4, 10)
+
+    assert 'b' not in cache
+    assert [k in cache for k in 'acd'] == [True, True, True]
+    assert cache.nbytes == 30
+
+
+def test_replaces_entry_and_counts():
+    cache = LRUCache(max_bytes=30)
+    cache.put('a', 1, 10)
+    cache.put('a', 2, 20)
+    assert cache.get('a') == 2
+    assert cache.get('x') is None
+    assert cache.stats() == {'entries': 1, 'bytes': 20, 'max_bytes': 30, 'hits': 1, 'misses': 1}
+
+
+def test_too_large_value_is_not_cached():
+    cache = LRUCache(max_bytes=30)
+    cache.put('a', 1, 10)
+    cache.put('big', 2, 40)
+    assert 'big' not in cache and 'a' in cache
@@ -0,0 +1,61 @@
+""" Bulk results loading with the cache (loader.py) """
+
+import os
+import numpy as np
+import loader
+from loader import load_results
+
+HEADER = 'usage,image,filter,intensity,response,resptime\n'
+
+
+def write(path, rows, mtime_ns):
+    path.write_text(HEADER + ''.join(rows))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_cache_follows_changes(tmp_path, monkeypatch):
+    parsed = []
+    parse = loader._parse
+
+    def counting_parse(filename):
+        parsed.append(os.path.basename(filename))
+        return parse(filename)
+
+    monkeypatch.setattr(loader, '_parse', counting_parse)
+    cache_dir = str(tmp_path / 'cache')
+    anna = tmp_path / 'anna_single_result_1.csv'
+    ben = tmp_path / 'ben_single_result_1.csv'
+    write(anna, ['no,Girl1_Lark_75.jpg,Lark,75,3,1.5\n'], 10**18)
+    write(ben, ['yes,Girl2_OG.jpg,OG,0,1,0.8\n'], 10**18)
+
+    first = load_results([str(anna), str(ben)], cache_dir)
+    assert parsed == [anna.name, ben.name]
+    again = load_results([str(anna), str(ben)], cache_dir)
+    assert parsed == [anna.name, ben.name]  # both from the cache
+    assert len(os.listdir(cache_dir)) == 1  # one cache for the folder
+    for k in first:
+        assert first[k].dtype == again[k].dtype
+        assert first[k].tolist() == again[k].tolist()
+    assert again['observer'].tolist() == ['anna', 'ben']
+    assert again['intensity'].tolist() == [75, 0]
+
+    # same size, newer modification time: parsed again
+    write(anna, ['no,Girl1_Lark_25.jpg,Lark,25,2,1.5\n'], 10**18 + 1)
+    table = load_results([str(anna), str(ben)], cache_dir)
+    assert parsed == [anna.name, ben.name, anna.name]
+    assert table['intensity'].tolist() == [25, 0]
+    assert table['response'].tolist() == [2, 1]
+
+    # a row appended, same modification time: the size tells
+    write(anna, ['no,Girl1_Lark_25.jpg,Lark,25,2,1.5\n', 'no,Girl1_OG.jpg,OG,0,1,0.5\n'], 10**18 + 1)
+    table = load_results([str(anna)], cache_dir)
+    assert parsed[-1] == anna.name and len(parsed) == 4
+    assert table['image'].tolist() == ['Girl1_Lark_25.jpg', 'Girl1_OG.jpg']
+
+
+def test_concat_fills_missing_columns():
+    table = loader.concat([{'image': np.array(['a'], dtype=object), 'response': np.array([3])},
+                           {'image': np.array(['b'], dtype=object), 'resptime': np.array([0.5])}])
+    assert table['image'].tolist() == ['a', 'b']
+    assert table['response'].tolist() == [3, -1]
+    assert np.isnan(table['resptime'][0]) and table['resptime'][1] == 0.5
@@ -0,0 +1,45 @@
+""" Results database (resultsdb.py) """
+
+from pathlib import Path
+from resultsdb import ResultsDB, import_csv, query
+from resume import read_results
+
+RESULTS = Path(__file__).resolve().parent.parent / 'rating-experiments' / 'single_results'
+PAIR_HEADER = ['usage', 'image_a', 'image_b', 'f_a_og', 'f_b_og', 'f_a', 'f_b', 'i_a', 'i_b',
+               'chosen_f_og', 'chosen_f', 'chosen_i', 'left_right', 'resptime']
+
+
+def test_round_trip(tmp_path):
+    filename = str(tmp_path / 'results.db')
+    rows = [['no', 'Girl1_Lark_25.jpg', 'Girl1_Juno_75.jpg', 'Lark', 'Juno', 'Lark', 'Juno', 25, 75,
+             'Juno', 'Juno', 75, 'right', 1.25],
+            ['no', 'Lake_OG.jpg', 'Lake_Lark_50.jpg', 'OG', 'Lark', 'OG', 'Lark', 0, 50,
+             'OG', 'OG', 0, 'left', 0.5]]
+    writer = ResultsDB(filename, 'pair', PAIR_HEADER, tmp_path / 'pair_result_1.csv', observer='o1', seed=7)
+    writer.writerow(rows[0])
+    writer.writerow(rows[1])
+    writer.close()
+
+    found = query(filename, paradigm='pair')
+    assert [[r[k] for k in PAIR_HEADER] for r in found] == rows
+    assert {r['observer'] for r in found} == {'o1'}
+    assert found[0]['file'] == str(tmp_path / 'pair_result_1.csv')
+
+    # indexed columns of the chosen image
+    assert [r['chosen_i'] for r in query(filename, scene='Lake', filter='OG', intensity=0)] == [0]
+    assert [r['image_a'] for r in query(filename, filter=['Juno', 'Lark'])] == ['Girl1_Lark_25.jpg']
+    assert query(filename, observer='o2') == []
+    assert query(filename, paradigm='single') == []
+
+
+def test_import_results_files(tmp_path):
+    filename = str(tmp_path / 'results.db')
+    files = sorted(RESULTS.glob('*.csv'))[:2]
+    expected = [row for f in files for row in read_results(str(f))]
+    assert import_csv(filename, files) == len(expected)
+    assert import_csv(filename, files) == 0  # imported before
+
+    found = query(filename, paradigm='single')
+    assert [{k: r[k] for k in expected[0]} for r in found] == expected
+    assert len(query(filename, observer='chris')) == sum(
+        len(read_results(str(f))) for f in files if f.name.startswith('chris_'))
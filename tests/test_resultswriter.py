@@ -0,0 +1,79 @@
+""" Crash recovery of the results files (resultswriter.py) """
+
+import csv
+from pathlib import Path
+from resultswriter import JOURNAL_SUFFIX, ResultsWriter, count_rows, recover, recover_journals
+
+HEADER = ['usage', 'image', 'response']
+
+
+def write(path, text):
+    with open(path, 'w', newline='') as f:
+        f.write(text)
+
+
+def rows_of(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_count_rows_truncates_partial_line(tmp_path):
+    results = tmp_path / 'single_result_1.csv'
+    write(results, 'usage,image,response\nno,a.jpg,1\nno,b.jpg,2\nno,c.j')
+    assert count_rows(str(results)) == 2
+    assert results.read_text() == 'usage,image,response\nno,a.jpg,1\nno,b.jpg,2\n'
+
+
+def test_count_rows_missing_file(tmp_path):
+    assert count_rows(str(tmp_path / 'missing.csv')) == 0
+
+
+def test_recover_appends_missing_rows(tmp_path):
+    results = tmp_path / 'single_result_1.csv'
+    write(results, 'usage,image,response\nno,a.jpg,1\n')
+    # row 0 made it into the results file, rows 1 and 2 only into the
+    # journal, the last journal line was cut off by the crash
+    write(str(results) + JOURNAL_SUFFIX, '0,no,a.jpg,1\n1,no,b.jpg,2\n2,no,c.jpg,3\n3,no,d.j')
+
+    assert recover(str(results)) == 2
+    assert rows_of(results) == [HEADER, ['no', 'a.jpg', '1'], ['no', 'b.jpg', '2'], ['no', 'c.jpg', '3']]
+    assert not Path(str(results) + JOURNAL_SUFFIX).exists()
+
+
+def test_recover_without_journal(tmp_path):
+    results = tmp_path / 'single_result_1.csv'
+    write(results, 'usage,image,response\nno,a.jpg,1\n')
+    assert recover(str(results)) == 0
+    assert rows_of(results) == [HEADER, ['no', 'a.jpg', '1']]
+
+
+def test_recover_journals_of_folder(tmp_path):
+    for name in ('single_result_1.csv', 'single_result_2.csv'):
+        write(tmp_path / name, 'usage,image,response\n')
+        write(str(tmp_path / name) + JOURNAL_SUFFIX, '0,no,a.jpg,1\n')
+    recovered = recover_journals(tmp_path)
+    assert sorted(recovered.values()) == [1, 1]
+    assert not list(tmp_path.glob('*' + JOURNAL_SUFFIX))
+
+
+def test_writer_commits_and_removes_journal(tmp_path):
+    results = str(tmp_path / 'single_result_1.csv')
+    writer = ResultsWriter(results, HEADER, flush_trials=2, flush_ms=10)
+    for i in range(5):
+        writer.writerow(['no', '%d.jpg' % i, i])
+    writer.close()
+
+    assert rows_of(results) == [HEADER] + [['no', '%d.jpg' % i, str(i)] for i in range(5)]
+    assert not Path(results + JOURNAL_SUFFIX).exists()
+
+
+def test_writer_replays_crashed_session(tmp_path):
+    results = str(tmp_path / 'single_result_1.csv')
+    write(results, 'usage,image,response\nno,a.jpg,1\n')
+    write(results + JOURNAL_SUFFIX, '1,no,b.jpg,2\n')
+
+    # the next session on the same file continues after the recovered row
+    writer = ResultsWriter(results, HEADER)
+    writer.writerow(['no', 'c.jpg', 3])
+    writer.close()
+    assert rows_of(results) == [HEADER, ['no', 'a.jpg', '1'], ['no', 'b.jpg', '2'], ['no', 'c.jpg', '3']]
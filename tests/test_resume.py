@@ -0,0 +1,46 @@
+""" Resuming an interrupted session (resume.py) """
+
+import csv
+import pytest
+from designtable import DesignTable
+from resume import resume_design
+
+KEYS = ['image_a', 'image_b']
+
+
+def design():
+    return DesignTable.from_columns({'image_a': ['a.jpg', 'b.jpg', 'c.jpg', 'a.jpg'],
+                                     'image_b': ['b.jpg', 'c.jpg', 'a.jpg', 'b.jpg'],
+                                     'i_a': [25, 50, 75, 25]})
+
+
+def write_results(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['usage', 'image_a', 'image_b', 'i_a'])
+        writer.writerows([['no'] + row for row in rows])
+    return str(path)
+
+
+def test_done_trials_first(tmp_path):
+    results = write_results(tmp_path / 'pair_result_1.csv', [['c.jpg', 'a.jpg', 75], ['a.jpg', 'b.jpg', 25]])
+    resumed, ntrials, done = resume_design(design(), results, KEYS)
+
+    assert ntrials == 2
+    assert [row['image_a'] for row in done] == ['c.jpg', 'a.jpg']
+    # done in the order they were done, then the others in design order
+    assert resumed['image_a'].tolist() == ['c.jpg', 'a.jpg', 'b.jpg', 'a.jpg']
+    assert resumed['i_a'].tolist() == [75, 25, 50, 25]
+
+
+def test_repeated_trial(tmp_path):
+    results = write_results(tmp_path / 'pair_result_1.csv', [['a.jpg', 'b.jpg', 25], ['a.jpg', 'b.jpg', 25]])
+    resumed, ntrials, _ = resume_design(design(), results, KEYS)
+    assert ntrials == 2
+    assert resumed['image_a'].tolist() == ['a.jpg', 'a.jpg', 'b.jpg', 'c.jpg']
+
+
+def test_trial_not_in_design(tmp_path):
+    results = write_results(tmp_path / 'pair_result_1.csv', [['x.jpg', 'b.jpg', 25]])
+    with pytest.raises(ValueError):
+        resume_design(design(), results, KEYS)
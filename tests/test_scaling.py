@@ -0,0 +1,62 @@
+""" Paired comparison scaling (scaling.py) """
+
+import numpy as np
+from scaling import win_matrix, components, bradley_terry, thurstone, bootstrap, condition_name
+
+
+def simulate(true_scores, groups, ntrials, rng):
+    """ Trials of a Bradley-Terry observer, pairs within each group """
+    n = len(true_scores)
+    i = rng.integers(n, size=4 * ntrials)
+    j = rng.integers(n, size=4 * ntrials)
+    keep = (i != j) & (groups[i] == groups[j])
+    i, j = i[keep][:ntrials], j[keep][:ntrials]
+    first = rng.random(len(i)) < 1.0 / (1.0 + np.exp(-(true_scores[i] - true_scores[j])))
+    return np.where(first, i, j), np.where(first, j, i)
+
+
+def test_mm_and_newton_agree():
+    rng = np.random.default_rng(0)
+    groups = np.repeat([0, 1], 5)
+    true_scores = np.tile([-1.5, -0.5, 0.0, 0.5, 1.5], 2)
+    winners, losers = simulate(true_scores, groups, 4000, rng)
+    wins = win_matrix(winners, losers, 10)
+    assert wins.sum() == 4000
+
+    newton = bradley_terry(wins, method='newton')
+    mm = bradley_terry(wins, method='mm')
+    np.testing.assert_allclose(newton, mm, atol=1e-6)
+    # every scene centered, close to the true scores
+    np.testing.assert_allclose(newton.reshape(2, 5).mean(axis=1), 0, atol=1e-9)
+    np.testing.assert_allclose(newton, true_scores, atol=0.25)
+
+    # Thurstone: same order, in units of the sd of the differences
+    th = thurstone(wins)
+    for g in (0, 1):
+        assert (np.argsort(th[groups == g]) == np.argsort(true_scores[groups == g])).all()
+
+
+def test_components():
+    compared = np.zeros((5, 5), dtype=bool)
+    for a, b in [(0, 3), (3, 4), (1, 2)]:
+        compared[a, b] = compared[b, a] = True
+    labels = components(compared)
+    assert labels[0] == labels[3] == labels[4]
+    assert labels[1] == labels[2] != labels[0]
+
+
+def test_bootstrap_covers_estimate():
+    rng = np.random.default_rng(1)
+    groups = np.zeros(4, dtype=int)
+    true_scores = np.array([-1.0, 0.0, 0.5, 1.0])
+    winners, losers = simulate(true_scores, groups, 600, rng)
+    estimate = bradley_terry(win_matrix(winners, losers, 4))
+    samples = bootstrap(winners, losers, 4, nboot=200, seed=0, workers=1)
+    assert samples.shape == (200, 4)
+    lower, upper = np.quantile(samples, [0.025, 0.975], axis=0)
+    assert ((lower < estimate) & (estimate < upper)).all()
+
+
+def test_condition_name():
+    assert condition_name('Girl1_Lark_75.jpg') == 'Lark_75'
+    assert condition_name('Girl1_OG.jpg') == 'OG'
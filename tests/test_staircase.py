@@ -0,0 +1,52 @@
+""" Adaptive threshold estimation (staircase.py) """
+
+import numpy as np
+from staircase import PsiStaircase, AdaptiveThresholds, index_images
+
+LEVELS = list(range(5, 101, 5))
+GRID = np.linspace(5, 100, 201)
+
+
+def test_psi_recovers_threshold():
+    rng = np.random.default_rng(0)
+    staircase = PsiStaircase(LEVELS, GRID, slope=0.1, guess=0.05, lapse=0.02)
+    true = 60.0
+    for _ in range(80):
+        level = staircase.next_level()
+        assert level in LEVELS
+        detected = rng.random() < 0.05 + 0.93 / (1 + np.exp(-0.1 * (level - true)))
+        staircase.update(level, detected)
+    mean, sd = staircase.threshold()
+    assert abs(mean - true) < 2.5 * sd
+    assert sd < 10
+
+
+def test_psi_samples_near_threshold():
+    # a noiseless observer: the levels tested close in on the threshold
+    staircase = PsiStaircase(LEVELS, GRID, slope=0.5, guess=0.0, lapse=0.0)
+    levels = []
+    for _ in range(15):
+        level = staircase.next_level()
+        staircase.update(level, level >= 40)
+        levels.append(level)
+    assert all(abs(level - 40) <= 10 for level in levels[-5:])
+    assert abs(staircase.threshold()[0] - 37.5) < 5
+
+
+def test_index_and_interleaved_staircases(tmp_path):
+    for name in ['Girl1_OG.jpg', 'Girl1_Lark_25.jpg', 'Girl1_Lark_75.jpg', 'Girl2_Lark_25.jpg',
+                 'Girl1_Juno_50.jpg', 'notes.txt']:
+        (tmp_path / name).touch()
+    index = index_images(tmp_path)
+    assert index == {'Lark': {25: ['Girl1_Lark_25.jpg', 'Girl2_Lark_25.jpg'], 75: ['Girl1_Lark_75.jpg']},
+                     'Juno': {50: ['Girl1_Juno_50.jpg']}}
+    assert index_images(tmp_path, scenes=['Girl2']) == {'Lark': {25: ['Girl2_Lark_25.jpg']}}
+
+    sampler = AdaptiveThresholds(index, np.random.default_rng(0), max_trials_per_filter=4)
+    trials = []
+    while (trial := sampler.next_trial()) is not None:
+        sampler.update(trial, 3)
+        trials.append(trial)
+    assert sorted(t['filter'] for t in trials) == ['Juno'] * 4 + ['Lark'] * 4
+    assert all(t['image'] in index[t['filter']][int(t['intensity'])] for t in trials)
+    assert set(sampler.thresholds()) == {'Lark', 'Juno'}
@@ -0,0 +1,55 @@
+""" Pre-decoded stimulus packs (stimpack.py) """
+
+import os
+import shutil
+from pathlib import Path
+import pytest
+from stimpack import StimulusPack, build_pack
+
+IMAGES = Path(__file__).resolve().parent.parent / 'rating-experiments' / 'images_tiny'
+NAMES = ['Girl1_OG.jpg', 'Girl1_Lark_25.jpg']
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'images'
+    folder.mkdir()
+    for name in NAMES:
+        shutil.copy(IMAGES / name, folder / name)
+    return folder
+
+
+def test_pack_round_trip(folder, tmp_path):
+    packfile = str(tmp_path / 'images.pack')
+    index = build_pack(folder, packfile)
+    pack = StimulusPack(packfile)
+
+    assert sorted(pack.names()) == sorted(NAMES) == sorted(index)
+    assert pack.verify() == []
+    image = pack.image('Girl1_OG.jpg')
+    assert (image.width, image.height) == (index['Girl1_OG.jpg']['width'], index['Girl1_OG.jpg']['height'])
+
+
+def test_corrupted_pixels(folder, tmp_path):
+    packfile = str(tmp_path / 'images.pack')
+    build_pack(folder, packfile)
+    with open(packfile, 'r+b') as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+    assert StimulusPack(packfile).verify() == ['Girl1_OG.jpg']
+
+
+def test_stale_sources(folder, tmp_path):
+    packfile = str(tmp_path / 'images.pack')
+    build_pack(folder, packfile)
+    pack = StimulusPack(packfile)
+    assert pack.stale(folder) == []
+
+    # one image rendered again, the other removed
+    stat = (folder / NAMES[0]).stat()
+    os.utime(folder / NAMES[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (folder / NAMES[1]).unlink()
+    assert pack.stale(folder) == sorted(NAMES)
+    assert pack.stale(folder, names=[NAMES[0], 'other.jpg']) == [NAMES[0]]